@@ -0,0 +1,340 @@
+"""
+Pre-aggregated statistics over verified claims, kept next to verified_claims_history so dashboards
+read a handful of small documents instead of scanning the collection.
+
+claims_stats_rollups holds one document per hour, per day and for all time with the number of
+verifications, counts per verdict and input kind, a score histogram (bins of 10) and the score
+sum. claims_stats_facets holds per-day and all-time counts of extracted terms and source domains.
+Both are updated with $inc upserts after every successful save (one bulk write per writer batch).
+
+`rebuild` recomputes them from the raw history into fresh collections and swaps them in. In
+dedup storage mode each stored verdict_history entry counts as one verification, so counts
+older than the capped history are approximate.
+
+Usage:
+    python analytics.py rebuild
+    python analytics.py rebuild --dry-run
+"""
+import argparse
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from input_normalizer import is_url_input
+
+logger = logging.getLogger(__name__)
+
+# --- Analytics Configuration (read from .env) ---
+ANALYTICS_ENABLED = os.environ.get('ANALYTICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Hourly rollups and per-day term/domain counts expire after these many days (MongoDB TTL index)
+ANALYTICS_HOURLY_RETENTION_DAYS = int(os.environ.get('ANALYTICS_HOURLY_RETENTION_DAYS', '14'))
+ANALYTICS_FACET_RETENTION_DAYS = int(os.environ.get('ANALYTICS_FACET_RETENTION_DAYS', '90'))
+
+ROLLUPS_COLLECTION = 'claims_stats_rollups'
+FACETS_COLLECTION = 'claims_stats_facets'
+
+GRANULARITIES = ('hour', 'day')
+FACETS = ('term', 'domain')
+ALL_TIME = 'all'
+STATS_MAX_LIMIT = 500
+
+
+def bucket_id(granularity: str, moment: datetime) -> Tuple[str, datetime]:
+    """('day:2026-10-17', midnight) / ('hour:2026-10-17T13', start of hour) for a UTC timestamp."""
+    if granularity == 'hour':
+        start = moment.replace(minute=0, second=0, microsecond=0)
+        return f"hour:{start:%Y-%m-%dT%H}", start
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return f"day:{start:%Y-%m-%d}", start
+
+
+def _field_key(value: str) -> str:
+    # Verdicts become field names: MongoDB keys may not contain '.' or start with '$'
+    return str(value).replace('.', '_').lstrip('$') or 'unknown'
+
+
+def _score_bin(score: Any) -> Optional[str]:
+    try:
+        score = float(score)
+    except (TypeError, ValueError):
+        return None
+    if score < 0:
+        return None
+    return str(min(int(score) // 10, 9) * 10)
+
+
+def _source_domain(original_input: str) -> Optional[str]:
+    from trust_scorer import host_from_url, trust_scorer
+    host = host_from_url(original_input)
+    if host is None:
+        return None
+    return trust_scorer.public_suffixes.registrable_domain(host) or host
+
+
+class _Accumulator:
+    """In-memory sums for a set of claim events, turned into $inc upserts in one go."""
+
+    def __init__(self):
+        self.rollups: Dict[str, Dict[str, Any]] = {}
+        self.facets: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+
+    def add(self, timestamp: datetime, verdict: str, score: Any, original_input: str,
+            terms: Iterable[str]) -> None:
+        increments = {'total': 1, f"verdicts.{_field_key(verdict)}": 1}
+        score_bin = _score_bin(score)
+        if score_bin is not None:
+            increments['score_sum'] = float(score)
+            increments['scored'] = 1
+            increments[f"score_bins.{score_bin}"] = 1
+        is_url = is_url_input(str(original_input))
+        increments[f"input_kinds.{'url' if is_url else 'text'}"] = 1
+
+        buckets = [bucket_id(granularity, timestamp) + (granularity,) for granularity in GRANULARITIES]
+        buckets.append((ALL_TIME, None, ALL_TIME))
+        for bucket, start, granularity in buckets:
+            rollup = self.rollups.setdefault(bucket, {'granularity': granularity, 'bucket_start': start, 'inc': {}})
+            for field, amount in increments.items():
+                rollup['inc'][field] = rollup['inc'].get(field, 0) + amount
+
+        values = [('term', term.strip().lower()) for term in terms if isinstance(term, str) and term.strip()]
+        domain = _source_domain(original_input) if is_url else None
+        if domain:
+            values.append(('domain', domain))
+        day, day_start = bucket_id('day', timestamp)
+        for facet, value in dict.fromkeys(values):
+            for bucket, start in ((day, day_start), (ALL_TIME, None)):
+                entry = self.facets.setdefault((facet, bucket, value), {'bucket_start': start, 'count': 0})
+                entry['count'] += 1
+
+    def add_document(self, document: Dict[str, Any]) -> None:
+        """One saved claim document (as built by db_utils.build_claim_document)."""
+        if document.get('llm_judgment') in (None, 'ERROR', 'UNKNOWN_ERROR'):
+            return
+        self.add(document.get('timestamp') or datetime.utcnow(), document['llm_judgment'],
+                 document.get('credibility_score'), document.get('original_input', ''),
+                 document.get('extracted_terms') or [])
+
+    def requests(self) -> Tuple[List[UpdateOne], List[UpdateOne]]:
+        rollup_requests = [
+            UpdateOne({'_id': bucket}, {'$inc': rollup['inc'],
+                                        '$set': {'updated_at': datetime.utcnow()},
+                                        '$setOnInsert': {'granularity': rollup['granularity'],
+                                                         'bucket_start': rollup['bucket_start']}}, upsert=True)
+            for bucket, rollup in self.rollups.items()
+        ]
+        facet_requests = [
+            UpdateOne({'_id': f"{facet}|{bucket}|{value}"},
+                      {'$inc': {'count': entry['count']},
+                       '$setOnInsert': {'facet': facet, 'bucket': bucket, 'value': value,
+                                        'bucket_start': entry['bucket_start']}}, upsert=True)
+            for (facet, bucket, value), entry in self.facets.items()
+        ]
+        return rollup_requests, facet_requests
+
+    def write(self, db, rollups: str = ROLLUPS_COLLECTION, facets: str = FACETS_COLLECTION) -> None:
+        rollup_requests, facet_requests = self.requests()
+        if rollup_requests:
+            db[rollups].bulk_write(rollup_requests, ordered=False)
+        if facet_requests:
+            db[facets].bulk_write(facet_requests, ordered=False)
+
+
+def record_claim_stats(documents: List[Dict[str, Any]]) -> None:
+    """
+    Adds freshly saved claim documents to the rollups (one bulk write per collection). Failures are
+    logged, never raised: the counters are advisory and `python analytics.py rebuild` repairs them.
+    """
+    if not ANALYTICS_ENABLED or not documents:
+        return
+    from db_utils import _get_db
+
+    accumulator = _Accumulator()
+    for document in documents:
+        accumulator.add_document(document)
+    try:
+        accumulator.write(_get_db())
+    except Exception as e:
+        logger.warning("Analytics: could not update rollups for %d claim(s): %s", len(documents), e)
+
+
+def ensure_analytics_indexes(db=None, rollups: str = ROLLUPS_COLLECTION, facets: str = FACETS_COLLECTION) -> None:
+    """Indexes for the stats endpoints plus TTL indexes that age out hourly rollups and daily facets."""
+    if db is None:
+        from db_utils import _get_db
+        db = _get_db()
+    db[rollups].create_index([('granularity', 1), ('bucket_start', -1)], name='rollups_by_period')
+    db[rollups].create_index([('bucket_start', 1)], name='rollups_hourly_ttl',
+                             expireAfterSeconds=ANALYTICS_HOURLY_RETENTION_DAYS * 86400,
+                             partialFilterExpression={'granularity': 'hour'})
+    db[facets].create_index([('facet', 1), ('bucket', 1), ('count', -1)], name='facets_top')
+    # All-time facet documents have no bucket_start and never expire
+    db[facets].create_index([('bucket_start', 1)], name='facets_daily_ttl',
+                            expireAfterSeconds=ANALYTICS_FACET_RETENTION_DAYS * 86400)
+
+
+# --- Stats API reads ---
+def _serialize_rollup(document: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    document = dict(document or {'total': 0})
+    scored = document.pop('scored', 0)
+    score_sum = document.pop('score_sum', 0)
+    document['average_score'] = round(score_sum / scored, 1) if scored else None
+    document.pop('_id', None)
+    for key in ('bucket_start', 'updated_at'):
+        if isinstance(document.get(key), datetime):
+            document[key] = document[key].isoformat() + 'Z'
+    return document
+
+
+def get_stats_summary(granularity: str = 'day', limit: int = 30) -> Dict[str, Any]:
+    """All-time totals plus the newest `limit` hourly or daily buckets (oldest first)."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    limit = max(1, min(int(limit), STATS_MAX_LIMIT))
+    from db_utils import _get_db
+
+    collection = _get_db()[ROLLUPS_COLLECTION]
+    totals = collection.find_one({'_id': ALL_TIME})
+    series = list(collection.find({'granularity': granularity}).sort('bucket_start', -1).limit(limit))
+    return {
+        'totals': _serialize_rollup(totals),
+        'granularity': granularity,
+        'series': [dict(_serialize_rollup(document), bucket=document['_id']) for document in reversed(series)],
+    }
+
+
+def get_top_values(facet: str, days: Optional[int] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    """Most frequent terms or source domains, all time or over the last `days` daily buckets."""
+    if facet not in FACETS:
+        raise ValueError(f"facet must be one of: {', '.join(FACETS)}")
+    limit = max(1, min(int(limit), STATS_MAX_LIMIT))
+    from db_utils import _get_db
+
+    collection = _get_db()[FACETS_COLLECTION]
+    if not days:
+        cursor = collection.find({'facet': facet, 'bucket': ALL_TIME}, {'_id': 0, 'value': 1, 'count': 1})
+        return list(cursor.sort('count', -1).limit(limit))
+    days = max(1, min(int(days), ANALYTICS_FACET_RETENTION_DAYS))
+    today = datetime.utcnow()
+    buckets = [bucket_id('day', today - timedelta(days=offset))[0] for offset in range(days)]
+    pipeline = [
+        {'$match': {'facet': facet, 'bucket': {'$in': buckets}}},
+        {'$group': {'_id': '$value', 'count': {'$sum': '$count'}}},
+        {'$sort': {'count': -1, '_id': 1}},
+        {'$limit': limit},
+        {'$project': {'_id': 0, 'value': '$_id', 'count': 1}},
+    ]
+    return list(collection.aggregate(pipeline))
+
+
+# --- Rebuild from the raw history ---
+def _iter_history_events(db, until: Optional[datetime] = None, since: Optional[datetime] = None):
+    """
+    (timestamp, verdict, score, original_input, terms) per stored verification. Dedup-mode documents
+    yield one event per verdict_history entry; their terms and input are the latest ones.
+    """
+    from db_utils import CLAIMS_COLLECTION
+
+    query: Dict[str, Any] = {}
+    if since is not None or until is not None:
+        window = {}
+        if since is not None:
+            window['$gte'] = since
+        if until is not None:
+            window['$lt'] = until
+        query = {'$or': [{'timestamp': window}, {'verdict_history.timestamp': window}]}
+    projection = {'_id': 0, 'timestamp': 1, 'llm_judgment': 1, 'credibility_score': 1, 'original_input': 1,
+                  'extracted_terms': 1, 'verdict_history': 1}
+    for document in db[CLAIMS_COLLECTION].find(query, projection).batch_size(1000):
+        history = document.get('verdict_history')
+        entries = history if history else [document]
+        for entry in entries:
+            timestamp = entry.get('timestamp')
+            if not isinstance(timestamp, datetime):
+                continue
+            if (since is not None and timestamp < since) or (until is not None and timestamp >= until):
+                continue
+            if entry.get('llm_judgment') in (None, 'ERROR', 'UNKNOWN_ERROR'):
+                continue
+            yield (timestamp, entry['llm_judgment'], entry.get('credibility_score'),
+                   document.get('original_input', ''), document.get('extracted_terms') or [])
+
+
+def _bson_now() -> datetime:
+    # MongoDB keeps datetimes to the millisecond; window bounds must compare like stored timestamps
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def rebuild(dry_run: bool = False) -> Dict[str, int]:
+    """
+    Recomputes both collections from verified_claims_history into *_rebuild collections, swaps them
+    in with renameCollection, then replays claims saved between the scan and the swap. Safe to
+    re-run. A claim whose counters are written after the swap but timestamped before it (the claim
+    writer flushes up to CLAIM_WRITER_FLUSH_SECONDS late) is counted twice.
+    """
+    from db_utils import _get_db
+
+    db = _get_db()
+    started_at = _bson_now()
+    accumulator = _Accumulator()
+    events = 0
+    for event in _iter_history_events(db, until=started_at):
+        accumulator.add(*event)
+        events += 1
+    stats = {'events': events, 'rollups': len(accumulator.rollups), 'facets': len(accumulator.facets)}
+    if dry_run:
+        return stats
+
+    staging = {name: f"{name}_rebuild" for name in (ROLLUPS_COLLECTION, FACETS_COLLECTION)}
+    for name in staging.values():
+        db.drop_collection(name)
+    accumulator.write(db, rollups=staging[ROLLUPS_COLLECTION], facets=staging[FACETS_COLLECTION])
+    ensure_analytics_indexes(db, rollups=staging[ROLLUPS_COLLECTION], facets=staging[FACETS_COLLECTION])
+    # Saves from here on increment the swapped-in collections themselves
+    swapped_at = _bson_now()
+    for live, staged in staging.items():
+        # create_index above made sure the staged collection exists even with an empty history
+        db[staged].rename(live, dropTarget=True)
+
+    # Saves made between the scan and the swap went to the old, now dropped, collections
+    catch_up = _Accumulator()
+    for event in _iter_history_events(db, since=started_at, until=swapped_at):
+        catch_up.add(*event)
+        stats['events'] += 1
+    catch_up.write(db)
+    ensure_analytics_indexes(db)
+    return stats
+
+
+def main() -> None:
+    from dotenv import load_dotenv
+    load_dotenv()
+    from config import app, mongo
+    from telemetry import configure_logging
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    rebuild_parser = commands.add_parser('rebuild', help="recompute the rollups from verified_claims_history")
+    rebuild_parser.add_argument('--dry-run', action='store_true', help="count what would be written")
+    args = parser.parse_args()
+    configure_logging()
+
+    app.config["MONGO_URI"] = os.environ.get("MONGO_URI")
+    if not app.config["MONGO_URI"]:
+        raise SystemExit("FATAL: MONGO_URI environment variable is not set in the .env file.")
+    mongo.init_app(app)
+
+    started = time.perf_counter()
+    stats = rebuild(dry_run=args.dry_run)
+    print(f"Verifications counted: {stats['events']}")
+    print(f"Rollup buckets:        {stats['rollups']}")
+    print(f"Term/domain counters:  {stats['facets']}")
+    print(f"{'Dry run' if args.dry_run else 'Rebuilt'} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,33 @@
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, stream_with_context, g, url_for
 from flask_cors import CORS 
 from dotenv import load_dotenv
 import os
-from flask_pymongo import PyMongo 
+import json
+import logging
 
 # --- LOAD ENV VARIABLES (CRITICAL: Must be at the very top of app.py) ---
 load_dotenv() 
 
+# --- Structured logging (LOG_LEVEL / LOG_FORMAT / LOG_LEVELS) before any module logs ---
+from telemetry import configure_logging, render_metrics
+configure_logging()
+logger = logging.getLogger("medverify.app")
+
 # Import your core processing function from verifier.py
-from verifier import process_claim 
+# (importing no longer loads spaCy or builds the Gemini client; see model_registry.py)
+from verifier import process_claim, process_claim_async 
+from model_registry import registry, start_model_warmup
+from batch_runner import BatchRunner, BATCH_MAX_ITEMS
+from nlp_processor import prefetch_key_medical_terms
+from llm_gateway import PRIORITY_BATCH
+from claim_writer import claim_writer
+from semantic_index import start_semantic_sync
+from lifecycle import serving_state
+from deadline import DEADLINE_HEADER, parse_deadline_header
+from verdict_cache import parse_force_refresh
+from job_queue import JOB_PRIORITIES, QueueFull, check_callback_url, job_queue
+from stream_sessions import STREAM_RETRY_MS, format_sse, stream_sessions
+from functools import partial
 
 # --- 1. Initialize Flask App ---
 app = Flask(__name__)
@@ -22,60 +41,408 @@ if not app.config["MONGO_URI"]:
     # If not found in .env, raise a critical error to prevent PyMongo crash
     raise ValueError("FATAL: MONGO_URI environment variable is not set in the .env file.")
     
-# Initialize the PyMongo object (unconnected initially)
-mongo = PyMongo()
+# Use the shared PyMongo object from config.py (unconnected initially) so that
+# db_utils (persistence and the verdict cache's persistent tier) sees this connection.
+from config import mongo
 
 # Finalize the MongoDB connection using init_app
 mongo.init_app(app) 
 
+# Create the indexes used by the history API and the verdict cache (no-op if they exist)
+from db_utils import ensure_indexes, get_claims_history_page, get_trending_claims
+from analytics import get_stats_summary, get_top_values
+ensure_indexes()
+
+# Catch the semantic near-duplicate index up with claims verified since it was last synced
+start_semantic_sync()
+
 # --- ADDED: SUCCESS LOG ---
-print("MongoDB Atlas: Connection successful (Initialization Complete).") # Confirmation log
+logger.info("MongoDB Atlas: Connection successful (Initialization Complete).") # Confirmation log
 
 # --- 3. Configure Gemini API Key Check ---
-# The client initialization is ALREADY handled in verifier.py (client = genai.Client()), 
+# The pooled client is owned by llm_gateway.py and built on first use, 
 # which relies on the environment variable being set by load_dotenv() above.
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 if not GEMINI_API_KEY:
-    print("FATAL: GEMINI_API_KEY environment variable is not set. AI calls will fail.")
+    logger.critical("GEMINI_API_KEY environment variable is not set. AI calls will fail.")
 
 # --- 4. Enable CORS ---
 CORS(app)
 
+# --- 4b. Model Warm-up (lazy / background / preload, from MODEL_WARMUP_MODE) ---
+# With "preload", run gunicorn with --preload so forked workers share the loaded model pages.
+start_model_warmup()
+
+
+# --- 4c. In-flight tracking for graceful shutdown (see lifecycle.py / gunicorn.conf.py) ---
+@app.before_request
+def track_claim_request():
+    if request.path.startswith('/medverify/check'):
+        serving_state.request_started()
+        g.claim_request_tracked = True
+
+
+@app.teardown_request
+def finish_claim_request(error=None):
+    # Runs after a streamed batch response has been fully sent, too
+    if g.pop('claim_request_tracked', False):
+        serving_state.request_finished()
+
 
 # --- 5. API Route Definition for Verification ---
 @app.route('/medverify/check', methods=['POST'])
 def check_claim():
     """
     Handles POST requests with user input (text or URL) and runs the MedVerify workflow.
+    Set "force_refresh": true in the body to bypass the verdict cache, and "debug_timings": true
+    to get the per-stage timing breakdown in the response. An X-Request-Deadline-Ms header sets
+    the time budget (default REQUEST_DEADLINE_SECONDS); stages skipped to meet it are listed in
+    "stages_skipped".
     """
     data = request.get_json() 
     raw_input = data.get('input')
+    debug_timings = bool(data.get('debug_timings', False))
     
     if not raw_input:
         return jsonify({"error": "No input provided. Please enter a text or URL."}), 400
+    try:
+        force_refresh = parse_force_refresh(data.get('force_refresh'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        deadline_seconds = parse_deadline_header(request.headers.get(DEADLINE_HEADER))
+    except ValueError:
+        return jsonify({"error": f"{DEADLINE_HEADER} must be a positive number of milliseconds."}), 400
     
-    print(f"--- Processing new input: {raw_input[:50]}...")
+    logger.info("Processing new input: %s...", raw_input[:50])
     
     try:
         # Call the main processing function
-        result = process_claim(raw_input)
+        result = process_claim(raw_input, force_refresh=force_refresh, debug_timings=debug_timings,
+                               deadline_seconds=deadline_seconds)
         
-        print("--- Processing complete. Returning result.")
+        logger.info("Processing complete. Returning result.")
         return jsonify(result), 200
         
     except Exception as e:
-        print(f"AN UNHANDLED ERROR OCCURRED: {e}")
+        logger.exception("AN UNHANDLED ERROR OCCURRED: %s", e)
         return jsonify({
             "error": "Internal server error during workflow execution.", 
             "details": str(e)
         }), 500
 
 
+# --- 6. Async Verification Route (concurrent stages, background persistence) ---
+@app.route('/medverify/check/async', methods=['POST'])
+async def check_claim_async():
+    """
+    Same contract as /medverify/check, but runs the stage graph from process_claim_async():
+    independent stages overlap and the MongoDB write happens after the response.
+    """
+    data = request.get_json() 
+    raw_input = data.get('input')
+    debug_timings = bool(data.get('debug_timings', False))
+    
+    if not raw_input:
+        return jsonify({"error": "No input provided. Please enter a text or URL."}), 400
+    try:
+        force_refresh = parse_force_refresh(data.get('force_refresh'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        deadline_seconds = parse_deadline_header(request.headers.get(DEADLINE_HEADER))
+    except ValueError:
+        return jsonify({"error": f"{DEADLINE_HEADER} must be a positive number of milliseconds."}), 400
+    
+    logger.info("Processing new input (async): %s...", raw_input[:50])
+    
+    try:
+        result = await process_claim_async(raw_input, force_refresh=force_refresh, debug_timings=debug_timings,
+                                           deadline_seconds=deadline_seconds)
+        
+        logger.info("Processing complete. Returning result.")
+        return jsonify(result), 200
+        
+    except Exception as e:
+        logger.exception("AN UNHANDLED ERROR OCCURRED: %s", e)
+        return jsonify({
+            "error": "Internal server error during workflow execution.", 
+            "details": str(e)
+        }), 500
+
+
+# --- 6b. Streaming Verification Routes (Server-Sent Events, resumable) ---
+def _sse_response(session, after_id: int, announce: bool = False) -> Response:
+    """Streams a session's events after after_id as text/event-stream, with keep-alive comments."""
+    def generate():
+        yield f"retry: {STREAM_RETRY_MS}\n"
+        if announce:
+            # No id: line, so a reconnecting EventSource still resumes from the last stage event
+            resume_url = url_for('resume_claim_stream', session_id=session.id)
+            yield f"event: session\ndata: {json.dumps({'session_id': session.id, 'resume_url': resume_url})}\n\n"
+        for item in session.iter_events(after_id):
+            if item is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield format_sse(*item)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/medverify/check/stream', methods=['POST'])
+def check_claim_stream():
+    """
+    Same input as /medverify/check, answered as Server-Sent Events: a "session" event, then one
+    event per finished stage ("scrape", "trust", "claims", "terms", "verdict") and finally "result"
+    (the full /medverify/check response) or "error". The pipeline runs detached from the
+    connection; resume with GET /medverify/check/stream/<session_id> and a Last-Event-ID header.
+    """
+    data = request.get_json(silent=True) or {}
+    raw_input = data.get('input')
+    if not isinstance(raw_input, str) or not raw_input.strip():
+        return jsonify({"error": "No input provided. Please enter a text or URL."}), 400
+    try:
+        force_refresh = parse_force_refresh(data.get('force_refresh'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        deadline_seconds = parse_deadline_header(request.headers.get(DEADLINE_HEADER))
+    except ValueError:
+        return jsonify({"error": f"{DEADLINE_HEADER} must be a positive number of milliseconds."}), 400
+
+    logger.info("Processing new input (stream): %s...", raw_input[:50])
+    session = stream_sessions.start(raw_input, force_refresh=force_refresh,
+                                    deadline_seconds=deadline_seconds)
+    return _sse_response(session, after_id=0, announce=True)
+
+
+@app.route('/medverify/check/stream/<session_id>', methods=['GET'])
+def resume_claim_stream(session_id):
+    """
+    Replays a stream session's events after Last-Event-ID (header, or ?last_event_id= for clients
+    that cannot set headers) and follows it to the end. 404 once the session has expired.
+    """
+    session = stream_sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown or expired stream session. Start a new stream."}), 404
+    try:
+        after_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be an integer event id."}), 400
+    return _sse_response(session, after_id=after_id)
+
+
+# --- 7. Batch Verification Route (NDJSON stream, coalesced duplicates) ---
+# Batch traffic yields LLM quota to interactive requests via the gateway's priority queue
+# and text claims have their NER run together (nlp.pipe) a window at a time
+batch_runner = BatchRunner(partial(process_claim, priority=PRIORITY_BATCH), prefetch_fn=prefetch_key_medical_terms)
+
+@app.route('/medverify/check/batch', methods=['POST'])
+def check_claim_batch():
+    """
+    Accepts {"inputs": [...], "max_in_flight": n, "force_refresh": bool} and streams one
+    NDJSON line per input as soon as its verification finishes.
+    """
+    data = request.get_json(silent=True) or {}
+    inputs = data.get('inputs')
+    
+    if not isinstance(inputs, list) or not inputs:
+        return jsonify({"error": "Provide a non-empty 'inputs' list of texts or URLs."}), 400
+    if len(inputs) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Batch too large. Maximum is {BATCH_MAX_ITEMS} inputs."}), 400
+    if not all(isinstance(item, str) and item.strip() for item in inputs):
+        return jsonify({"error": "Every batch input must be a non-empty string."}), 400
+    
+    try:
+        max_in_flight = int(data['max_in_flight']) if data.get('max_in_flight') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "'max_in_flight' must be an integer."}), 400
+    try:
+        force_refresh = parse_force_refresh(data.get('force_refresh'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    logger.info("Processing batch of %d inputs...", len(inputs))
+    
+    def generate():
+        for record in batch_runner.iter_results(inputs, max_in_flight=max_in_flight, force_refresh=force_refresh):
+            yield json.dumps(record, default=str) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+# --- 7b. Job Submission Routes (durable queue, processed by job_worker.py) ---
+@app.route('/medverify/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queues one verification and returns 202 with its job id at once; poll GET /medverify/jobs/<id>
+    or pass "callback_url" to have the finished job POSTed there. Body: input, force_refresh,
+    priority (low / normal / high). An X-Request-Deadline-Ms header sets the job's time budget.
+    """
+    data = request.get_json(silent=True) or {}
+    raw_input = data.get('input')
+    if not isinstance(raw_input, str) or not raw_input.strip():
+        return jsonify({"error": "No input provided. Please enter a text or URL."}), 400
+
+    priority = data.get('priority', 'normal')
+    if priority not in JOB_PRIORITIES:
+        return jsonify({"error": f"'priority' must be one of: {', '.join(JOB_PRIORITIES)}."}), 400
+    callback_url = data.get('callback_url') or None
+    if callback_url is not None:
+        try:
+            check_callback_url(callback_url)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    try:
+        force_refresh = parse_force_refresh(data.get('force_refresh'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        deadline_seconds = parse_deadline_header(request.headers.get(DEADLINE_HEADER))
+    except ValueError:
+        return jsonify({"error": f"{DEADLINE_HEADER} must be a positive number of milliseconds."}), 400
+
+    payload = {"input": raw_input, "force_refresh": force_refresh}
+    if deadline_seconds is not None:
+        payload["deadline_seconds"] = deadline_seconds
+    try:
+        job_id = job_queue.enqueue(payload, priority=JOB_PRIORITIES[priority], callback_url=callback_url)
+    except QueueFull as e:
+        logger.warning("Job intake refused: %s", e)
+        return jsonify({"error": "Job queue is full. Retry later."}), 429, {"Retry-After": "30"}
+    except Exception as e:
+        logger.exception("JOB QUEUE ERROR: Failed to enqueue job. Details: %s", e)
+        return jsonify({"error": "Could not queue the job.", "details": str(e)}), 500
+
+    status_url = url_for('get_job', job_id=job_id)
+    logger.info("Queued job %s (%s priority): %s...", job_id, priority, raw_input[:50])
+    return jsonify({"job_id": job_id, "status": "queued", "status_url": status_url}), 202, {"Location": status_url}
+
+
+@app.route('/medverify/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status (queued / running / succeeded / failed), attempts, and the result once it succeeded."""
+    try:
+        job = job_queue.get(job_id)
+    except Exception as e:
+        logger.exception("JOB QUEUE ERROR: Failed to read job %s. Details: %s", job_id, e)
+        return jsonify({"error": "Could not load the job.", "details": str(e)}), 500
+    if job is None:
+        return jsonify({"error": "Unknown job id."}), 404
+    return jsonify(job), 200
+
+
+# --- 8. Claims History Route (keyset-paginated, projected, filtered) ---
+@app.route('/medverify/history', methods=['GET'])
+def claims_history():
+    """
+    Returns one page of verified claims, newest first.
+    Query params: limit, cursor (from the previous page's next_cursor), fields (comma-separated),
+    verdict, min_score, max_score, term.
+    """
+    args = request.args
+    try:
+        page = get_claims_history_page(
+            limit=int(args.get('limit', 50)),
+            cursor=args.get('cursor') or None,
+            fields=[f.strip() for f in args['fields'].split(',') if f.strip()] if args.get('fields') else None,
+            verdict=args.get('verdict') or None,
+            min_score=float(args['min_score']) if args.get('min_score') else None,
+            max_score=float(args['max_score']) if args.get('max_score') else None,
+            term=args.get('term') or None,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("MONGO DB ERROR: Failed to retrieve claims history page. Details: %s", e)
+        return jsonify({"error": "Could not load claims history.", "details": str(e)}), 500
+    
+    return jsonify(page), 200
+
+
+# --- 9. Trending Claims Route (requires CLAIM_STORAGE_MODE=dedup) ---
+@app.route('/medverify/trending', methods=['GET'])
+def trending_claims():
+    """Most-requested claims by hit_count. Query params: limit, since_hours."""
+    try:
+        limit = int(request.args.get('limit', 20))
+        since_hours = float(request.args['since_hours']) if request.args.get('since_hours') else None
+    except ValueError:
+        return jsonify({"error": "limit and since_hours must be numbers."}), 400
+    
+    try:
+        return jsonify({"items": get_trending_claims(limit=limit, since_hours=since_hours)}), 200
+    except Exception as e:
+        logger.exception("MONGO DB ERROR: Failed to retrieve trending claims. Details: %s", e)
+        return jsonify({"error": "Could not load trending claims.", "details": str(e)}), 500
+
+
+# --- 10. Stats Routes (pre-aggregated rollups, see analytics.py) ---
+@app.route('/medverify/stats/summary', methods=['GET'])
+def stats_summary():
+    """
+    All-time verdict counts, score histogram and average score, plus the same per hour or day.
+    Query params: granularity (hour / day), limit (number of buckets, newest last).
+    """
+    try:
+        summary = get_stats_summary(granularity=request.args.get('granularity', 'day'),
+                                    limit=int(request.args.get('limit', 30)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("MONGO DB ERROR: Failed to load stats summary. Details: %s", e)
+        return jsonify({"error": "Could not load stats.", "details": str(e)}), 500
+    return jsonify(summary), 200
+
+
+@app.route('/medverify/stats/top', methods=['GET'])
+def stats_top():
+    """Most frequent extracted terms or source domains. Query params: facet (term / domain), days, limit."""
+    try:
+        facet = request.args.get('facet', 'term')
+        days = int(request.args['days']) if request.args.get('days') else None
+        items = get_top_values(facet, days=days, limit=int(request.args.get('limit', 20)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("MONGO DB ERROR: Failed to load top %s values. Details: %s", request.args.get('facet'), e)
+        return jsonify({"error": "Could not load stats.", "details": str(e)}), 500
+    return jsonify({"facet": facet, "days": days, "items": items}), 200
+
+
+# --- Health & Readiness Routes ---
+@app.route('/healthz', methods=['GET'])
+def health_check():
+    """Liveness: the process is up and serving requests (models may still be loading)."""
+    return jsonify({"status": "ok"}), 200
+
+
+@app.route('/readyz', methods=['GET'])
+def readiness_check():
+    """
+    Readiness: 200 once every required model is loaded, 503 (with per-model status) until then.
+    Also 503 while the worker drains for shutdown, so load balancers stop routing to it.
+    """
+    serving = serving_state.snapshot()
+    ready = registry.is_ready() and not serving['draining']
+    return jsonify({"ready": ready, "models": registry.status(), "serving": serving,
+                    "claim_writer": claim_writer.metrics()}), (200 if ready else 503)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus exposition: stage/request latency histograms, retry and cache counters, writer/proxy gauges."""
+    body, content_type = render_metrics()
+    return Response(body, mimetype=None, content_type=content_type)
+
+
 # --- Default Root Route (Optional but helpful for testing) ---
 @app.route('/', methods=['GET'])
 def home_page():
     return "Welcome to the MedVerify Backend API! POST your claims to /medverify/check"
 
 # --- Run the App ---
+# Development server only; production runs under gunicorn (gunicorn -c gunicorn.conf.py)
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,139 @@
+import os
+import threading
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from input_normalizer import is_url_input
+from verdict_cache import verdict_cache
+
+logger = logging.getLogger(__name__)
+
+# --- Batch Configuration (read from .env) ---
+BATCH_WORKER_THREADS = int(os.environ.get('BATCH_WORKER_THREADS', '32'))
+BATCH_MAX_IN_FLIGHT = int(os.environ.get('BATCH_MAX_IN_FLIGHT', '8'))
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', '1000'))
+# Text claims get their NER terms computed this many at a time, just before they are started
+BATCH_PREFETCH_SIZE = int(os.environ.get('BATCH_PREFETCH_SIZE', os.environ.get('NER_BATCH_SIZE', '64')))
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one execution.
+    Every caller asking for a key that is already running receives the same Future.
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor):
+        self._executor = executor
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(fn, *args, **kwargs)
+            self._inflight[key] = future
+
+        def _forget(done: Future) -> None:
+            with self._lock:
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+
+        future.add_done_callback(_forget)
+        return future
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+
+class BatchRunner:
+    """
+    Runs many claims through a processing function with a per-batch in-flight limit,
+    yielding results as each one finishes. Identical inputs (same claim fingerprint) are
+    processed once, both within a batch and across concurrently running batches with the same
+    force_refresh setting. prefetch_fn, if given, is called on the executor with the next
+    prefetch_size text claims that miss the verdict cache, and those claims start once it is done
+    (app.py passes nlp_processor.prefetch_key_medical_terms to batch their NER).
+    """
+
+    def __init__(self, process_fn: Callable[..., dict], worker_threads: int = BATCH_WORKER_THREADS,
+                 prefetch_fn: Optional[Callable[[List[str]], None]] = None,
+                 prefetch_size: int = BATCH_PREFETCH_SIZE):
+        self._process_fn = process_fn
+        self._prefetch_fn = prefetch_fn
+        self._prefetch_size = max(1, prefetch_size)
+        self._executor = ThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix="batch-claim")
+        self._single_flight = SingleFlight(self._executor)
+
+    def iter_results(self, inputs: List[str], max_in_flight: Optional[int] = None,
+                     force_refresh: bool = False) -> Iterator[Dict[str, Any]]:
+        """Yields one {"index", "input", "result" | "error"} record per input, in completion order."""
+        limit = max(1, min(max_in_flight or BATCH_MAX_IN_FLIGHT, BATCH_MAX_IN_FLIGHT))
+
+        # Group positions by fingerprint so duplicates inside the batch share one run
+        groups: Dict[str, List[int]] = {}
+        for index, raw_input in enumerate(inputs):
+            groups.setdefault(verdict_cache.key_for(raw_input), []).append(index)
+
+        pending_keys = deque(groups)
+        running: Dict[Future, str] = {}
+        prefetch: Optional[Future] = None
+        prefetched = 0
+
+        while pending_keys or running:
+            while pending_keys and len(running) < limit:
+                if self._prefetch_fn is not None and prefetched == 0:
+                    prefetch, prefetched = self._prefetch(inputs, groups, pending_keys, force_refresh)
+                key = pending_keys.popleft()
+                prefetched = max(0, prefetched - 1)
+                raw_input = inputs[groups[key][0]]
+                # A forced refresh must not be answered by a concurrent (possibly cached) normal run
+                flight_key = f"{key}:refresh" if force_refresh else key
+                future = self._single_flight.submit(flight_key, self._run_claim, raw_input, force_refresh,
+                                                    None if is_url_input(raw_input) else prefetch)
+                running[future] = key
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                key = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    logger.warning("Batch claim failed: %s", error)
+                for index in groups[key]:
+                    record = {"index": index, "input": inputs[index]}
+                    if error is not None:
+                        record["error"] = str(error)
+                    else:
+                        record["result"] = future.result()
+                    yield record
+
+    def _run_claim(self, raw_input: str, force_refresh: bool, prefetch: Optional[Future]) -> dict:
+        if prefetch is not None:
+            # Submitted to the executor before this claim, so it is already running or finished
+            wait([prefetch])
+        return self._process_fn(raw_input, force_refresh=force_refresh)
+
+    def _prefetch(self, inputs: List[str], groups: Dict[str, List[int]], pending_keys: deque,
+                  force_refresh: bool) -> Tuple[Future, int]:
+        """Starts prefetching the next prefetch_size pending keys on the executor; returns its future and the keys covered."""
+        upcoming = [(key, inputs[groups[key][0]]) for key in list(pending_keys)[:self._prefetch_size]]
+        texts = [(key, raw_input) for key, raw_input in upcoming if not is_url_input(raw_input)]
+        return self._executor.submit(self._run_prefetch, texts, force_refresh), len(upcoming)
+
+    def _run_prefetch(self, texts: List[Tuple[str, str]], force_refresh: bool) -> None:
+        try:
+            if not force_refresh:
+                # Cache hits never reach NER (this also warms the in-process tier for their lookup)
+                texts = [(key, raw_input) for key, raw_input in texts if verdict_cache.get(key) is None]
+            if texts:
+                self._prefetch_fn([raw_input for _, raw_input in texts])
+        except Exception as e:
+            # Each claim then runs its own NER as usual
+            logger.warning("Batch prefetch failed: %s", e)
+
+    def shutdown(self, wait_for_pending: bool = True) -> None:
+        self._executor.shutdown(wait=wait_for_pending)
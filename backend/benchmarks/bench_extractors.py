@@ -0,0 +1,93 @@
+# bench_extractors.py
+#
+# Compares the HTML content extractors (content_extractor.py) on saved HTML pages: parse time,
+# peak Python memory (tracemalloc) and how much text each one returns.
+#
+#   python benchmarks/bench_extractors.py [--fixtures DIR] [--scale 40] [--repeat 20]
+#
+# --scale N repeats each page's <body> N times to mimic large news pages (ads, comments, related
+# stories). Drop real saved pages (*.html) into the fixtures directory to benchmark on them too.
+
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from content_extractor import EXTRACTORS
+
+DEFAULT_FIXTURES = os.path.join(BACKEND_DIR, 'benchmarks', 'fixtures', 'html')
+STREAM_CHUNK_BYTES = 16384
+
+
+def scale_page(html: bytes, factor: int) -> bytes:
+    if factor <= 1:
+        return html
+    start = html.find(b'<body')
+    end = html.rfind(b'</body>')
+    if start == -1 or end == -1:
+        return html * factor
+    body_start = html.find(b'>', start) + 1
+    return html[:body_start] + html[body_start:end] * factor + html[end:]
+
+
+def as_stream(html: bytes):
+    """Feeds the page in network-sized chunks, like response.iter_content()."""
+    return (html[i:i + STREAM_CHUNK_BYTES] for i in range(0, len(html), STREAM_CHUNK_BYTES))
+
+
+def bench(extractor, html: bytes, repeat: int):
+    timings = []
+    text = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = extractor.extract(as_stream(html))
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    extractor.extract(as_stream(html))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'median_ms': statistics.median(timings) * 1000,
+        'p95_ms': sorted(timings)[max(0, int(len(timings) * 0.95) - 1)] * 1000,
+        'peak_kb': peak / 1024,
+        'chars': len(text),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML content extractors on saved pages.")
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES)
+    parser.add_argument('--scale', type=int, default=40, help="Repeat each page body N times.")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--extractors', default=','.join(EXTRACTORS))
+    args = parser.parse_args()
+
+    extractors = []
+    for name in args.extractors.split(','):
+        try:
+            extractor = EXTRACTORS[name]()
+            extractor.extract(b"<p>warm-up</p>")
+            extractors.append(extractor)
+        except ImportError as e:
+            print(f"skipping '{name}': {e}")
+
+    for path in sorted(glob.glob(os.path.join(args.fixtures, '*.html'))):
+        with open(path, 'rb') as f:
+            html = scale_page(f.read(), args.scale)
+        print(f"\n=== {os.path.basename(path)} ({len(html) / 1024:.0f} KB, scale={args.scale}) ===")
+        print(f"{'extractor':<10} {'median_ms':>10} {'p95_ms':>9} {'peak_KB':>9} {'chars':>8}")
+        for extractor in extractors:
+            row = bench(extractor, html, args.repeat)
+            print(f"{extractor.name:<10} {row['median_ms']:>10.2f} {row['p95_ms']:>9.2f} {row['peak_kb']:>9.0f} {row['chars']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+# bench_pipeline.py
+#
+# Offline end-to-end benchmark: replays a corpus of text claims and saved HTML pages through
+# verifier.process_claim() with deterministic stand-ins for Gemini, the proxy list site, target
+# websites and MongoDB (see offline_fakes.py). Runs without network access or API keys.
+#
+#   python benchmarks/bench_pipeline.py                                # single, concurrent, batch
+#   python benchmarks/bench_pipeline.py --modes concurrent --concurrency 16 --repeat 10
+#   python benchmarks/bench_pipeline.py --llm-latency-ms 800 --failure-rate 0.05
+#   python benchmarks/bench_pipeline.py --save baseline.json
+#   python benchmarks/bench_pipeline.py --baseline baseline.json --max-regression 0.15   # CI gate
+#
+# Each mode runs in a fresh interpreter so peak RSS and the caches are per mode. The corpus is
+# repeated --repeat times with distinct variants, so every item runs the full pipeline (no verdict
+# cache hits). The real spaCy model is loaded. LLM_REQUESTS_PER_MINUTE and the other gateway
+# settings come from the environment, so throughput reflects the deployed rate limits.
+# With --baseline, exits 1 if any mode's p95 rose or its throughput fell by more than
+# --max-regression (a fraction) against the saved report.
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CORPUS = os.path.join(BACKEND_DIR, 'benchmarks', 'fixtures', 'pipeline_corpus.json')
+MODES = ('single', 'concurrent', 'async', 'batch')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline process_claim() benchmark")
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--modes', default='single,concurrent,batch', help=f"comma-separated: {', '.join(MODES)}")
+    parser.add_argument('--repeat', type=int, default=3, help="corpus repetitions (each one a distinct variant)")
+    parser.add_argument('--concurrency', type=int, default=8, help="threads / in-flight claims for concurrent, async and batch")
+    parser.add_argument('--warmup', type=int, default=2, help="untimed claims before measuring")
+    parser.add_argument('--single-shot', action='store_true', help="merge style and verdict into one LLM call")
+    parser.add_argument('--llm-latency-ms', type=float, default=400.0)
+    parser.add_argument('--web-latency-ms', type=float, default=150.0, help="direct fetches of target sites")
+    parser.add_argument('--proxy-latency-ms', type=float, default=350.0, help="fetches through a proxy")
+    parser.add_argument('--mongo-latency-ms', type=float, default=5.0)
+    parser.add_argument('--latency-sigma', type=float, default=0.35, help="log-normal spread of injected latencies")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="fraction of LLM and HTTP calls that fail")
+    parser.add_argument('--proxies', type=int, default=20, help="rows in the fake proxy list")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--save', help="write the report to this JSON file")
+    parser.add_argument('--baseline', help="report saved earlier with --save to compare against")
+    parser.add_argument('--max-regression', type=float, default=0.15)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON instead of a table")
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def build_inputs(corpus, repeat):
+    """Text claims and page URLs, repeated as distinct variants so each input has its own fingerprint."""
+    inputs = []
+    for round_number in range(repeat):
+        for claim in corpus['claims']:
+            inputs.append(claim if round_number == 0 else f"{claim} (variant {round_number})")
+        for url in corpus['pages']:
+            inputs.append(url if round_number == 0 else f"{url}?page={round_number}")
+    return inputs
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(len(sorted_values) * fraction))
+    return sorted_values[rank - 1]
+
+
+def peak_rss_kb():
+    import resource
+    # ru_maxrss is KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+# --- Child: one mode in a fresh interpreter ---
+def run_child(args):
+    # Keep the run hermetic: no on-disk content cache, no semantic index, no Mongo-backed cache tier
+    os.environ.setdefault('CONTENT_CACHE_ENABLED', 'false')
+    os.environ.setdefault('SEMANTIC_CACHE_ENABLED', 'false')
+    os.environ.setdefault('VERDICT_CACHE_PERSISTENT', 'false')
+    os.environ.setdefault('MODEL_WARMUP_MODE', 'lazy')
+    os.environ.setdefault('BATCH_MAX_IN_FLIGHT', str(args.concurrency))
+
+    from telemetry import configure_logging
+    configure_logging(level=args.log_level.upper())
+
+    import offline_fakes
+    from model_registry import registry
+    import verifier
+    from batch_runner import BatchRunner
+    from claim_writer import claim_writer
+    from llm_gateway import PRIORITY_BATCH
+
+    with open(args.corpus, encoding='utf-8') as f:
+        corpus = json.load(f)
+
+    client, web, _ = offline_fakes.build_and_install(
+        offline_fakes.load_pages(corpus['pages']), llm_latency_ms=args.llm_latency_ms,
+        web_latency_ms=args.web_latency_ms, proxy_latency_ms=args.proxy_latency_ms,
+        mongo_latency_ms=args.mongo_latency_ms, sigma=args.latency_sigma, failure_rate=args.failure_rate,
+        proxy_count=args.proxies, seed=args.seed)
+
+    registry.warm_up(background=False)
+    single_shot = True if args.single_shot else None
+    for index in range(args.warmup):
+        verifier.process_claim(f"{corpus['claims'][index % len(corpus['claims'])]} (warm-up {index})",
+                               single_shot=single_shot)
+    claim_writer.flush(timeout=30)
+    rss_after_warmup_kb = peak_rss_kb()
+
+    inputs = build_inputs(corpus, args.repeat)
+    latencies = []
+    outcomes = {}
+    lock = threading.Lock()
+
+    def record(result, seconds):
+        if result.get('llm_judgment') == 'ERROR':
+            outcome = 'error'
+        else:
+            outcome = 'cache_hit' if result.get('cache_hit') else 'verified'
+        with lock:
+            latencies.append(seconds)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    def timed(raw_input, **kwargs):
+        started = time.perf_counter()
+        result = verifier.process_claim(raw_input, single_shot=single_shot, **kwargs)
+        record(result, time.perf_counter() - started)
+        return result
+
+    llm_calls_before, http_before = client.calls, web.requests
+    started = time.perf_counter()
+    if args.child == 'single':
+        for raw_input in inputs:
+            timed(raw_input)
+    elif args.child == 'concurrent':
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(timed, inputs))
+    elif args.child == 'async':
+        import asyncio
+
+        async def run_all():
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def one(raw_input):
+                async with semaphore:
+                    claim_started = time.perf_counter()
+                    result = await verifier.process_claim_async(raw_input, single_shot=single_shot)
+                    record(result, time.perf_counter() - claim_started)
+
+            await asyncio.gather(*(one(raw_input) for raw_input in inputs))
+
+        asyncio.run(run_all())
+    else:
+        runner = BatchRunner(lambda raw_input, force_refresh=False: timed(raw_input, force_refresh=force_refresh,
+                                                                          priority=PRIORITY_BATCH),
+                             worker_threads=args.concurrency)
+        for record in runner.iter_results(inputs, max_in_flight=args.concurrency):
+            if 'error' in record:
+                outcomes['exception'] = outcomes.get('exception', 0) + 1
+    elapsed = time.perf_counter() - started
+
+    flush_started = time.perf_counter()
+    claim_writer.flush(timeout=60)
+    writer_drain_seconds = time.perf_counter() - flush_started
+
+    ordered = sorted(latencies)
+    report = {
+        'mode': args.child,
+        'claims': len(inputs),
+        'concurrency': 1 if args.child == 'single' else args.concurrency,
+        'seconds': round(elapsed, 3),
+        'throughput_per_second': round(len(inputs) / elapsed, 3) if elapsed > 0 else None,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 1) if ordered else None,
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 1) if ordered else None,
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 1) if ordered else None,
+        'writer_drain_ms': round(writer_drain_seconds * 1000, 1),
+        'rss_after_warmup_kb': rss_after_warmup_kb,
+        'peak_rss_kb': peak_rss_kb(),
+        'llm_calls': client.calls - llm_calls_before,
+        'http_requests': web.requests - http_before,
+        'outcomes': outcomes,
+    }
+    print(json.dumps(report))
+
+
+# --- Parent: one child per mode, then report and gate ---
+def run_mode(mode):
+    command = [sys.executable, os.path.abspath(__file__)] + sys.argv[1:] + ['--child', mode]
+    completed = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        raise SystemExit(f"{mode} run failed with exit code {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare_to_baseline(reports, baseline, max_regression):
+    """Returns a list of human-readable regressions (empty when within budget)."""
+    previous = {report['mode']: report for report in baseline.get('modes', [])}
+    regressions = []
+    for report in reports:
+        before = previous.get(report['mode'])
+        if before is None:
+            continue
+        if before.get('p95_ms') and report['p95_ms'] > before['p95_ms'] * (1 + max_regression):
+            regressions.append(f"{report['mode']}: p95 {before['p95_ms']} ms -> {report['p95_ms']} ms")
+        if before.get('throughput_per_second') and \
+                report['throughput_per_second'] < before['throughput_per_second'] * (1 - max_regression):
+            regressions.append(f"{report['mode']}: throughput {before['throughput_per_second']}/s -> "
+                               f"{report['throughput_per_second']}/s")
+    return regressions
+
+
+def print_table(reports):
+    print(f"{'mode':<11} {'claims':>6} {'conc':>4} {'claims/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'peak RSS MB':>11} {'llm calls':>9}")
+    for r in reports:
+        print(f"{r['mode']:<11} {r['claims']:>6} {r['concurrency']:>4} {r['throughput_per_second']:>9} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['peak_rss_kb'] / 1024:>11.1f} {r['llm_calls']:>9}")
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        run_child(args)
+        return
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        raise SystemExit(f"Unknown mode(s): {', '.join(sorted(unknown))}")
+
+    reports = [run_mode(mode) for mode in modes]
+    summary = {
+        'settings': {key: value for key, value in vars(args).items()
+                     if key not in ('save', 'baseline', 'json', 'child', 'modes')},
+        'modes': reports,
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_table(reports)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(reports, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
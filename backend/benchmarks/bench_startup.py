@@ -0,0 +1,154 @@
+# bench_startup.py
+#
+# Startup benchmark: how long a worker takes to import the app and become ready, and how much
+# memory each worker holds.
+#
+#   python benchmarks/bench_startup.py --workers 4 --mode background
+#   python benchmarks/bench_startup.py --workers 4 --fork     # preload once, then fork workers
+#
+# "cold" runs start every worker as a fresh interpreter (what autoscaling does without preload).
+# "--fork" preloads models in one master and forks workers from it (gunicorn --preload); the
+# per-worker PSS column shows how much of the model memory is shared copy-on-write.
+# A placeholder MONGO_URI is used if none is set; PyMongo connects lazily so no server is needed.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READY_TIMEOUT_SECONDS = 120
+
+
+def read_memory_kb():
+    """Returns {'rss_kb', 'pss_kb'} for this process (PSS only where /proc exposes it)."""
+    memory = {'rss_kb': None, 'pss_kb': None}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Rss:'):
+                    memory['rss_kb'] = int(line.split()[1])
+                elif line.startswith('Pss:'):
+                    memory['pss_kb'] = int(line.split()[1])
+    except OSError:
+        import resource
+        # ru_maxrss is KB on Linux and bytes on macOS; this is the peak, not current, RSS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory['rss_kb'] = peak // 1024 if sys.platform == 'darwin' else peak
+    return memory
+
+
+def wait_until_ready(registry, timeout=READY_TIMEOUT_SECONDS):
+    start = time.perf_counter()
+    while not registry.is_ready():
+        if time.perf_counter() - start > timeout:
+            break
+        time.sleep(0.01)
+    return time.perf_counter() - start
+
+
+def child_cold():
+    """Runs inside a fresh interpreter: import the app, wait for readiness, report JSON."""
+    sys.path.insert(0, BACKEND_DIR)
+    start = time.perf_counter()
+    import app  # noqa: F401  (import cost is what we measure)
+    import_seconds = time.perf_counter() - start
+    after_import = read_memory_kb()
+
+    from model_registry import registry
+    registry.warm_up(background=False)
+    ready_seconds = wait_until_ready(registry)
+    after_ready = read_memory_kb()
+
+    print(json.dumps({
+        'import_seconds': import_seconds,
+        'ready_seconds': import_seconds + ready_seconds,
+        'rss_after_import_kb': after_import['rss_kb'],
+        'rss_ready_kb': after_ready['rss_kb'],
+        'pss_ready_kb': after_ready['pss_kb'],
+    }))
+
+
+def run_cold(workers, mode):
+    env = dict(os.environ, MODEL_WARMUP_MODE=mode)
+    env.setdefault('MONGO_URI', 'mongodb://localhost:27017/medverify_bench')
+    rows = []
+    for _ in range(workers):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child-cold'],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        rows.append(json.loads(output.strip().splitlines()[-1]))
+    return rows
+
+
+def run_fork(workers):
+    os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017/medverify_bench')
+    os.environ['MODEL_WARMUP_MODE'] = 'preload'
+    sys.path.insert(0, BACKEND_DIR)
+
+    start = time.perf_counter()
+    import app  # noqa: F401
+    master_ready_seconds = time.perf_counter() - start
+    print(f"master: preloaded in {master_ready_seconds:.2f}s, memory={read_memory_kb()}")
+
+    rows = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            from nlp_processor import extract_key_medical_terms
+            fork_start = time.perf_counter()
+            extract_key_medical_terms("Does vitamin C cure the common cold?")
+            first_call_seconds = time.perf_counter() - fork_start
+            memory = read_memory_kb()
+            with os.fdopen(write_fd, 'w') as pipe:
+                pipe.write(json.dumps({
+                    'import_seconds': 0.0,
+                    'ready_seconds': first_call_seconds,
+                    'rss_after_import_kb': None,
+                    'rss_ready_kb': memory['rss_kb'],
+                    'pss_ready_kb': memory['pss_kb'],
+                }))
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            rows.append(json.loads(pipe.read()))
+        os.waitpid(pid, 0)
+    return rows
+
+
+def print_rows(title, rows):
+    print(f"\n--- {title} ---")
+    print(f"{'worker':>6} {'import_s':>9} {'ready_s':>8} {'rss_import_MB':>14} {'rss_ready_MB':>13} {'pss_ready_MB':>13}")
+
+    def mb(kb):
+        return f"{kb / 1024:.1f}" if kb else "-"
+
+    for i, row in enumerate(rows):
+        print(f"{i:>6} {row['import_seconds']:>9.3f} {row['ready_seconds']:>8.3f} "
+              f"{mb(row['rss_after_import_kb']):>14} {mb(row['rss_ready_kb']):>13} {mb(row['pss_ready_kb']):>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure worker import time, time-to-ready and memory.")
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--mode', default='lazy', choices=['lazy', 'background', 'preload'],
+                        help="MODEL_WARMUP_MODE for cold workers.")
+    parser.add_argument('--fork', action='store_true', help="Preload in one master and fork workers from it.")
+    parser.add_argument('--child-cold', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_cold:
+        child_cold()
+    elif args.fork:
+        print_rows(f"forked workers (preloaded master), n={args.workers}", run_fork(args.workers))
+    else:
+        print_rows(f"cold workers (MODEL_WARMUP_MODE={args.mode}), n={args.workers}", run_cold(args.workers, args.mode))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# compare_llm_modes.py
+#
+# Runs every fixture claim through the two-call pipeline (analyze_text_style + get_grounded_verdict)
+# and the single-shot pipeline (get_combined_verdict), then reports how often the two modes agree.
+# Uses the live Gemini API (GEMINI_API_KEY from .env); nothing is cached or saved to MongoDB.
+#
+#   python benchmarks/compare_llm_modes.py [--fixtures PATH] [--score-tolerance 15] [--min-agreement 0.8]
+
+import argparse
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(BACKEND_DIR, '.env'))
+
+from verifier import verify_claim_uncached
+
+DEFAULT_FIXTURES = os.path.join(BACKEND_DIR, 'benchmarks', 'fixtures', 'llm_mode_claims.json')
+
+
+def compare(fixtures, score_tolerance):
+    rows = []
+    for fixture in fixtures:
+        claim = fixture['input']
+
+        start = time.perf_counter()
+        two_call = verify_claim_uncached(claim, single_shot=False)
+        two_call_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        single_shot = verify_claim_uncached(claim, single_shot=True)
+        single_shot_seconds = time.perf_counter() - start
+
+        score_delta = abs(two_call['credibility_score'] - single_shot['credibility_score'])
+        rows.append({
+            'input': claim,
+            'expected': fixture.get('expected_verdict'),
+            'two_call_verdict': two_call['llm_judgment'],
+            'single_shot_verdict': single_shot['llm_judgment'],
+            'two_call_score': two_call['credibility_score'],
+            'single_shot_score': single_shot['credibility_score'],
+            'verdict_match': two_call['llm_judgment'] == single_shot['llm_judgment'],
+            'score_within_tolerance': score_delta <= score_tolerance,
+            'two_call_seconds': two_call_seconds,
+            'single_shot_seconds': single_shot_seconds,
+        })
+    return rows
+
+
+def summarize(rows):
+    total = len(rows) or 1
+    summary = {
+        'claims': len(rows),
+        'verdict_agreement': sum(r['verdict_match'] for r in rows) / total,
+        'score_agreement': sum(r['score_within_tolerance'] for r in rows) / total,
+        'two_call_mean_seconds': sum(r['two_call_seconds'] for r in rows) / total,
+        'single_shot_mean_seconds': sum(r['single_shot_seconds'] for r in rows) / total,
+    }
+    labelled = [r for r in rows if r['expected']]
+    if labelled:
+        summary['two_call_expected_accuracy'] = sum(r['two_call_verdict'] == r['expected'] for r in labelled) / len(labelled)
+        summary['single_shot_expected_accuracy'] = sum(r['single_shot_verdict'] == r['expected'] for r in labelled) / len(labelled)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two-call and single-shot LLM modes on a fixture set.")
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES)
+    parser.add_argument('--score-tolerance', type=int, default=15, help="Max credibility_score difference counted as agreement.")
+    parser.add_argument('--min-agreement', type=float, default=0.8, help="Exit non-zero if verdict agreement falls below this.")
+    parser.add_argument('--json', action='store_true', help="Print per-claim rows and the summary as JSON.")
+    args = parser.parse_args()
+
+    with open(args.fixtures) as f:
+        fixtures = json.load(f)
+
+    rows = compare(fixtures, args.score_tolerance)
+    summary = summarize(rows)
+
+    if args.json:
+        print(json.dumps({'rows': rows, 'summary': summary}, indent=2))
+    else:
+        for r in rows:
+            mark = 'OK ' if r['verdict_match'] and r['score_within_tolerance'] else 'DIFF'
+            print(f"[{mark}] {r['input'][:60]:<60} two-call={r['two_call_verdict']}/{r['two_call_score']} "
+                  f"single-shot={r['single_shot_verdict']}/{r['single_shot_score']}")
+        print("\n--- Summary ---")
+        for key, value in summary.items():
+            print(f"  {key}: {value:.3f}" if isinstance(value, float) else f"  {key}: {value}")
+
+    sys.exit(0 if summary['verdict_agreement'] >= args.min_agreement else 1)
+
+
+if __name__ == '__main__':
+    main()
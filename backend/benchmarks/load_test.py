@@ -0,0 +1,146 @@
+# load_test.py
+#
+# Closed-loop HTTP load test: at each concurrency level, that many clients POST distinct claims to
+# /medverify/check back to back for --duration seconds. Reports completed requests/s, p50/p95/p99
+# latency and errors per target, so serving setups can be compared at equal load. Uses only the
+# standard library.
+#
+# Dev server vs gunicorn on the offline app (no Gemini, proxies or MongoDB needed):
+#
+#   python benchmarks/offline_app.py --port 5001 &
+#   gunicorn -c gunicorn.conf.py --pythonpath benchmarks --bind 127.0.0.1:5002 offline_app:app &
+#   python benchmarks/load_test.py --target dev=http://127.0.0.1:5001 \
+#       --target gunicorn=http://127.0.0.1:5002 --concurrency 1,8,32,64 --duration 30
+#
+# Run both servers with the same BENCH_* latencies, and record the host, WEB_CONCURRENCY and
+# GUNICORN_THREADS alongside any numbers you publish.
+
+import argparse
+import itertools
+import json
+import math
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS = os.path.join(BACKEND_DIR, 'benchmarks', 'fixtures', 'pipeline_corpus.json')
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(1, math.ceil(len(sorted_values) * fraction)) - 1]
+
+
+def wait_until_ready(base_url, timeout):
+    """Polls /readyz until it answers 200 (models loaded) or timeout elapses."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/readyz", timeout=5) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(1)
+    return False
+
+
+def post_claim(url, claim, timeout):
+    body = json.dumps({"input": claim}).encode('utf-8')
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+        return response.status
+
+
+def run_level(base_url, path, claims, concurrency, duration, timeout):
+    """One closed-loop run; every request uses a distinct claim so none is a verdict cache hit."""
+    url = f"{base_url}{path}"
+    # Unique per run: earlier levels and targets must not have verified (and cached) these claims
+    run_id = uuid.uuid4().hex[:8]
+    sequence = itertools.count()
+    latencies, errors = [], {}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client():
+        while time.monotonic() < stop_at:
+            n = next(sequence)
+            claim = f"{claims[n % len(claims)]} (load {run_id}-{n})"
+            started = time.perf_counter()
+            try:
+                status = post_claim(url, claim, timeout)
+                error = None if status == 200 else f"HTTP {status}"
+            except urllib.error.HTTPError as e:
+                error = f"HTTP {e.code}"
+            except (urllib.error.URLError, OSError) as e:
+                error = type(getattr(e, 'reason', e)).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                if error is None:
+                    latencies.append(elapsed)
+                else:
+                    errors[error] = errors.get(error, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(client) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        'concurrency': concurrency,
+        'completed': len(ordered),
+        'errors': errors,
+        'seconds': round(elapsed, 2),
+        'requests_per_second': round(len(ordered) / elapsed, 2) if elapsed > 0 else None,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 1) if ordered else None,
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 1) if ordered else None,
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 1) if ordered else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop load test for /medverify/check")
+    parser.add_argument('--target', action='append', required=True, help="name=base URL (repeatable)")
+    parser.add_argument('--path', default='/medverify/check', help="e.g. /medverify/check/async")
+    parser.add_argument('--concurrency', default='1,8,32', help="comma-separated client counts")
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds per concurrency level")
+    parser.add_argument('--timeout', type=float, default=60.0, help="per-request client timeout")
+    parser.add_argument('--ready-timeout', type=float, default=120.0)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding='utf-8') as f:
+        claims = json.load(f)['claims']
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+
+    results = []
+    for target in args.target:
+        name, _, base_url = target.partition('=')
+        base_url = (base_url or name).rstrip('/')
+        if not wait_until_ready(base_url, args.ready_timeout):
+            raise SystemExit(f"{name}: {base_url}/readyz did not report ready within {args.ready_timeout:.0f}s")
+        for level in levels:
+            result = dict(run_level(base_url, args.path, claims, level, args.duration, args.timeout), target=name)
+            results.append(result)
+            if not args.json:
+                print(f"{name:<12} conc={level:<4} {result['requests_per_second']!s:>8} req/s  "
+                      f"p50={result['p50_ms']} p95={result['p95_ms']} p99={result['p99_ms']} ms  "
+                      f"errors={sum(result['errors'].values())}", flush=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# offline_app.py
+#
+# The real Flask app with Gemini, the proxy list site, target websites and MongoDB replaced by the
+# stand-ins from offline_fakes.py, so the HTTP serving layer can be load-tested without network
+# access or API keys. Injected latencies come from BENCH_* environment variables.
+#
+#   python benchmarks/offline_app.py --port 5001                      # dev server, as app.py runs it
+#   gunicorn -c gunicorn.conf.py --pythonpath benchmarks --bind 127.0.0.1:5002 offline_app:app
+
+import argparse
+import json
+import os
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+# PyMongo connects lazily and every collection call goes to the in-memory stand-in
+os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017/medverify_bench')
+os.environ.setdefault('CONTENT_CACHE_ENABLED', 'false')
+os.environ.setdefault('SEMANTIC_CACHE_ENABLED', 'false')
+os.environ.setdefault('VERDICT_CACHE_PERSISTENT', 'false')
+
+import offline_fakes
+
+with open(os.environ.get('BENCH_CORPUS', os.path.join(BENCHMARKS_DIR, 'fixtures', 'pipeline_corpus.json')),
+          encoding='utf-8') as _f:
+    _corpus = json.load(_f)
+
+offline_fakes.build_and_install(
+    offline_fakes.load_pages(_corpus['pages']),
+    llm_latency_ms=float(os.environ.get('BENCH_LLM_LATENCY_MS', '400')),
+    web_latency_ms=float(os.environ.get('BENCH_WEB_LATENCY_MS', '150')),
+    proxy_latency_ms=float(os.environ.get('BENCH_PROXY_LATENCY_MS', '350')),
+    mongo_latency_ms=float(os.environ.get('BENCH_MONGO_LATENCY_MS', '5')),
+    failure_rate=float(os.environ.get('BENCH_FAILURE_RATE', '0')),
+    seed=int(os.environ.get('BENCH_SEED', '1')),
+)
+
+from app import app  # noqa: E402  (imported after the stand-ins are installed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the app offline on the Flask dev server")
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--debug', action='store_true', help="debug mode, as app.py's dev server runs")
+    args = parser.parse_args()
+    app.run(debug=args.debug, port=args.port, use_reloader=False)
@@ -0,0 +1,333 @@
+# offline_fakes.py
+#
+# Deterministic, latency-injectable stand-ins for everything process_claim() reaches over the
+# network: the Gemini client, the proxy list site, target websites and MongoDB. install() swaps
+# them into the already imported backend modules, so the real pipeline code (NER, extraction,
+# caches, gateway, writer) runs unchanged with no network access.
+#
+# Responses are derived from a hash of the prompt, so the same corpus always yields the same
+# verdicts; latencies are drawn from a seeded log-normal around the configured median.
+
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from itertools import count
+from typing import Dict, Optional
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+VERDICTS = ('Supported', 'Contradicted', 'Unsupported/Neutral')
+SOURCES = ('WHO', 'NIH', 'CDC', 'Cochrane Review', 'Mayo Clinic')
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha1(text.encode('utf-8')).digest()[:8], 'big')
+
+
+class LatencyModel:
+    """Seeded log-normal delays (median_ms, sigma) plus an optional failure rate."""
+
+    def __init__(self, median_ms: float = 0.0, sigma: float = 0.35, failure_rate: float = 0.0, seed: int = 0):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Returns (delay_seconds, should_fail)."""
+        with self._lock:
+            noise = self._random.gauss(0.0, self.sigma)
+            fail = self._random.random() < self.failure_rate
+        return (self.median_ms * math.exp(noise)) / 1000.0 if self.median_ms > 0 else 0.0, fail
+
+    def wait(self) -> bool:
+        delay, fail = self.draw()
+        if delay:
+            time.sleep(delay)
+        return fail
+
+
+# --- Gemini ---
+class _Usage:
+    def __init__(self, total_token_count: int):
+        self.total_token_count = total_token_count
+
+
+class FakeGenerateResponse:
+    def __init__(self, payload: dict, tokens: int):
+        self.text = json.dumps(payload)
+        self.usage_metadata = _Usage(tokens)
+
+
+class FakeAPIError(Exception):
+    """Looks like a google-genai 503 to llm_gateway.is_retryable_error()."""
+
+    def __init__(self, code: int = 503):
+        super().__init__(f"{code} UNAVAILABLE (injected by offline benchmark)")
+        self.code = code
+
+
+class _FakeModels:
+    def __init__(self, client: "FakeGenaiClient"):
+        self._client = client
+
+    def generate_content(self, model: str, contents, config=None) -> FakeGenerateResponse:
+        return self._client.respond(contents, config)
+
+
+class FakeGenaiClient:
+    """Replaces genai.Client: answers style, verdict and combined calls by the requested schema."""
+
+    def __init__(self, latency: Optional[LatencyModel] = None):
+        self.latency = latency or LatencyModel()
+        self.models = _FakeModels(self)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def respond(self, contents, config) -> FakeGenerateResponse:
+        with self._lock:
+            self.calls += 1
+        if self.latency.wait():
+            raise FakeAPIError()
+
+        prompt = " ".join(str(part) for part in contents) if isinstance(contents, (list, tuple)) else str(contents)
+        schema = getattr(config, 'response_schema', None)
+        fields = set(getattr(schema, 'properties', None) or ())
+        seed = _digest(prompt)
+
+        payload = {}
+        if 'sensationalism_score' in fields:
+            payload['sensationalism_score'] = min(10, prompt.count('!') * 2 + sum(w.isupper() for w in prompt.split()) + seed % 3)
+        if 'verdict' in fields:
+            payload.update({
+                'verdict': VERDICTS[seed % len(VERDICTS)],
+                'trusted_source': SOURCES[(seed >> 8) % len(SOURCES)],
+                'reasoning': "Offline benchmark verdict derived from the prompt hash.",
+                'score_base': 10 + (seed >> 16) % 81,
+            })
+        return FakeGenerateResponse(payload, len(prompt) // 4 + 60)
+
+
+# --- HTTP (proxy list site and target websites) ---
+class FakeResponse:
+    def __init__(self, url: str, body: bytes, status_code: int = 200, headers: Optional[Dict[str, str]] = None):
+        self.url = url
+        self.content = body
+        self.status_code = status_code
+        self.headers = headers or {'Content-Type': 'text/html; charset=utf-8'}
+
+    def iter_content(self, chunk_size: int = 8192):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(f"{self.status_code} for url: {self.url}", response=self)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def proxy_table_html(proxy_count: int) -> bytes:
+    rows = "".join(f"<tr><td>10.0.{i // 250}.{i % 250 + 1}</td><td>8080</td><td>US</td></tr>" for i in range(proxy_count))
+    return f"<html><body><table id='proxylisttable'><tbody>{rows}</tbody></table></body></html>".encode('utf-8')
+
+
+class FakeWeb:
+    """
+    Replaces http_pool: serves a proxy table for the proxy list site and saved HTML pages for
+    target URLs (unknown URLs get a page picked by URL hash). Direct and proxied requests draw
+    from separate latency models; injected failures surface as requests ConnectionErrors.
+    """
+
+    def __init__(self, pages: Dict[str, bytes], proxy_list_url: str, proxy_count: int = 20,
+                 direct_latency: Optional[LatencyModel] = None, proxy_latency: Optional[LatencyModel] = None):
+        if not pages:
+            raise ValueError("FakeWeb needs at least one saved page")
+        self.pages = pages
+        self._page_bodies = [pages[url] for url in sorted(pages)]
+        self.proxy_list_url = proxy_list_url
+        self.proxy_table = proxy_table_html(proxy_count)
+        self.direct_latency = direct_latency or LatencyModel()
+        self.proxy_latency = proxy_latency or LatencyModel()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def get(self, url: str, proxies=None, **kwargs) -> FakeResponse:
+        with self._lock:
+            self.requests += 1
+        if url == self.proxy_list_url:
+            return FakeResponse(url, self.proxy_table)
+        if (self.proxy_latency if proxies else self.direct_latency).wait():
+            import requests
+            raise requests.exceptions.ConnectionError(f"Injected connection failure for {url}")
+        body = self.pages.get(url) or self._page_bodies[_digest(url) % len(self._page_bodies)]
+        return FakeResponse(url, body)
+
+    def close_all(self) -> None:
+        pass
+
+
+def load_pages(page_map: Dict[str, str]) -> Dict[str, bytes]:
+    """{url: file name under fixtures/html} -> {url: bytes}."""
+    pages = {}
+    for url, name in page_map.items():
+        with open(os.path.join(FIXTURES_DIR, 'html', name), 'rb') as f:
+            pages[url] = f.read()
+    return pages
+
+
+# --- MongoDB ---
+class _InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+
+class _BulkWriteResult:
+    def __init__(self, matched: int, upserted: int, inserted: int):
+        self.matched_count = matched
+        self.upserted_count = upserted
+        self.inserted_count = inserted
+
+
+class InMemoryCollection:
+    """
+    Just enough of a pymongo Collection for the write path and the verdict cache's persistent tier:
+    documents are kept by claim_fingerprint (the latest one wins) and find_one() matches on it.
+    Upserts by _id (the analytics rollups) keep one document per _id; their $inc counters are not summed.
+    """
+
+    def __init__(self, latency: LatencyModel):
+        self.latency = latency
+        self._documents: Dict[str, dict] = {}
+        self._ids = count(1)
+        self._lock = threading.Lock()
+
+    def _store(self, document: dict) -> int:
+        document.setdefault('_id', next(self._ids))
+        self._documents[document.get('claim_fingerprint') or f"_id:{document['_id']}"] = document
+        return document['_id']
+
+    def insert_one(self, document: dict):
+        self.latency.wait()
+        with self._lock:
+            return _InsertManyResult([self._store(document)])
+
+    def insert_many(self, documents, ordered: bool = True):
+        self.latency.wait()
+        with self._lock:
+            return _InsertManyResult([self._store(document) for document in documents])
+
+    def bulk_write(self, requests, ordered: bool = True):
+        self.latency.wait()
+        matched = upserted = inserted = 0
+        with self._lock:
+            for request in requests:
+                operation = getattr(request, '_doc', None)
+                if operation is not None and getattr(request, '_filter', None) is None:
+                    self._store(dict(operation))
+                    inserted += 1
+                    continue
+                fingerprint = request._filter.get('claim_fingerprint')
+                if fingerprint is None and '_id' in request._filter:
+                    fingerprint = f"_id:{request._filter['_id']}"
+                existing = self._documents.get(fingerprint)
+                if existing is not None:
+                    existing.update(request._doc.get('$set', {}))
+                    existing['hit_count'] = existing.get('hit_count', 0) + request._doc.get('$inc', {}).get('hit_count', 0)
+                    matched += 1
+                elif getattr(request, '_upsert', False):
+                    document = dict(request._doc.get('$setOnInsert', {}), **request._doc.get('$set', {}))
+                    document['claim_fingerprint'] = fingerprint
+                    document['hit_count'] = request._doc.get('$inc', {}).get('hit_count', 0)
+                    self._store(document)
+                    upserted += 1
+        return _BulkWriteResult(matched, upserted, inserted)
+
+    def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        self.latency.wait()
+        fingerprint = (filter or {}).get('claim_fingerprint')
+        with self._lock:
+            document = self._documents.get(fingerprint)
+            if document is None:
+                return None
+            cutoff = (filter.get('timestamp') or {}).get('$gte')
+            if cutoff is not None and document.get('timestamp') and document['timestamp'] < cutoff:
+                return None
+            return {key: value for key, value in document.items() if key != '_id'}
+
+    def create_index(self, keys, **kwargs) -> str:
+        return kwargs.get('name', 'index')
+
+    def count_documents(self, filter=None, **kwargs) -> int:
+        with self._lock:
+            return len(self._documents)
+
+
+class InMemoryDatabase:
+    def __init__(self, latency: Optional[LatencyModel] = None):
+        self.latency = latency or LatencyModel()
+        self._collections: Dict[str, InMemoryCollection] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = InMemoryCollection(self.latency)
+            return self._collections[name]
+
+
+def make_database(latency: Optional[LatencyModel] = None, prefer_mongomock: bool = True):
+    """mongomock when installed (full query semantics, no latency injection), else InMemoryDatabase."""
+    if prefer_mongomock and not (latency and latency.median_ms):
+        try:
+            import mongomock
+            return mongomock.MongoClient()['medverify_bench']
+        except ImportError:
+            pass
+    return InMemoryDatabase(latency)
+
+
+# --- Wiring ---
+def install(client: FakeGenaiClient, web: FakeWeb, database) -> None:
+    """Points the imported backend modules at the stand-ins (call after importing verifier)."""
+    import db_utils
+    import proxy_manager
+    import scraper
+    from llm_gateway import GEMINI_CLIENT_NAME
+    from model_registry import registry
+
+    registry.override(GEMINI_CLIENT_NAME, client)
+    scraper.http_pool = web
+    proxy_manager.http_pool = web
+    proxy_manager.PROXY_LIST_URL = web.proxy_list_url
+    db_utils._get_db = lambda: database
+
+
+def build_and_install(pages: Dict[str, bytes], llm_latency_ms: float = 400.0, web_latency_ms: float = 150.0,
+                      proxy_latency_ms: float = 350.0, mongo_latency_ms: float = 5.0, sigma: float = 0.35,
+                      failure_rate: float = 0.0, proxy_count: int = 20, seed: int = 1):
+    """Builds the three stand-ins with independent seeded latency models, installs them, returns them."""
+    import proxy_manager
+
+    def latency(median_ms, offset, rate=failure_rate):
+        return LatencyModel(median_ms, sigma, rate, seed=seed * 100 + offset)
+
+    client = FakeGenaiClient(latency(llm_latency_ms, 1))
+    web = FakeWeb(pages, proxy_manager.PROXY_LIST_URL, proxy_count=proxy_count,
+                  direct_latency=latency(web_latency_ms, 2), proxy_latency=latency(proxy_latency_ms, 3))
+    database = make_database(latency(mongo_latency_ms, 4, rate=0.0))
+    install(client, web, database)
+    return client, web, database
@@ -0,0 +1,179 @@
+import logging
+import os
+import re
+from typing import List, Optional
+
+import nlp_processor
+from input_normalizer import claim_fingerprint
+from telemetry import timed_stage
+
+logger = logging.getLogger(__name__)
+
+# --- Claim Extraction Configuration (read from .env) ---
+# URL inputs: verify the article's most salient checkable sentences instead of one blended verdict
+CLAIM_EXTRACTION_ENABLED = os.environ.get('CLAIM_EXTRACTION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+CLAIM_MAX_CLAIMS = int(os.environ.get('CLAIM_MAX_CLAIMS', '4'))
+# Total prompt tokens (~4 characters each) allowed across all selected claims of one article
+CLAIM_TOKEN_BUDGET = int(os.environ.get('CLAIM_TOKEN_BUDGET', '400'))
+CLAIM_MIN_CHARS = int(os.environ.get('CLAIM_MIN_CHARS', '40'))
+CLAIM_MAX_CHARS = int(os.environ.get('CLAIM_MAX_CHARS', '400'))
+# Sentences below this salience are never sent, even if the budget has room
+CLAIM_MIN_SALIENCE = float(os.environ.get('CLAIM_MIN_SALIENCE', '2.0'))
+
+# Per-claim prompt overhead: the "Verify claim: ..." wrapper and focus terms
+CLAIM_PROMPT_OVERHEAD_TOKENS = 20
+
+MEDICAL_CUE_WORDS = {
+    'vaccine', 'vaccines', 'vaccination', 'virus', 'viral', 'bacteria', 'infection', 'infections', 'disease',
+    'diseases', 'cancer', 'tumor', 'tumour', 'diabetes', 'autism', 'heart', 'stroke', 'blood', 'pressure',
+    'cholesterol', 'liver', 'kidney', 'immune', 'immunity', 'antibiotic', 'antibiotics', 'drug', 'drugs',
+    'medication', 'medicine', 'dose', 'doses', 'treatment', 'therapy', 'symptoms', 'patients', 'clinical',
+    'trial', 'study', 'studies', 'cohort', 'placebo', 'risk', 'mortality', 'death', 'deaths', 'covid-19',
+    'covid', 'flu', 'influenza', 'measles', 'vitamin', 'supplement', 'supplements', 'diet', 'obesity',
+    'pregnancy', 'detox', 'toxins', 'inflammation', 'surgery', 'screening', 'fda', 'who', 'cdc', 'nih',
+}
+# Verbs and phrases that make a sentence an assertion that can be checked against evidence
+CLAIM_CUE_PATTERN = re.compile(
+    r"\b(cause[sd]?|causing|cure[sd]?|prevent(s|ed)?|reduce[sd]?|lower(s|ed)?|increase[sd]?|raise[sd]?|"
+    r"treat(s|ed)?|linked|associated|effective|ineffective|safe|unsafe|harmful|protect(s|ed)?|"
+    r"kill(s|ed)?|boost(s|ed)?|reverse[sd]?|no (increased )?risk|risk of|leads? to|results? in|"
+    r"does not|do not|cannot|found)\b",
+    re.IGNORECASE,
+)
+FIRST_PERSON_PATTERN = re.compile(r"^\s*(i|we|my|our)\b", re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r"\d")
+
+
+class ExtractedClaim:
+    """One checkable sentence of an article, its own search terms and its salience score."""
+
+    def __init__(self, text: str, search_terms: List[str], salience: float, position: int):
+        self.text = text
+        self.search_terms = search_terms
+        self.salience = salience
+        self.position = position
+
+    @property
+    def tokens(self) -> int:
+        return len(self.text) // 4 + CLAIM_PROMPT_OVERHEAD_TOKENS
+
+    def as_dict(self) -> dict:
+        return {'claim': self.text, 'extracted_terms': self.search_terms,
+                'salience': round(self.salience, 2), 'position': self.position}
+
+
+def _sentence_spans(docs) -> list:
+    """
+    Sentences of the NER docs. The dependency parser is excluded from the shared pipeline, so the
+    model's lightweight 'senter' component (disabled by default) sets the boundaries; without it,
+    each doc falls back to newline/punctuation splitting.
+    """
+    model = nlp_processor.NLP_MODEL
+    senter = model.get_pipe('senter') if 'senter' in model.component_names else None
+    spans = []
+    for doc in docs:
+        if senter is not None:
+            spans.extend(senter(doc).sents)
+            continue
+        start = 0
+        for token in doc:
+            if token.text in ('.', '!', '?') or '\n' in token.whitespace_ + token.text:
+                spans.append(doc[start:token.i + 1])
+                start = token.i + 1
+        if start < len(doc):
+            spans.append(doc[start:])
+    return spans
+
+
+def _salience(sentence, article_terms: set) -> float:
+    """
+    Medical salience of one sentence: hits on the article's key terms and on medical vocabulary,
+    entities, and a bonus for claim-like verbs and figures. Questions and first-person asides score 0.
+    """
+    text = sentence.text.strip()
+    if text.endswith('?') or FIRST_PERSON_PATTERN.match(text):
+        return 0.0
+    words = [token.lower_ for token in sentence if not token.is_punct]
+    term_hits = sum(1 for token in sentence if token.text in article_terms)
+    medical_hits = sum(1 for word in words if word in MEDICAL_CUE_WORDS)
+    score = 1.5 * term_hits + 1.0 * min(medical_hits, 4) + 0.5 * len(sentence.ents)
+    if CLAIM_CUE_PATTERN.search(text):
+        score += 2.0
+    else:
+        # Descriptive sentences without an assertion are hard to check
+        score *= 0.5
+    if NUMBER_PATTERN.search(text):
+        score += 0.5
+    return score
+
+
+@timed_stage("claim_extraction")
+def extract_claims(text: str, max_claims: int = CLAIM_MAX_CLAIMS,
+                   token_budget: int = CLAIM_TOKEN_BUDGET) -> List[ExtractedClaim]:
+    """
+    Splits scraped text into sentences with the shared spaCy pipeline, ranks them by medical
+    salience and returns the top checkable ones (most salient first) whose prompts fit token_budget.
+    Returns [] if the model is unavailable or nothing checkable was found.
+    """
+    nlp_processor.load_nlp_model()
+    if nlp_processor.NLP_MODEL is None or not text:
+        return []
+
+    docs = list(nlp_processor.NLP_MODEL.pipe(nlp_processor._chunk_text(text), batch_size=nlp_processor.NER_BATCH_SIZE))
+    article_terms = set(nlp_processor._key_terms_from_docs(docs))
+
+    candidates = []
+    seen = set()
+    for position, sentence in enumerate(_sentence_spans(docs)):
+        sentence_text = " ".join(sentence.text.split())
+        if not CLAIM_MIN_CHARS <= len(sentence_text) <= CLAIM_MAX_CHARS:
+            continue
+        fingerprint = claim_fingerprint(sentence_text)
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        salience = _salience(sentence, article_terms)
+        if salience >= CLAIM_MIN_SALIENCE:
+            candidates.append(ExtractedClaim(sentence_text, nlp_processor._key_terms_from_docs([sentence]),
+                                             salience, position))
+
+    # Most salient first; earlier sentences (the lede) win ties
+    candidates.sort(key=lambda claim: (-claim.salience, claim.position))
+    selected: List[ExtractedClaim] = []
+    spent = 0
+    for claim in candidates:
+        if len(selected) >= max_claims:
+            break
+        if spent + claim.tokens > token_budget:
+            continue
+        selected.append(claim)
+        spent += claim.tokens
+    logger.info("Claim extraction: %d of %d candidate sentences selected (%d tokens)",
+                len(selected), len(candidates), spent)
+    return selected
+
+
+def aggregate_article_score(claim_results: List[dict]) -> Optional[dict]:
+    """
+    Salience-weighted article summary of per-claim results (errors excluded): the weighted mean
+    credibility score and the verdict carrying the most weight. None if no claim was verified.
+    """
+    verified = [result for result in claim_results if result.get('llm_judgment') != 'ERROR']
+    if not verified:
+        return None
+    total_weight = sum(max(result['salience'], 0.1) for result in verified)
+    score = sum(result['credibility_score'] * max(result['salience'], 0.1) for result in verified) / total_weight
+
+    weight_by_verdict = {}
+    for result in verified:
+        weight_by_verdict[result['llm_judgment']] = weight_by_verdict.get(result['llm_judgment'], 0.0) + \
+            max(result['salience'], 0.1)
+    verdict = max(weight_by_verdict, key=weight_by_verdict.get)
+    lead = next(result for result in verified if result['llm_judgment'] == verdict)
+    counts = ", ".join(f"{sum(1 for r in verified if r['llm_judgment'] == v)} {v}" for v in weight_by_verdict)
+    return {
+        'credibility_score': min(100, max(0, round(score))),
+        'llm_judgment': verdict,
+        'trusted_reference': lead.get('trusted_reference', 'N/A'),
+        'reasoning': f"{len(verified)} claim(s) checked ({counts}). Most salient: {lead.get('reasoning', '')}",
+    }
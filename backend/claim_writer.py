@@ -0,0 +1,276 @@
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import AutoReconnect, BulkWriteError, ConnectionFailure, ExecutionTimeout, PyMongoError, WriteConcernError
+
+from telemetry import observe_stage, register_gauges
+from analytics import record_claim_stats
+from db_utils import CLAIM_STORAGE_MODE, build_claim_document, record_claim_hits, write_claim_documents
+
+logger = logging.getLogger(__name__)
+
+# --- Claim Writer Configuration (read from .env) ---
+# buffered: every request hands its result to the bulk writer; inline: synchronous insert_one (original)
+CLAIM_WRITE_MODE = os.environ.get('CLAIM_WRITE_MODE', 'buffered').lower()
+CLAIM_WRITER_BATCH_SIZE = int(os.environ.get('CLAIM_WRITER_BATCH_SIZE', '100'))
+CLAIM_WRITER_FLUSH_SECONDS = float(os.environ.get('CLAIM_WRITER_FLUSH_SECONDS', '1.0'))
+CLAIM_WRITER_MAX_QUEUE = int(os.environ.get('CLAIM_WRITER_MAX_QUEUE', '10000'))
+# block: submit() waits up to CLAIM_WRITER_BLOCK_SECONDS for room; drop_oldest: evict the oldest queued document
+CLAIM_WRITER_OVERFLOW = os.environ.get('CLAIM_WRITER_OVERFLOW', 'block').lower()
+CLAIM_WRITER_BLOCK_SECONDS = float(os.environ.get('CLAIM_WRITER_BLOCK_SECONDS', '2.0'))
+CLAIM_WRITER_MAX_RETRIES = int(os.environ.get('CLAIM_WRITER_MAX_RETRIES', '5'))
+CLAIM_WRITER_RETRY_BASE_SECONDS = float(os.environ.get('CLAIM_WRITER_RETRY_BASE_SECONDS', '0.5'))
+CLAIM_WRITER_SHUTDOWN_SECONDS = float(os.environ.get('CLAIM_WRITER_SHUTDOWN_SECONDS', '10'))
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def is_transient_mongo_error(error: Exception) -> bool:
+    """Network blips, elections and write-concern timeouts are worth retrying; validation errors are not."""
+    if isinstance(error, (AutoReconnect, ConnectionFailure, ExecutionTimeout, WriteConcernError)):
+        return True
+    return isinstance(error, PyMongoError) and error.has_error_label("RetryableWriteError")
+
+
+class BufferedClaimWriter:
+    """
+    Background persistence queue for verified claims.
+
+    submit() builds the document and appends it to a bounded in-memory buffer; a daemon thread
+    drains it with one insert_many(ordered=False) per batch, flushing whenever
+    CLAIM_WRITER_BATCH_SIZE documents are waiting or CLAIM_WRITER_FLUSH_SECONDS have passed.
+    Transient Mongo failures are retried with jittered exponential backoff. insert_many assigns
+    _id to each document before the first attempt, so a retry of a batch that partially landed
+    only produces duplicate-key errors, which are counted as written.
+
+    In dedup storage mode batches become fingerprint upserts and verdict-cache hits are summed per
+    fingerprint (record_hit) and credited with one bulk update per flush. A retried upsert whose
+    first attempt did land counts that request twice in hit_count; hit counts are best-effort.
+    """
+
+    def __init__(self, batch_size: int = CLAIM_WRITER_BATCH_SIZE, flush_seconds: float = CLAIM_WRITER_FLUSH_SECONDS,
+                 max_queue: int = CLAIM_WRITER_MAX_QUEUE, overflow: str = CLAIM_WRITER_OVERFLOW,
+                 block_seconds: float = CLAIM_WRITER_BLOCK_SECONDS, max_retries: int = CLAIM_WRITER_MAX_RETRIES):
+        if overflow not in ('block', 'drop_oldest'):
+            raise ValueError(f"Unknown CLAIM_WRITER_OVERFLOW '{overflow}'. Choose from: block, drop_oldest")
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.max_queue = max(self.batch_size, max_queue)
+        self.overflow = overflow
+        self.block_seconds = block_seconds
+        self.max_retries = max_retries
+        self._init_state()
+
+    def _init_state(self) -> None:
+        self._buffer: deque = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._hits: Dict[str, int] = {}
+        self._in_flight = 0
+        self._flush_waiters = 0
+        self._stopping = False
+        self._stats = {
+            'submitted': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'retries': 0, 'batches': 0,
+            'hits_recorded': 0, 'hits_dropped': 0,
+            'last_batch_size': 0, 'last_flush_seconds': 0.0, 'max_flush_seconds': 0.0, 'total_flush_seconds': 0.0,
+        }
+
+    def _ensure_started(self) -> None:
+        # Called with self._cond held
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="claim-writer", daemon=True)
+            self._thread.start()
+
+    # --- Producer side ---
+    def submit(self, claim_result: dict, fingerprint: Optional[str] = None, claim_text: Optional[str] = None) -> bool:
+        """Queues a result for persistence and returns immediately. False if it was rejected or dropped."""
+        claim_document = build_claim_document(claim_result, fingerprint, claim_text)
+        if claim_document is None:
+            return False
+
+        with self._cond:
+            self._ensure_started()
+            if len(self._buffer) >= self.max_queue:
+                if self.overflow == 'drop_oldest':
+                    self._buffer.popleft()
+                    self._stats['dropped'] += 1
+                elif not self._cond.wait_for(lambda: len(self._buffer) < self.max_queue, timeout=self.block_seconds):
+                    # Back-pressure timed out: shed this write rather than stall the request any longer
+                    self._stats['dropped'] += 1
+                    logger.warning("Claim writer queue full (%d); dropping a result", len(self._buffer))
+                    return False
+            self._buffer.append(claim_document)
+            self._stats['submitted'] += 1
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+        return True
+
+    def record_hit(self, fingerprint: Optional[str]) -> None:
+        """Dedup mode: counts a verdict-cache hit against the stored claim (no-op in append mode)."""
+        if CLAIM_STORAGE_MODE != 'dedup' or not fingerprint:
+            return
+        with self._cond:
+            self._ensure_started()
+            self._hits[fingerprint] = self._hits.get(fingerprint, 0) + 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every queued result has been written or given up on (or timeout elapses)."""
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                return not self._buffer
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: not self._buffer and not self._hits and not self._in_flight,
+                                           timeout=timeout)
+            finally:
+                self._flush_waiters -= 1
+
+    def close(self, timeout: float = CLAIM_WRITER_SHUTDOWN_SECONDS) -> bool:
+        """Drains the buffer and stops the writer thread (registered at exit)."""
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if not flushed:
+            logger.warning("Claim writer shut down with %d unwritten result(s)", len(self._buffer))
+        return flushed
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = len(self._buffer)
+            stats['in_flight'] = self._in_flight
+        total = stats.pop('total_flush_seconds')
+        stats['avg_flush_seconds'] = total / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    # --- Writer thread ---
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: (len(self._buffer) >= self.batch_size or self._stopping
+                             or (self._flush_waiters and (self._buffer or self._hits))),
+                    timeout=self.flush_seconds
+                )
+                if self._stopping and not self._buffer and not self._hits:
+                    return
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                hits, self._hits = self._hits, {}
+                self._in_flight = len(batch) + len(hits)
+                # Room was freed for producers blocked on a full queue
+                self._cond.notify_all()
+
+            if batch:
+                self._write_batch(batch)
+            if hits:
+                self._write_hits(hits)
+
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        started = time.monotonic()
+        pending = batch
+        written = 0
+        retries = 0
+        # Documents MongoDB refused outright; everything else in the batch counts as saved for the rollups
+        rejected_ids = set()
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                written += write_claim_documents(pending)
+                pending = []
+                break
+            except BulkWriteError as e:
+                details = e.details or {}
+                write_errors = details.get('writeErrors', [])
+                duplicates = [err for err in write_errors if err.get('code') == DUPLICATE_KEY_ERROR]
+                rejected = [err for err in write_errors if err.get('code') != DUPLICATE_KEY_ERROR]
+                if rejected:
+                    rejected_ids.update(id(pending[err['index']]) for err in rejected)
+                    self._stats_add('failed', len(rejected))
+                    logger.error("Claim writer: %d document(s) rejected by MongoDB: %s", len(rejected), rejected[0].get('errmsg'))
+                if CLAIM_STORAGE_MODE == 'dedup':
+                    # An upsert only hits a duplicate key when another worker inserted the same new
+                    # fingerprint concurrently; resending turns it into an update of that document
+                    written += details.get('nMatched', 0) + details.get('nUpserted', 0) + details.get('nInserted', 0)
+                    pending = [pending[err['index']] for err in duplicates]
+                    if not pending:
+                        break
+                else:
+                    # Duplicates mean an earlier attempt already stored the document
+                    written += len(duplicates)
+                    if not details.get('writeConcernErrors'):
+                        written += details.get('nInserted', 0)
+                        pending = []
+                        break
+                    # Write concern not confirmed: resend everything that was not an outright error;
+                    # documents that did land come back as duplicates and are counted then
+                    errored = {err['index'] for err in write_errors}
+                    pending = [doc for index, doc in enumerate(pending) if index not in errored]
+                    logger.warning("Claim writer: write concern error (attempt %d): %s", attempt + 1, details['writeConcernErrors'][0])
+            except Exception as e:
+                if not is_transient_mongo_error(e):
+                    logger.exception("Claim writer: non-retryable error writing %d result(s)", len(pending))
+                    break
+                logger.warning("Claim writer: transient MongoDB error (attempt %d): %s", attempt + 1, e)
+
+            if attempt < self.max_retries:
+                retries += 1
+                delay = CLAIM_WRITER_RETRY_BASE_SECONDS * (2 ** attempt)
+                time.sleep(random.uniform(0, delay))
+
+        if pending:
+            self._stats_add('failed', len(pending))
+            logger.error("Claim writer: gave up on %d result(s) after %d retries", len(pending), retries)
+        rejected_ids.update(id(document) for document in pending)
+        record_claim_stats([document for document in batch if id(document) not in rejected_ids])
+
+        elapsed = time.monotonic() - started
+        observe_stage("mongo_bulk_write", elapsed)
+        with self._cond:
+            self._stats['written'] += written
+            self._stats['retries'] += retries
+            self._stats['batches'] += 1
+            self._stats['last_batch_size'] = len(batch)
+            self._stats['last_flush_seconds'] = elapsed
+            self._stats['max_flush_seconds'] = max(self._stats['max_flush_seconds'], elapsed)
+            self._stats['total_flush_seconds'] += elapsed
+        logger.info("MongoDB: bulk-saved %d/%d claims in %.3fs", written, len(batch), elapsed)
+
+    def _write_hits(self, hits: Dict[str, int]) -> None:
+        total = sum(hits.values())
+        try:
+            record_claim_hits(hits)
+            self._stats_add('hits_recorded', total)
+        except Exception as e:
+            # Hit counters are advisory; never hold up the writer retrying them
+            self._stats_add('hits_dropped', total)
+            logger.warning("Claim writer: could not record %d cache hit(s): %s", total, e)
+
+    def _stats_add(self, name: str, amount: int) -> None:
+        with self._cond:
+            self._stats[name] += amount
+
+    def _reset_after_fork(self) -> None:
+        # The parent still owns (and will write) whatever it had buffered
+        self._init_state()
+
+
+# Shared process-wide writer used by verifier._persist_result()
+claim_writer = BufferedClaimWriter()
+atexit.register(claim_writer.close)
+register_gauges('medverify_claim_writer', "Buffered claim writer state (see BufferedClaimWriter.metrics).",
+                claim_writer.metrics)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=claim_writer._reset_after_fork)
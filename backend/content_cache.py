@@ -0,0 +1,218 @@
+import gzip
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip is used when zstandard is not installed
+    zstandard = None
+
+# A body that fails with one of these is damaged for good and its entry is dropped
+CORRUPT_BODY_ERRORS = (gzip.BadGzipFile, EOFError, zlib.error, UnicodeDecodeError) + \
+    ((zstandard.ZstdError,) if zstandard is not None else ())
+
+# --- Content Cache Configuration (read from .env) ---
+CONTENT_CACHE_ENABLED = os.environ.get('CONTENT_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+CONTENT_CACHE_DIR = os.environ.get('CONTENT_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.content_cache'))
+CONTENT_CACHE_MAX_BYTES = int(os.environ.get('CONTENT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+# Within this window a stored page is reused without contacting the site at all
+CONTENT_CACHE_FRESH_SECONDS = float(os.environ.get('CONTENT_CACHE_FRESH_SECONDS', '600'))
+
+# Wayback Machine snapshots pinned to a timestamp never change
+IMMUTABLE_URL_RE = re.compile(r'^https?://web\.archive\.org/web/\d{8,14}(id_|im_|js_|cs_|if_)?/', re.IGNORECASE)
+
+
+def is_immutable_url(url: str) -> bool:
+    return bool(IMMUTABLE_URL_RE.match(url))
+
+
+class CachedContent:
+    def __init__(self, key: str, text: str, etag: Optional[str], last_modified: Optional[str],
+                 stored_at: float, immutable: bool):
+        self.key = key
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+        self.immutable = immutable
+
+    def is_fresh(self, fresh_seconds: float = CONTENT_CACHE_FRESH_SECONDS) -> bool:
+        return self.immutable or (time.time() - self.stored_at) < fresh_seconds
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Validators for a conditional GET (a 304 answer means the stored text is still current)."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ContentCache:
+    """
+    On-disk cache of extracted article text keyed by canonical URL.
+
+    Bodies are stored compressed (zstd when available, else gzip) in sharded files; a SQLite index
+    tracks validators (ETag / Last-Modified), sizes and last access so the cache can be kept under
+    max_bytes by evicting the least recently used entries.
+    """
+
+    def __init__(self, directory: str = CONTENT_CACHE_DIR, max_bytes: int = CONTENT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.codec = 'zst' if zstandard is not None else 'gz'
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    # --- Storage helpers ---
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            # Shared by every gunicorn and job worker process: wait for their writes instead of failing
+            self._conn = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, url TEXT NOT NULL, codec TEXT NOT NULL, size INTEGER NOT NULL,"
+                " etag TEXT, last_modified TEXT, immutable INTEGER NOT NULL DEFAULT 0,"
+                " stored_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def key_for(canonical_url: str) -> str:
+        return hashlib.sha256(canonical_url.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str, codec: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{codec}")
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == 'zst':
+            return zstandard.ZstdCompressor(level=6).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    @staticmethod
+    def _decompress(data: bytes, codec: str) -> bytes:
+        if codec == 'zst':
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read this cache entry")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    # --- Public API ---
+    def get(self, canonical_url: str) -> Optional[CachedContent]:
+        key = self.key_for(canonical_url)
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT codec, etag, last_modified, stored_at, immutable FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                codec, etag, last_modified, stored_at, immutable = row
+                with open(self._path(key, codec), 'rb') as f:
+                    text = self._decompress(f.read(), codec).decode('utf-8')
+            except (FileNotFoundError,) + CORRUPT_BODY_ERRORS as e:
+                logger.warning("Content cache entry for %s is unreadable, dropping it: %s", canonical_url, e)
+                self._forget(key)
+                return None
+            except Exception as e:
+                # Transient (database locked, I/O hiccup): treat as a miss but keep the entry
+                logger.warning("Content cache read failed for %s: %s", canonical_url, e)
+                return None
+            try:
+                conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.debug("Content cache access time not updated for %s: %s", canonical_url, e)
+        return CachedContent(key, text, etag, last_modified, stored_at, bool(immutable))
+
+    def put(self, canonical_url: str, text: str, etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> None:
+        key = self.key_for(canonical_url)
+        body = self._compress(text.encode('utf-8'))
+        path = self._path(key, self.codec)
+        now = time.time()
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, url, codec, size, etag, last_modified, immutable, stored_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, canonical_url, self.codec, len(body), etag, last_modified,
+                     int(is_immutable_url(canonical_url)), now, now)
+                )
+                conn.commit()
+                self._evict(conn)
+            except Exception as e:
+                logger.warning("Content cache write failed for %s: %s", canonical_url, e)
+
+    def refresh(self, entry: CachedContent) -> None:
+        """Marks a revalidated (304) entry as fresh again."""
+        with self._lock:
+            try:
+                conn = self._connection()
+                now = time.time()
+                conn.execute("UPDATE entries SET stored_at = ?, last_access = ? WHERE key = ?", (now, now, entry.key))
+                conn.commit()
+            except Exception as e:
+                logger.warning("Content cache refresh failed: %s", e)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drops least recently used entries until the stored bodies fit in max_bytes."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, codec, size in conn.execute("SELECT key, codec, size FROM entries ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key, codec))
+            except OSError:
+                pass
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+        conn.commit()
+
+    def _forget(self, key: str) -> None:
+        try:
+            conn = self._connection()
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.commit()
+        except Exception:
+            pass
+
+    def _reset_after_fork(self) -> None:
+        # SQLite connections must not be shared across processes
+        self._lock = threading.Lock()
+        self._conn = None
+
+
+# Shared process-wide cache used by scraper.fetch_url_content()
+content_cache = ContentCache() if CONTENT_CACHE_ENABLED else None
+
+if content_cache is not None and hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=content_cache._reset_after_fork)
@@ -0,0 +1,296 @@
+import codecs
+import logging
+import os
+import re
+from html.parser import HTMLParser
+from typing import Iterable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# --- Extractor Configuration (read from .env) ---
+# auto: lxml streaming parser when installed, else the stdlib streaming parser
+CONTENT_EXTRACTOR = os.environ.get('CONTENT_EXTRACTOR', 'auto').lower()
+EXTRACTOR_MAX_BYTES = int(os.environ.get('EXTRACTOR_MAX_BYTES', '2000000'))
+EXTRACTOR_TARGET_CHARS = int(os.environ.get('EXTRACTOR_TARGET_CHARS', '20000'))
+
+# Blocks shorter than this are navigation, captions, buttons... (same cut-off as the original scraper)
+MIN_BLOCK_CHARS = 50
+
+CAPTURE_TAGS = {'p', 'li', 'article', 'main'}
+LIST_TAGS = {'ul', 'ol'}
+SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'head', 'iframe'}
+# Start tags that implicitly close an open <p> (HTML lets authors omit </p>)
+P_CLOSING_TAGS = {'p', 'div', 'ul', 'ol', 'li', 'table', 'article', 'main', 'section', 'blockquote',
+                  'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'footer', 'form', 'pre', 'figure'}
+
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([A-Za-z0-9_-]+)', re.IGNORECASE)
+
+HtmlChunks = Union[bytes, str, Iterable[bytes]]
+
+
+def sniff_encoding(head: bytes, default: str = 'utf-8') -> str:
+    """Finds a <meta charset> declaration in the first bytes of a page."""
+    match = META_CHARSET_RE.search(head[:4096])
+    if match:
+        name = match.group(1).decode('ascii', 'ignore')
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            pass
+    return default
+
+
+def resolve_encoding(declared: Optional[str], head: bytes) -> str:
+    """The declared charset if Python knows it, else the page's <meta charset>, else utf-8."""
+    if declared:
+        try:
+            return codecs.lookup(declared).name
+        except LookupError:
+            logger.debug("Unknown charset %r; sniffing the page instead", declared)
+    return sniff_encoding(head)
+
+
+def _as_chunks(html: HtmlChunks) -> Iterable[bytes]:
+    if isinstance(html, str):
+        return [html.encode('utf-8')]
+    if isinstance(html, bytes):
+        return [html]
+    return html
+
+
+class _EnoughText(Exception):
+    """Raised from inside the parser callbacks to stop parsing once target_chars is reached."""
+
+
+class _BlockCollector:
+    """
+    Turns a stream of start/end/data events into article text in a single pass.
+
+    Text is attributed only to the innermost open p/li/article/main, so nested containers never
+    repeat the paragraphs they contain. An <li> without </li> ends at the next <li> of the same
+    list or at the end of its list. Identical blocks are emitted once, and collection stops
+    (done=True, _EnoughText raised) once target_chars of text have been gathered.
+    """
+
+    def __init__(self, target_chars: int, min_block_chars: int = MIN_BLOCK_CHARS):
+        self.target_chars = target_chars
+        self.min_block_chars = min_block_chars
+        self.blocks: List[str] = []
+        self.total_chars = 0
+        self.done = False
+        self._stack: List[tuple] = []
+        self._skip_depth = 0
+        self._list_depth = 0
+        self._seen = set()
+        self._fallback: List[str] = []
+        self._fallback_chars = 0
+
+    def start(self, tag, attrs=None):
+        tag = tag.lower()
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if self._stack:
+            # Tag boundaries separate words (like get_text(separator=' ')); raw data chunks do not
+            self._stack[-1][1].append(' ')
+            open_tag, _, open_depth = self._stack[-1]
+            if (open_tag == 'p' and tag in P_CLOSING_TAGS) or \
+                    (open_tag == 'li' and tag == 'li' and open_depth == self._list_depth):
+                self._emit(self._stack.pop())
+        if tag in LIST_TAGS:
+            self._list_depth += 1
+        if tag in CAPTURE_TAGS:
+            self._stack.append((tag, [], self._list_depth))
+
+    def end(self, tag):
+        tag = tag.lower()
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        if self._stack:
+            self._stack[-1][1].append(' ')
+        if tag in LIST_TAGS:
+            # Items of this list left without </li> end with it
+            while self._stack and self._stack[-1][0] == 'li' and self._stack[-1][2] >= self._list_depth:
+                self._emit(self._stack.pop())
+            self._list_depth = max(0, self._list_depth - 1)
+            return
+        if tag not in CAPTURE_TAGS:
+            return
+        for position in range(len(self._stack) - 1, -1, -1):
+            if self._stack[position][0] == tag:
+                # Close anything left open inside this element first
+                while len(self._stack) > position:
+                    self._emit(self._stack.pop())
+                return
+
+    def data(self, text):
+        if self._skip_depth or not text:
+            return
+        if self._stack:
+            self._stack[-1][1].append(text)
+        if self._fallback_chars < self.target_chars:
+            self._fallback.append(text)
+            self._fallback_chars += len(text)
+
+    def close(self) -> str:
+        try:
+            while self._stack and not self.done:
+                self._emit(self._stack.pop())
+        except _EnoughText:
+            pass
+        if self.blocks:
+            return " ".join(self.blocks)
+        return " ".join("".join(self._fallback).split())
+
+    def _emit(self, entry) -> None:
+        text = " ".join("".join(entry[1]).split())
+        if len(text) <= self.min_block_chars or text in self._seen:
+            return
+        self._seen.add(text)
+        self.blocks.append(text)
+        self.total_chars += len(text)
+        if self.total_chars >= self.target_chars:
+            self.done = True
+            raise _EnoughText()
+
+
+class _StdlibEventParser(HTMLParser):
+    def __init__(self, collector: _BlockCollector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        pass
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+class ContentExtractor:
+    """Interface: turns raw HTML (bytes, str, or an iterable of byte chunks) into article text."""
+
+    name = 'base'
+
+    def __init__(self, max_bytes: int = EXTRACTOR_MAX_BYTES, target_chars: int = EXTRACTOR_TARGET_CHARS):
+        self.max_bytes = max_bytes
+        self.target_chars = target_chars
+
+    def extract(self, html: HtmlChunks, encoding: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def _capped_chunks(self, html: HtmlChunks) -> Iterable[bytes]:
+        """Yields chunks until max_bytes have been read."""
+        remaining = self.max_bytes
+        for chunk in _as_chunks(html):
+            if not chunk:
+                continue
+            if remaining <= 0:
+                return
+            yield chunk[:remaining]
+            remaining -= len(chunk)
+
+
+class SoupExtractor(ContentExtractor):
+    """The original BeautifulSoup approach: full tree, find_all(p/article/main/li), get_text on each."""
+
+    name = 'soup'
+
+    def extract(self, html: HtmlChunks, encoding: Optional[str] = None) -> str:
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(b"".join(self._capped_chunks(html)), 'html.parser', from_encoding=encoding)
+        main_content = []
+
+        for tag in soup.find_all(['p', 'article', 'main', 'li']):
+            text = tag.get_text(separator=' ', strip=True)
+            if len(text) > MIN_BLOCK_CHARS:
+                main_content.append(text)
+
+        return " ".join(main_content) if main_content else soup.get_text(separator=' ', strip=True)
+
+
+class StreamingExtractor(ContentExtractor):
+    """Single-pass extractor on the stdlib incremental HTMLParser; no tree is built."""
+
+    name = 'streaming'
+
+    def _new_feeder(self, collector: _BlockCollector):
+        parser = _StdlibEventParser(collector)
+        return parser.feed, parser.close
+
+    def extract(self, html: HtmlChunks, encoding: Optional[str] = None) -> str:
+        collector = _BlockCollector(self.target_chars)
+        feed, close = self._new_feeder(collector)
+        decoder = None
+
+        try:
+            for chunk in self._capped_chunks(html):
+                if decoder is None:
+                    decoder = codecs.getincrementaldecoder(resolve_encoding(encoding, chunk))(errors='replace')
+                feed(decoder.decode(chunk))
+            if decoder is not None:
+                feed(decoder.decode(b"", final=True))
+            close()
+        except _EnoughText:
+            # Early stop: enough text for the claim, the rest of the page is never read
+            pass
+        except Exception as e:
+            # Malformed markup: keep whatever was collected so far
+            logger.warning("%s extractor stopped early on malformed HTML: %s", self.name, e)
+        return collector.close()
+
+
+class LxmlStreamingExtractor(StreamingExtractor):
+    """Same single-pass collector driven by libxml2's incremental HTML parser (requires lxml)."""
+
+    name = 'lxml'
+
+    def _new_feeder(self, collector: _BlockCollector):
+        from lxml import etree
+
+        class _Target:
+            def start(self, tag, attrib):
+                if isinstance(tag, str):
+                    collector.start(tag, attrib)
+
+            def end(self, tag):
+                if isinstance(tag, str):
+                    collector.end(tag)
+
+            def data(self, text):
+                collector.data(text)
+
+            def comment(self, text):
+                pass
+
+            def close(self):
+                return None
+
+        parser = etree.HTMLParser(target=_Target(), recover=True, no_network=True)
+        return parser.feed, parser.close
+
+
+EXTRACTORS = {
+    SoupExtractor.name: SoupExtractor,
+    StreamingExtractor.name: StreamingExtractor,
+    LxmlStreamingExtractor.name: LxmlStreamingExtractor,
+}
+
+
+def get_extractor(name: str = CONTENT_EXTRACTOR) -> ContentExtractor:
+    """Returns the configured extractor; 'auto' prefers lxml and falls back to the stdlib parser."""
+    if name == 'auto':
+        try:
+            import lxml.etree  # noqa: F401
+            name = LxmlStreamingExtractor.name
+        except ImportError:
+            name = StreamingExtractor.name
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown CONTENT_EXTRACTOR '{name}'. Choose from: auto, {', '.join(EXTRACTORS)}")
+    return EXTRACTORS[name]()
@@ -1,17 +1,57 @@
 import os
-from datetime import datetime
-from typing import Dict, Any, List
-from bson import json_util # Used for serializing MongoDB objects (like ObjectId) to JSON
-import json # Ensure this is imported for json.dumps
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+import base64
+from bson import ObjectId
+import pymongo
+from pymongo import InsertOne, UpdateOne
 from config import mongo # <<< CRITICAL FIX: Imports 'mongo' from the central config file
+from deadline import stage_timeout
 import logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
 
 # --- MongoDB Collection Name ---
 # This collection will store the final verified results from the 5-stage pipeline
 CLAIMS_COLLECTION = 'verified_claims_history' 
 
+# --- Storage Mode (read from .env) ---
+# append: one document per verified request (original); dedup: one document per claim fingerprint,
+# upserted with hit_count, first_seen/last_seen and a capped verdict_history
+CLAIM_STORAGE_MODE = os.environ.get('CLAIM_STORAGE_MODE', 'append').lower()
+CLAIM_VERDICT_HISTORY_MAX = int(os.environ.get('CLAIM_VERDICT_HISTORY_MAX', '10'))
+
+# --- Operation timeouts (read from .env) ---
+# Client-side timeout for writes and cache lookups instead of the driver defaults; on a request
+# path it is further capped by the request deadline, but never below MONGO_MIN_TIMEOUT_SECONDS
+MONGO_OPERATION_TIMEOUT_SECONDS = float(os.environ.get('MONGO_OPERATION_TIMEOUT_SECONDS', '10'))
+MONGO_MIN_TIMEOUT_SECONDS = float(os.environ.get('MONGO_MIN_TIMEOUT_SECONDS', '0.5'))
+
+# Fields overwritten by each new verdict in dedup mode
+VERDICT_FIELDS = (
+    'original_input', 'credibility_score', 'llm_judgment', 'trusted_reference', 'reasoning',
+    'extracted_terms', 'debug_message', 'claims_processed', 'claim_text', 'claim_results', 'verdict_source',
+)
+
+# --- History API limits ---
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 500
+# Fields a client may request through the history API's projection
+HISTORY_FIELDS = (
+    '_id', 'timestamp', 'original_input', 'credibility_score', 'llm_judgment', 'trusted_reference',
+    'reasoning', 'extracted_terms', 'debug_message', 'claims_processed', 'claim_results', 'verdict_source',
+    'hit_count', 'first_seen', 'last_seen', 'verdict_history',
+)
+
+# Indexes backing history pagination/filters and the verdict cache lookup
+CLAIMS_INDEXES = [
+    ([('timestamp', -1), ('_id', -1)], 'history_keyset'),
+    ([('llm_judgment', 1), ('timestamp', -1), ('_id', -1)], 'history_by_verdict'),
+    ([('extracted_terms', 1), ('timestamp', -1), ('_id', -1)], 'history_by_term'),
+    ([('credibility_score', 1)], 'history_by_score'),
+    ([('claim_fingerprint', 1), ('timestamp', -1)], 'cache_by_fingerprint'),
+    ([('hit_count', -1), ('last_seen', -1)], 'trending_claims'),
+]
+
 def _get_db():
     """
     Return a usable DB object for inserts/queries. Prefer mongo.db, fall back to mongo.cx[DBNAME].
@@ -33,19 +73,27 @@ def _get_db():
 
     raise RuntimeError("No MongoDB database object available. Set MONGO_URI with a default DB or MONGO_DBNAME in .env")
 
-def save_verified_claim(claim_result: dict) -> None:
+def _operation_timeout():
+    """pymongo.timeout() block for one operation (stage 'mongo' of the current request deadline)."""
+    return pymongo.timeout(max(MONGO_MIN_TIMEOUT_SECONDS, stage_timeout('mongo', MONGO_OPERATION_TIMEOUT_SECONDS)))
+
+def build_claim_document(claim_result: dict, fingerprint: Optional[str] = None,
+                         claim_text: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """
-    Saves a structured claim result into the MongoDB collection.
+    Maps a process_claim() result onto the stored document shape (None if the result is corrupt).
     
     Args:
         claim_result: The final dictionary output from verifier.process_claim().
+        fingerprint: Normalized claim key (input_normalizer.claim_fingerprint) used by the verdict cache.
+        claim_text: The submitted text of a text claim (URL claims keep it in original_input), used
+            to rebuild the semantic near-duplicate index and as training data by fast_classifier.py.
     """
     
     # --- CRITICAL FIX: VALIDATE INPUT STRUCTURE ---
     # If the input is None or not a dictionary, log the failure and exit gracefully.
     if not isinstance(claim_result, dict):
-        print("MONGO DB ERROR: Input 'claim_result' is not a valid dictionary (is None or corrupt). Skipping save.")
-        return
+        logger.error("MONGO DB ERROR: Input 'claim_result' is not a valid dictionary (is None or corrupt). Skipping save.")
+        return None
     
     # 1. Safely retrieve all necessary fields using .get()
     score = claim_result.get('credibility_score', -1) 
@@ -62,26 +110,362 @@ def save_verified_claim(claim_result: dict) -> None:
         # Explicitly map complex list fields
         'extracted_terms': claim_result.get('extracted_terms', []),
         'debug_message': claim_result.get('debug_message', 'No debug info.'),
+        'claims_processed': claim_result.get('claims_processed', 1),
+        'claim_fingerprint': fingerprint,
+        'claim_text': claim_text,
+        # Articles: the per-claim verdicts behind the aggregate score (None for single claims)
+        'claim_results': claim_result.get('claim_results'),
+        # 'llm'; older rows may hold 'fast_classifier' answers, which are never used for training
+        'verdict_source': claim_result.get('verdict_source', 'llm'),
         
         # NOTE: All data fields are explicitly mapped here to prevent the 'NoneType' crash.
     }
+    return claim_document
+
+def save_verified_claim(claim_result: dict, fingerprint: Optional[str] = None, claim_text: Optional[str] = None) -> None:
+    """
+    Saves a structured claim result into the MongoDB collection with a single insert_one.
+    Request paths normally go through claim_writer, which batches inserts instead.
+    """
+    claim_document = build_claim_document(claim_result, fingerprint, claim_text)
+    if claim_document is None:
+        return
+    score = claim_document['credibility_score']
     
     try:
-        db = _get_db()
-        res = db[CLAIMS_COLLECTION].insert_one(claim_document)
-        logger.info("MongoDB: saved claim _id=%s score=%s", str(res.inserted_id), score)
+        write_claim_documents([claim_document])
+        logger.info("MongoDB: saved claim fingerprint=%s score=%s", fingerprint, score)
     except Exception as e:
         logger.exception("MONGO DB ERROR: Failed to save claim result")
+        return
+
+    from analytics import record_claim_stats
+    record_claim_stats([claim_document])
+
+def _verdict_history_entry(claim_document: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'timestamp': claim_document['timestamp'],
+        'llm_judgment': claim_document['llm_judgment'],
+        'credibility_score': claim_document['credibility_score'],
+        'trusted_reference': claim_document['trusted_reference'],
+    }
+
+def build_claim_upsert(claim_document: Dict[str, Any], history_max: int = CLAIM_VERDICT_HISTORY_MAX) -> UpdateOne:
+    """
+    Dedup-mode write for one verdict: the latest verdict fields replace the stored ones,
+    hit_count/last_seen advance and the verdict is appended to a verdict_history capped at history_max.
+    'timestamp' stays the time of the latest verdict, so the verdict cache's freshness check still holds.
+    """
+    now = claim_document['timestamp']
+    update = {
+        '$set': dict({field: claim_document[field] for field in VERDICT_FIELDS}, timestamp=now, last_seen=now),
+        '$setOnInsert': {'first_seen': now},
+        '$inc': {'hit_count': 1},
+    }
+    if history_max > 0:
+        update['$push'] = {'verdict_history': {'$each': [_verdict_history_entry(claim_document)], '$slice': -history_max}}
+    return UpdateOne({'claim_fingerprint': claim_document['claim_fingerprint']}, update, upsert=True)
+
+def write_claim_documents(claim_documents: List[Dict[str, Any]], mode: str = CLAIM_STORAGE_MODE) -> int:
+    """
+    Writes a batch of prepared documents in one round trip and returns how many were stored:
+    an unordered insert_many in append mode, an unordered bulk of fingerprint upserts in dedup mode
+    (documents without a fingerprint are still inserted). Errors are raised (not logged) so the
+    caller can decide what to retry; BulkWriteError indexes match claim_documents.
+    """
+    if not claim_documents:
+        return 0
+    collection = _get_db()[CLAIMS_COLLECTION]
+    if mode != 'dedup':
+        with _operation_timeout():
+            res = collection.insert_many(claim_documents, ordered=False)
+        return len(res.inserted_ids)
+
+    requests = [
+        build_claim_upsert(document) if document.get('claim_fingerprint') else InsertOne(document)
+        for document in claim_documents
+    ]
+    with _operation_timeout():
+        res = collection.bulk_write(requests, ordered=False)
+    return res.matched_count + res.upserted_count + res.inserted_count
+
+def record_claim_hits(hits: Dict[str, int], seen_at: Optional[datetime] = None) -> int:
+    """
+    Dedup mode: credits verdict-cache hits to their stored claims (hit_count += n, last_seen = seen_at)
+    in one unordered bulk write. Returns the number of claims matched; errors are raised.
+    """
+    if not hits:
+        return 0
+    seen_at = seen_at or datetime.utcnow()
+    requests = [
+        UpdateOne({'claim_fingerprint': fingerprint}, {'$inc': {'hit_count': count}, '$max': {'last_seen': seen_at}})
+        for fingerprint, count in hits.items()
+    ]
+    with _operation_timeout():
+        res = _get_db()[CLAIMS_COLLECTION].bulk_write(requests, ordered=False)
+    return res.matched_count
+
+def ensure_indexes() -> None:
+    """Creates the indexes used by the history API and the verdict cache (idempotent; run at startup)."""
+    try:
+        db = _get_db()
+        for keys, name in CLAIMS_INDEXES:
+            db[CLAIMS_COLLECTION].create_index(keys, name=name, background=True)
+        logger.info("MongoDB: ensured %d indexes on %s", len(CLAIMS_INDEXES), CLAIMS_COLLECTION)
+        from analytics import ensure_analytics_indexes
+        ensure_analytics_indexes(db)
+    except Exception:
+        logger.exception("MONGO DB ERROR: Failed to create indexes")
+        return
+
+    if CLAIM_STORAGE_MODE == 'dedup':
+        ensure_fingerprint_unique_index()
+
+def ensure_fingerprint_unique_index() -> bool:
+    """
+    Dedup mode: one document per fingerprint, enforced by a unique index so concurrent upserts from
+    several workers cannot create twins. Fails (returns False) until old rows are compacted.
+    """
+    try:
+        _get_db()[CLAIMS_COLLECTION].create_index(
+            [('claim_fingerprint', 1)], name='claim_fingerprint_unique', unique=True,
+            partialFilterExpression={'claim_fingerprint': {'$type': 'string'}},
+        )
+        return True
+    except Exception as e:
+        logger.warning("MongoDB: unique fingerprint index not created (%s). Run 'python migrate_claims.py' "
+                       "to compact duplicate rows.", e)
+        return False
+
+def compact_claims_history(history_max: int = CLAIM_VERDICT_HISTORY_MAX, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Backfills fingerprints on old URL rows and folds every group of rows sharing a fingerprint into one
+    dedup-mode document: the newest verdict fields, summed hit_count, min first_seen / max last_seen and
+    the newest history_max verdicts. Rows whose input cannot be fingerprinted (old text claims stored
+    only as a generic label) are left as they are. Safe to re-run.
+    """
+    from input_normalizer import claim_fingerprint, is_url_input
+
+    collection = _get_db()[CLAIMS_COLLECTION]
+    stats = {'fingerprinted': 0, 'groups': 0, 'merged_rows': 0, 'deleted_rows': 0}
+
+    # 1. Fingerprint rows written before fingerprints were stored (URL inputs only)
+    backfill = []
+    for document in collection.find({'claim_fingerprint': {'$in': [None, '']}}, {'original_input': 1}):
+        original_input = document.get('original_input') or ''
+        if is_url_input(original_input):
+            backfill.append(UpdateOne({'_id': document['_id']},
+                                      {'$set': {'claim_fingerprint': claim_fingerprint(original_input)}}))
+    stats['fingerprinted'] = len(backfill)
+    if backfill and not dry_run:
+        collection.bulk_write(backfill, ordered=False)
+
+    # 2. Fold each fingerprint group (and single rows missing dedup fields) into its newest row
+    groups = collection.aggregate([
+        {'$match': {'claim_fingerprint': {'$type': 'string'}}},
+        {'$sort': {'timestamp': -1, '_id': -1}},
+        {'$group': {
+            '_id': '$claim_fingerprint',
+            'ids': {'$push': '$_id'},
+            'hits': {'$sum': {'$ifNull': ['$hit_count', 1]}},
+            'first_seen': {'$min': {'$ifNull': ['$first_seen', '$timestamp']}},
+            'last_seen': {'$max': {'$ifNull': ['$last_seen', '$timestamp']}},
+            'histories': {'$push': {'$ifNull': ['$verdict_history', [{
+                'timestamp': '$timestamp', 'llm_judgment': '$llm_judgment',
+                'credibility_score': '$credibility_score', 'trusted_reference': '$trusted_reference',
+            }]]}},
+            'compacted': {'$min': {'$cond': [{'$eq': [{'$type': '$hit_count'}, 'missing']}, 0, 1]}},
+        }},
+        {'$match': {'$or': [{'ids.1': {'$exists': True}}, {'compacted': 0}]}},
+    ], allowDiskUse=True)
+
+    for group in groups:
+        stats['groups'] += 1
+        stats['merged_rows'] += len(group['ids'])
+        history = sorted((entry for entries in group['histories'] for entry in entries),
+                         key=lambda entry: entry.get('timestamp') or datetime.min)
+        keep_id, drop_ids = group['ids'][0], group['ids'][1:]
+        if dry_run:
+            stats['deleted_rows'] += len(drop_ids)
+            continue
+        update = {'hit_count': group['hits'], 'first_seen': group['first_seen'], 'last_seen': group['last_seen']}
+        if history_max > 0:
+            update['verdict_history'] = history[-history_max:]
+        collection.update_one({'_id': keep_id}, {'$set': update})
+        if drop_ids:
+            stats['deleted_rows'] += collection.delete_many({'_id': {'$in': drop_ids}}).deleted_count
+
+    return stats
+
+def serialize_claim_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts BSON-only types (ObjectId, datetime) into JSON-ready values in one pass."""
+    serialized = {}
+    for key, value in document.items():
+        if isinstance(value, ObjectId):
+            serialized[key] = str(value)
+        elif isinstance(value, datetime):
+            serialized[key] = value.isoformat() + 'Z'
+        elif isinstance(value, dict):
+            serialized[key] = serialize_claim_document(value)
+        elif isinstance(value, list):
+            serialized[key] = [serialize_claim_document(v) if isinstance(v, dict) else v for v in value]
+        else:
+            serialized[key] = value
+    return serialized
+
+def encode_history_cursor(timestamp: datetime, object_id: ObjectId) -> str:
+    """Opaque keyset cursor: the (timestamp, _id) of the last document on a page."""
+    raw = f"{timestamp.isoformat()}|{object_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_history_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        timestamp, object_id = raw.split('|', 1)
+        return datetime.fromisoformat(timestamp), ObjectId(object_id)
+    except Exception:
+        raise ValueError("Invalid history cursor.")
+
+def get_claims_history_page(limit: int = HISTORY_DEFAULT_LIMIT, cursor: Optional[str] = None,
+                            fields: Optional[List[str]] = None, verdict: Optional[str] = None,
+                            min_score: Optional[float] = None, max_score: Optional[float] = None,
+                            term: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Returns one page of saved claims, newest first, as {"items": [...], "next_cursor": str | None}.
+
+    Pagination is keyset-based on (timestamp, _id), so every page is an index range scan no matter
+    how deep the client pages. fields limits the returned fields (default: all HISTORY_FIELDS
+    except _id); verdict, min_score/max_score and term filter on llm_judgment, credibility_score
+    and extracted_terms. Raises ValueError for invalid arguments.
+    """
+    limit = max(1, min(int(limit), HISTORY_MAX_LIMIT))
+
+    if fields:
+        unknown = [field for field in fields if field not in HISTORY_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        requested = list(fields)
+    else:
+        requested = [field for field in HISTORY_FIELDS if field != '_id']
+
+    # timestamp and _id are always read because the next cursor is built from them
+    projection = {field: 1 for field in requested}
+    projection.update({'timestamp': 1, '_id': 1})
+
+    query: Dict[str, Any] = {}
+    if verdict:
+        query['llm_judgment'] = verdict
+    if min_score is not None or max_score is not None:
+        score_range = {}
+        if min_score is not None:
+            score_range['$gte'] = min_score
+        if max_score is not None:
+            score_range['$lte'] = max_score
+        query['credibility_score'] = score_range
+    if term:
+        query['extracted_terms'] = term
+    if cursor:
+        last_timestamp, last_id = decode_history_cursor(cursor)
+        query['$or'] = [
+            {'timestamp': {'$lt': last_timestamp}},
+            {'timestamp': last_timestamp, '_id': {'$lt': last_id}},
+        ]
+
+    db = _get_db()
+    documents = list(
+        db[CLAIMS_COLLECTION].find(query, projection)
+        .sort([('timestamp', -1), ('_id', -1)])
+        .limit(limit + 1)
+    )
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_history_cursor(last['timestamp'], last['_id'])
+
+    items = [
+        serialize_claim_document({field: document[field] for field in requested if field in document})
+        for document in documents
+    ]
+    return {'items': items, 'next_cursor': next_cursor}
+
+def get_trending_claims(limit: int = 20, since_hours: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Dedup mode: most-requested claims (by hit_count), optionally only those seen in the last since_hours."""
+    limit = max(1, min(int(limit), HISTORY_MAX_LIMIT))
+    query: Dict[str, Any] = {'hit_count': {'$exists': True}}
+    if since_hours is not None:
+        query['last_seen'] = {'$gte': datetime.utcnow() - timedelta(hours=since_hours)}
+    projection = {'_id': 0, 'original_input': 1, 'llm_judgment': 1, 'credibility_score': 1,
+                  'hit_count': 1, 'first_seen': 1, 'last_seen': 1}
+    db = _get_db()
+    cursor = db[CLAIMS_COLLECTION].find(query, projection).sort([('hit_count', -1), ('last_seen', -1)]).limit(limit)
+    return [serialize_claim_document(document) for document in cursor]
+
+def iter_claim_texts(since: Optional[datetime] = None):
+    """Yields {claim_fingerprint, claim_text, timestamp} for text claims saved after since, oldest first."""
+    query: Dict[str, Any] = {'claim_text': {'$type': 'string'}, 'claim_fingerprint': {'$type': 'string'}}
+    if since is not None:
+        query['timestamp'] = {'$gt': since}
+    db = _get_db()
+    cursor = db[CLAIMS_COLLECTION].find(query, {'_id': 0, 'claim_fingerprint': 1, 'claim_text': 1, 'timestamp': 1})
+    return cursor.sort('timestamp', 1).batch_size(1000)
+
+def iter_labeled_claims(verdicts, since: Optional[datetime] = None):
+    """Yields text claims with an LLM verdict in verdicts (fast_classifier.py training data), oldest first."""
+    query: Dict[str, Any] = {'claim_text': {'$type': 'string'}, 'llm_judgment': {'$in': list(verdicts)},
+                             'verdict_source': {'$ne': 'fast_classifier'}}
+    if since is not None:
+        query['timestamp'] = {'$gt': since}
+    db = _get_db()
+    projection = {'_id': 0, 'claim_fingerprint': 1, 'claim_text': 1, 'llm_judgment': 1, 'credibility_score': 1}
+    return db[CLAIMS_COLLECTION].find(query, projection).sort('timestamp', 1).batch_size(1000)
 
 def get_all_claims_history() -> List[Dict[str, Any]]:
     """
     Retrieves all saved claims from the database for the Verification Gallery,
-    sorted by the newest claims first.
+    sorted by the newest claims first. Prefer get_claims_history_page() for large collections.
     """
     try:
         db = _get_db()
         cursor = db[CLAIMS_COLLECTION].find({}, {'_id': 0}).sort('timestamp', -1)
-        return json.loads(json_util.dumps(list(cursor)))
+        return [serialize_claim_document(document) for document in cursor]
     except Exception as e:
-        print(f"MONGO DB ERROR: Failed to retrieve claims history. Details: {e}")
-        return []
\ No newline at end of file
+        logger.error("MONGO DB ERROR: Failed to retrieve claims history. Details: %s", e)
+        return []
+
+def find_recent_claim(fingerprint: str, max_age_seconds: float) -> Optional[Dict[str, Any]]:
+    """
+    Returns the newest saved result for a claim fingerprint if it is younger than max_age_seconds,
+    mapped back to the verifier.process_claim() output shape. Used as the verdict cache's persistent tier.
+    """
+    try:
+        db = _get_db()
+        cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+        with _operation_timeout():
+            document = db[CLAIMS_COLLECTION].find_one(
+                {'claim_fingerprint': fingerprint, 'timestamp': {'$gte': cutoff}},
+                {'_id': 0},
+                sort=[('timestamp', -1)],
+            )
+    except Exception:
+        logger.exception("MONGO DB ERROR: Failed to look up cached claim")
+        return None
+
+    if not document:
+        return None
+
+    result = {
+        'credibility_score': document.get('credibility_score', 0),
+        'llm_judgment': document.get('llm_judgment', 'N/A'),
+        'trusted_reference': document.get('trusted_reference', 'N/A'),
+        'reasoning': document.get('reasoning', 'No specific reasoning provided.'),
+        'source_origin': document.get('original_input', 'N/A'),
+        'claims_processed': document.get('claims_processed', 1),
+        'extracted_terms': document.get('extracted_terms', []),
+        'debug_message': document.get('debug_message', 'No debug info.'),
+        '_cached_at': document.get('timestamp'),
+    }
+    if document.get('claim_results'):
+        result['claim_results'] = document['claim_results']
+    return result
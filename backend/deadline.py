@@ -0,0 +1,130 @@
+import contextvars
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Deadline Configuration (read from .env) ---
+# Overall budget for one claim when the caller does not send X-Request-Deadline-Ms
+REQUEST_DEADLINE_SECONDS = float(os.environ.get('REQUEST_DEADLINE_SECONDS', '45'))
+# Upper bound for budgets requested by clients
+REQUEST_DEADLINE_MAX_SECONDS = float(os.environ.get('REQUEST_DEADLINE_MAX_SECONDS', '120'))
+
+DEADLINE_HEADER = 'X-Request-Deadline-Ms'
+
+# Share of the *remaining* budget a stage may use. The rest is held back for the stages after
+# it, so a slow scrape still leaves time for the verdict call.
+STAGE_BUDGET_FRACTIONS: Dict[str, float] = {
+    'scrape': 0.45,
+    'style_llm': 0.35,
+    'ner': 0.25,
+    'claim_extraction': 0.25,
+    'verdict_llm': 0.9,
+    'combined_llm': 0.9,
+    'mongo': 0.5,
+}
+# A stage is skipped (and the pipeline degrades) when less than this is left
+STAGE_MIN_SECONDS: Dict[str, float] = {
+    'scrape': float(os.environ.get('DEADLINE_MIN_SCRAPE_SECONDS', '3')),
+    'style_llm': float(os.environ.get('DEADLINE_MIN_STYLE_SECONDS', '4')),
+    'ner': 0.2,
+    # Extraction only pays off if the per-claim verdict calls still fit afterwards
+    'claim_extraction': float(os.environ.get('DEADLINE_MIN_CLAIM_EXTRACTION_SECONDS', '6')),
+    'verdict_llm': float(os.environ.get('DEADLINE_MIN_VERDICT_SECONDS', '2')),
+    'combined_llm': float(os.environ.get('DEADLINE_MIN_VERDICT_SECONDS', '2')),
+    'semantic_lookup': 0.1,
+}
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage runs out of its slice of the request budget."""
+
+
+class Deadline:
+    """The time budget of one request plus the stages that were skipped or cut short to stay within it."""
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.skipped: List[str] = []
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def slice_for(self, stage: str) -> float:
+        """Seconds stage may use: its fraction of what is left (all of it for unlisted stages)."""
+        return self.remaining() * STAGE_BUDGET_FRACTIONS.get(stage, 1.0)
+
+    def allows(self, stage: str) -> bool:
+        return self.remaining() >= STAGE_MIN_SECONDS.get(stage, 0.0)
+
+    def skip(self, stage: str) -> None:
+        with self._lock:
+            if stage not in self.skipped:
+                self.skipped.append(stage)
+        logger.warning("Deadline: skipping %s (%.2fs of %.1fs left)", stage, self.remaining(), self.budget)
+
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar('medverify_request_deadline', default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+@contextmanager
+def request_deadline(seconds: Optional[float] = None):
+    """
+    Sets the budget for one claim (default REQUEST_DEADLINE_SECONDS). Like the telemetry spans it
+    travels in a contextvar, so stages run through asyncio.to_thread see the same deadline.
+    """
+    deadline = Deadline(REQUEST_DEADLINE_SECONDS if seconds is None else seconds)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def should_run(stage: str) -> bool:
+    """False (and the stage is recorded as skipped) when too little of the budget is left to start it."""
+    deadline = _current_deadline.get()
+    if deadline is None or deadline.allows(stage):
+        return True
+    deadline.skip(stage)
+    return False
+
+
+def stage_timeout(stage: str, default: Optional[float]) -> Optional[float]:
+    """The stage's own timeout, capped at its slice of the current request's remaining budget."""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return default
+    budget = deadline.slice_for(stage)
+    return budget if default is None else min(default, budget)
+
+
+def mark_timed_out(stage: str) -> None:
+    """Records a stage that started but was cut short by the deadline."""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.skip(stage)
+
+
+def parse_deadline_header(value: Optional[str]) -> Optional[float]:
+    """X-Request-Deadline-Ms -> seconds, capped at REQUEST_DEADLINE_MAX_SECONDS. Raises ValueError if malformed."""
+    if value is None or not value.strip():
+        return None
+    milliseconds = float(value)
+    if not math.isfinite(milliseconds) or milliseconds <= 0:
+        raise ValueError(f"{DEADLINE_HEADER} must be a positive number of milliseconds.")
+    return min(milliseconds / 1000.0, REQUEST_DEADLINE_MAX_SECONDS)
@@ -0,0 +1,403 @@
+# fast_classifier.py
+#
+# Local fast-path verdict classifier for text claims: hashed word/character n-grams (HashingEmbedder)
+# and a multinomial logistic regression in NumPy, trained offline on the LLM verdicts in
+# verified_claims_history. With FAST_CLASSIFIER_ENABLED=true, process_claim() answers from it without
+# calling Gemini when its confidence reaches the threshold chosen at training time and the claim has
+# no negation or polarity word. Those answers are advisory: they are never stored or cached.
+#
+# `train` fits on a holdout split, reports agreement with the LLM verdicts, picks the lowest
+# threshold whose holdout agreement reaches --target-agreement, then refits on every claim and
+# saves the model. `evaluate` measures a saved model against LLM verdicts stored after it was trained.
+#
+#   python fast_classifier.py train --target-agreement 0.97
+#   python fast_classifier.py evaluate
+
+import argparse
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: the fast path is disabled without NumPy
+    np = None
+
+from input_normalizer import normalize_text_claim
+from model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+# --- Fast Classifier Configuration (read from .env) ---
+FAST_CLASSIFIER_ENABLED = os.environ.get('FAST_CLASSIFIER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+FAST_CLASSIFIER_PATH = os.environ.get('FAST_CLASSIFIER_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.fast_classifier', 'model.npz'))
+# Overrides the threshold stored with the model (the probability of the predicted verdict)
+FAST_CLASSIFIER_THRESHOLD = os.environ.get('FAST_CLASSIFIER_THRESHOLD')
+FAST_CLASSIFIER_HASH_DIM = int(os.environ.get('FAST_CLASSIFIER_HASH_DIM', '4096'))
+FAST_CLASSIFIER_MIN_EXAMPLES = int(os.environ.get('FAST_CLASSIFIER_MIN_EXAMPLES', '200'))
+
+# Only real LLM judgments are training labels; errors and the classifier's own answers are not
+TRAINABLE_VERDICTS = ('Contradicted', 'Supported', 'Unsupported/Neutral')
+VERDICT_SOURCE = 'fast_classifier'
+THRESHOLD_GRID = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.93, 0.95, 0.97, 0.98, 0.99)
+
+
+# --- Features ---
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOP_WORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'been', 'it', 'its', 'this', 'that', 'of', 'to',
+    'for', 'in', 'on', 'and', 'or', 'as', 'at', 'by', 'with', 'can', 'will', 'does', 'do', 'you', 'your',
+}
+# Hashed n-grams score "increases"/"decreases" pairs as near-identical (about 0.8 cosine), so claims
+# whose verdict hinges on a negation or a direction word never get a confident local answer
+NEGATION_WORDS = {'not', 'no', 'never', 'neither', 'nor', 'none', 'without', 'cannot', 'nothing', 'lack', 'lacks'}
+POLARITY_WORDS = {'more', 'less', 'fewer', 'higher', 'better', 'worse', 'up', 'down', 'safe', 'unsafe',
+                  'good', 'bad', 'anti', 'pro', 'against'}
+POLARITY_STEMS = ('increas', 'decreas', 'rais', 'lower', 'reduc', 'boost', 'cut', 'drop', 'elevat', 'prevent',
+                  'caus', 'trigger', 'worsen', 'improv', 'inhibit', 'block', 'promot', 'protect', 'harm',
+                  'benefi', 'risk', 'danger', 'weaken', 'strengthen', 'slow', 'speed', 'accelerat', 'delay')
+
+
+def polarity_cues(text: str) -> FrozenSet[str]:
+    """
+    The negation and direction/comparison words a claim's verdict may hinge on, by stem ('not' for
+    any negation): "smoking increases risk" -> {'increas', 'risk'}, "... decreases ..." -> {'decreas', 'risk'}.
+    """
+    cues = set()
+    for token in TOKEN_RE.findall(normalize_text_claim(text).replace('\u2019', "'")):
+        if token in NEGATION_WORDS or token.endswith("n't"):
+            cues.add('not')
+        elif token in POLARITY_WORDS:
+            cues.add(token)
+        else:
+            cues.update(stem for stem in POLARITY_STEMS if token.startswith(stem))
+    return frozenset(cues)
+
+
+def has_polarity_cue(text: str) -> bool:
+    """True when the claim has a negation or a direction/comparison word its verdict may hinge on."""
+    return bool(polarity_cues(text))
+
+
+def _stable_hash(feature: str) -> int:
+    # Python's hash() is salted per process; vectors must be identical across restarts and workers
+    return zlib.crc32(feature.encode('utf-8'))
+
+
+class HashingEmbedder:
+    """
+    Bag of word unigrams/bigrams plus character 3-5-grams of each word, folded into dim buckets with
+    signed feature hashing, sublinear TF weights and L2 normalization. Character grams let inflections
+    and spelling variants ("health"/"healthy") share features.
+    """
+
+    def __init__(self, dim: int = FAST_CLASSIFIER_HASH_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[Tuple[str, float]]:
+        words = [token for token in TOKEN_RE.findall(normalize_text_claim(text)) if token not in STOP_WORDS]
+        features = [(f"w:{word}", 1.0) for word in words]
+        features += [(f"b:{first} {second}", 0.7) for first, second in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            for size in (3, 4, 5):
+                features += [(f"c:{padded[i:i + size]}", 0.3) for i in range(len(padded) - size + 1)]
+        return features
+
+    def embed(self, text: str):
+        counts = {}
+        for feature, weight in self._features(text):
+            hashed = _stable_hash(feature)
+            bucket = hashed % self.dim
+            sign = 1.0 if (hashed >> 31) & 1 else -1.0
+            counts[bucket] = counts.get(bucket, 0.0) + sign * weight
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for bucket, value in counts.items():
+            vector[bucket] = np.sign(value) * np.log1p(abs(value))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+def _embedder(dim: int) -> HashingEmbedder:
+    return HashingEmbedder(dim)
+
+
+def _featurize(texts: Sequence[str], dim: int):
+    embedder = _embedder(dim)
+    return np.vstack([embedder.embed(text) for text in texts]).astype(np.float32)
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class FastClassifier:
+    """A trained verdict model: softmax weights over hashed features plus a typical score per verdict."""
+
+    def __init__(self, labels: List[str], weights, bias, label_scores: Dict[str, int], dim: int,
+                 threshold: Optional[float], metadata: Optional[Dict[str, Any]] = None):
+        self.labels = labels
+        self.weights = weights
+        self.bias = bias
+        self.label_scores = label_scores
+        self.dim = dim
+        self.threshold = threshold
+        self.metadata = metadata or {}
+        self._embed = _embedder(dim).embed
+
+    @classmethod
+    def fit(cls, texts: Sequence[str], labels: Sequence[str], scores: Sequence[float], dim: int = FAST_CLASSIFIER_HASH_DIM,
+            epochs: int = 300, learning_rate: float = 1.0, l2: float = 1e-4) -> "FastClassifier":
+        """Full-batch gradient descent on class-balanced cross-entropy with L2 regularization."""
+        classes = sorted(set(labels))
+        index = {label: i for i, label in enumerate(classes)}
+        features = _featurize(texts, dim)
+        targets = np.zeros((len(labels), len(classes)), dtype=np.float32)
+        targets[np.arange(len(labels)), [index[label] for label in labels]] = 1.0
+        # Rare verdicts weigh as much in total as common ones
+        sample_weights = (len(labels) / (len(classes) * targets.sum(axis=0)))[targets.argmax(axis=1)][:, None]
+
+        weights = np.zeros((dim, len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+        for _ in range(epochs):
+            gradient = (_softmax(features @ weights + bias) - targets) * sample_weights / len(labels)
+            weights -= learning_rate * (features.T @ gradient + l2 * weights)
+            bias -= learning_rate * gradient.sum(axis=0)
+
+        scores = np.asarray(scores, dtype=np.float32)
+        label_scores = {label: int(round(float(np.median(scores[np.asarray(labels) == label])))) for label in classes}
+        return cls(classes, weights, bias, label_scores, dim, threshold=None)
+
+    def predict_proba(self, texts: Sequence[str]):
+        return _softmax(_featurize(texts, self.dim) @ self.weights + self.bias)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """(verdict, probability) for one claim; well under a millisecond for a short claim."""
+        probabilities = _softmax((self._embed(text) @ self.weights + self.bias)[None, :])[0]
+        best = int(probabilities.argmax())
+        return self.labels[best], float(probabilities[best])
+
+    def effective_threshold(self) -> Optional[float]:
+        if FAST_CLASSIFIER_THRESHOLD:
+            return float(FAST_CLASSIFIER_THRESHOLD)
+        return self.threshold
+
+    def save(self, path: str = FAST_CLASSIFIER_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        meta = dict(self.metadata, labels=self.labels, label_scores=self.label_scores, dim=self.dim,
+                    threshold=self.threshold)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, weights=self.weights, bias=self.bias, meta=np.array(json.dumps(meta, default=str)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = FAST_CLASSIFIER_PATH) -> "FastClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(meta.pop('labels'), data['weights'], data['bias'], meta.pop('label_scores'),
+                       meta.pop('dim'), meta.pop('threshold'), meta)
+
+
+def _load_fast_classifier() -> FastClassifier:
+    """Registry loader; fails (and the fast path stays off) until `python fast_classifier.py train` has run."""
+    if np is None:
+        raise RuntimeError("NumPy is required for the fast classifier")
+    model = FastClassifier.load(FAST_CLASSIFIER_PATH)
+    logger.info("Fast classifier loaded (threshold %s, trained on %s claims).",
+                model.effective_threshold(), model.metadata.get('examples'))
+    return model
+
+
+FAST_CLASSIFIER_NAME = "fast_classifier"
+
+if FAST_CLASSIFIER_ENABLED:
+    # Optional: readiness never waits for it
+    registry.register(FAST_CLASSIFIER_NAME, _load_fast_classifier, required=False)
+
+
+def classify(text: str) -> Optional[Tuple[str, float, bool]]:
+    """
+    (verdict, probability, confident) for a text claim, or None when the fast path is disabled or
+    no model is loaded. confident is True when probability reaches the model's threshold and the
+    claim has no polarity cue (has_polarity_cue()); the prediction itself is only advisory.
+    """
+    if not FAST_CLASSIFIER_ENABLED:
+        return None
+    model = registry.get(FAST_CLASSIFIER_NAME)
+    if model is None:
+        return None
+    threshold = model.effective_threshold()
+    verdict, probability = model.predict(text)
+    confident = threshold is not None and probability >= threshold and not has_polarity_cue(text)
+    return verdict, probability, confident
+
+
+def typical_score(verdict: str) -> int:
+    """Median credibility score the LLM pipeline gave claims with this verdict in the training data."""
+    model = registry.get(FAST_CLASSIFIER_NAME)
+    return model.label_scores.get(verdict, 50) if model is not None else 50
+
+
+# --- Training & evaluation ---
+def load_labeled_claims(since: Optional[datetime] = None) -> Tuple[List[str], List[str], List[float]]:
+    """Newest LLM verdict per distinct text claim: (texts, verdicts, credibility scores), oldest first."""
+    from db_utils import iter_labeled_claims
+
+    latest: Dict[str, Tuple[str, str, float]] = {}
+    for document in iter_labeled_claims(TRAINABLE_VERDICTS, since=since):
+        key = document.get('claim_fingerprint') or document['claim_text']
+        latest[key] = (document['claim_text'], document['llm_judgment'], float(document.get('credibility_score', 0)))
+    rows = list(latest.values())
+    return [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows]
+
+
+def agreement_report(model: FastClassifier, texts: Sequence[str], verdicts: Sequence[str],
+                     thresholds: Sequence[float] = THRESHOLD_GRID) -> Dict[str, Any]:
+    """Agreement with the LLM verdicts overall and, per threshold, on the claims the fast path would answer."""
+    probabilities = model.predict_proba(texts)
+    predicted = [model.labels[i] for i in probabilities.argmax(axis=1)]
+    confidence = probabilities.max(axis=1)
+    agree = np.array([p == v for p, v in zip(predicted, verdicts)])
+    labels = sorted(set(model.labels) | set(verdicts))
+
+    confusion = {actual: {guess: 0 for guess in labels} for actual in labels}
+    for guess, actual in zip(predicted, verdicts):
+        confusion[actual][guess] += 1
+    # Cohen's kappa: agreement beyond what the two label distributions give by chance
+    total = len(verdicts)
+    chance = sum(sum(confusion[label].values()) * sum(row[label] for row in confusion.values())
+                 for label in labels) / (total * total)
+    observed = float(agree.mean())
+
+    rows = []
+    for threshold in thresholds:
+        answered = confidence >= threshold
+        rows.append({
+            'threshold': threshold,
+            'coverage': round(float(answered.mean()), 4),
+            'agreement': round(float(agree[answered].mean()), 4) if answered.any() else None,
+        })
+    return {
+        'examples': total,
+        'agreement': round(observed, 4),
+        'cohen_kappa': round((observed - chance) / (1 - chance), 4) if chance < 1 else None,
+        'confusion': confusion,
+        'thresholds': rows,
+    }
+
+
+def choose_threshold(report: Dict[str, Any], target_agreement: float, min_answered: int = 20) -> Optional[float]:
+    """Lowest threshold whose answered claims agree with the LLM at least target_agreement of the time."""
+    for row in report['thresholds']:
+        answered = row['coverage'] * report['examples']
+        if row['agreement'] is not None and row['agreement'] >= target_agreement and answered >= min_answered:
+            return row['threshold']
+    return None
+
+
+def _print_report(title: str, report: Dict[str, Any]) -> None:
+    print(f"{title}: {report['examples']} claims, agreement {report['agreement']:.3f}, kappa {report['cohen_kappa']}")
+    for row in report['thresholds']:
+        agreement = f"{row['agreement']:.3f}" if row['agreement'] is not None else "  -  "
+        print(f"  p >= {row['threshold']:<5} answers {row['coverage']:6.1%} of claims, agreement {agreement}")
+
+
+def _init_mongo() -> None:
+    from config import app, mongo
+    app.config["MONGO_URI"] = os.environ.get("MONGO_URI")
+    if not app.config["MONGO_URI"]:
+        raise SystemExit("FATAL: MONGO_URI environment variable is not set in the .env file.")
+    mongo.init_app(app)
+
+
+def _train(args) -> None:
+    texts, verdicts, scores = load_labeled_claims()
+    if len(texts) < args.min_examples:
+        raise SystemExit(f"Only {len(texts)} distinct LLM-verified text claims; need {args.min_examples}.")
+
+    order = np.random.default_rng(args.seed).permutation(len(texts))
+    cut = int(len(order) * (1 - args.holdout))
+    train_rows, test_rows = order[:cut], order[cut:]
+    pick = lambda values, rows: [values[i] for i in rows]  # noqa: E731
+
+    started = time.perf_counter()
+    candidate = FastClassifier.fit(pick(texts, train_rows), pick(verdicts, train_rows), pick(scores, train_rows),
+                                   dim=args.dim, epochs=args.epochs)
+    report = agreement_report(candidate, pick(texts, test_rows), pick(verdicts, test_rows))
+    _print_report("Holdout", report)
+    threshold = choose_threshold(report, args.target_agreement)
+    if threshold is None:
+        print(f"No threshold reaches {args.target_agreement:.0%} agreement; the fast path will never answer.")
+    else:
+        print(f"Threshold {threshold} (holdout agreement >= {args.target_agreement:.0%})")
+
+    # Final model: every claim, with the threshold calibrated on the holdout
+    model = FastClassifier.fit(texts, verdicts, scores, dim=args.dim, epochs=args.epochs)
+    model.threshold = threshold
+    model.metadata = {'examples': len(texts), 'trained_at': datetime.utcnow().isoformat(),
+                      'target_agreement': args.target_agreement, 'holdout': report}
+    if args.dry_run:
+        print(f"Dry run: model not saved ({time.perf_counter() - started:.1f}s)")
+        return
+    model.save(args.path)
+    print(f"Saved {args.path} ({len(texts)} claims, {time.perf_counter() - started:.1f}s)")
+
+
+def _evaluate(args) -> None:
+    model = FastClassifier.load(args.path)
+    since = None if args.all else datetime.fromisoformat(model.metadata['trained_at'])
+    texts, verdicts, _ = load_labeled_claims(since=since)
+    if not texts:
+        raise SystemExit("No LLM-verified text claims to evaluate against" + ("" if args.all else " since training."))
+    threshold = model.effective_threshold()
+    grid = sorted(set(THRESHOLD_GRID) | ({threshold} if threshold is not None else set()))
+    report = agreement_report(model, texts, verdicts, thresholds=grid)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    _print_report("Since training" if since else "All claims", report)
+    row = next((row for row in report['thresholds'] if row['threshold'] == threshold), None)
+    if row is not None:
+        print(f"At the active threshold {threshold}: answers {row['coverage']:.1%}, agreement {row['agreement']}")
+
+
+def main() -> None:
+    from dotenv import load_dotenv
+    load_dotenv()
+    from telemetry import configure_logging
+
+    parser = argparse.ArgumentParser(description="Train or evaluate the local fast-path verdict classifier.")
+    parser.add_argument('--path', default=FAST_CLASSIFIER_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    train = commands.add_parser('train', help="fit on verified_claims_history and save the model")
+    train.add_argument('--target-agreement', type=float, default=0.97)
+    train.add_argument('--holdout', type=float, default=0.2, help="fraction of claims held out for calibration")
+    train.add_argument('--dim', type=int, default=FAST_CLASSIFIER_HASH_DIM)
+    train.add_argument('--epochs', type=int, default=300)
+    train.add_argument('--min-examples', type=int, default=FAST_CLASSIFIER_MIN_EXAMPLES)
+    train.add_argument('--seed', type=int, default=1)
+    train.add_argument('--dry-run', action='store_true', help="report agreement without saving")
+    evaluate = commands.add_parser('evaluate', help="agreement of the saved model with LLM verdicts")
+    evaluate.add_argument('--all', action='store_true', help="include claims from before training")
+    evaluate.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    configure_logging()
+
+    if np is None:
+        raise SystemExit("NumPy is required: pip install numpy")
+    _init_mongo()
+    if args.command == 'train':
+        _train(args)
+    else:
+        _evaluate(args)
+
+
+if __name__ == '__main__':
+    main()
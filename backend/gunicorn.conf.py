@@ -0,0 +1,72 @@
+# gunicorn.conf.py
+#
+# Production serving for the Flask app (the app.run() dev server is for local development only):
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# Every setting below can be tuned from the environment. Claims spend most of their time
+# waiting on Gemini and on scrapes, so each worker serves many requests at once with threads
+# (gthread). GUNICORN_WORKER_CLASS=gevent also works (pip install gevent; leave
+# MODEL_WARMUP_MODE off 'preload' so monkey-patching happens before the app imports).
+#
+# Shutdown: on SIGTERM each worker marks itself draining (/readyz -> 503), keeps serving for
+# SHUTDOWN_DRAIN_SECONDS, stops accepting, lets in-flight claims finish within
+# GUNICORN_GRACEFUL_TIMEOUT and flushes pending MongoDB writes before exiting.
+
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+wsgi_app = 'wsgi:app'
+
+# --- Listening socket ---
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+backlog = int(os.environ.get('GUNICORN_BACKLOG', '2048'))
+
+# --- Workers and concurrency ---
+# Each worker holds its own spaCy pipeline, so scale concurrency with threads before workers.
+# Threads beyond LLM_MAX_CONCURRENCY (per process) only queue for Gemini: a text claim makes two
+# LLM calls, so one worker tops out near LLM_MAX_CONCURRENCY / (2 x Gemini latency) claims/s.
+workers = int(os.environ.get('WEB_CONCURRENCY', str(min(4, multiprocessing.cpu_count()))))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', '32'))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '256'))
+# Recycle workers periodically to bound memory growth (0 disables)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+# --- Timeouts ---
+# A worker that stops heartbeating for this long (a hung request on a sync/gevent worker) is killed
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+# Time in-flight requests get to finish after SIGTERM before workers are killed
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# Load models once in the master so forked workers share their pages (see model_registry.py)
+preload_app = os.environ.get('MODEL_WARMUP_MODE', 'background').lower() == 'preload'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+
+
+# --- Server hooks ---
+def post_worker_init(worker):
+    """Fail readiness first on SIGTERM, then hand over to gunicorn's graceful stop."""
+    from lifecycle import install_drain_handler
+    install_drain_handler(worker.handle_exit)
+
+
+def worker_exit(server, worker):
+    """Runs in the worker after its last request: drain, flush the claim writer, close HTTP pools."""
+    from lifecycle import shutdown
+    shutdown()
+
+
+def child_exit(server, worker):
+    # Drop the dead worker's metric files so /metrics aggregates only live processes
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,72 @@
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Connection Pool Configuration (read from .env) ---
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', '16'))
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '16'))
+HTTP_MAX_HOSTS = int(os.environ.get('HTTP_MAX_HOSTS', '256'))
+
+
+class SessionPool:
+    """
+    Long-lived requests.Session objects, one per target host, each with a urllib3 connection
+    pool (keep-alive) sized by HTTP_POOL_MAXSIZE. Proxied requests reuse the adapter's
+    per-proxy pools as well. Retries stay with the callers, so adapters never retry on their own.
+    """
+
+    def __init__(self, pool_connections: int = HTTP_POOL_CONNECTIONS,
+                 pool_maxsize: int = HTTP_POOL_MAXSIZE, max_hosts: int = HTTP_MAX_HOSTS):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_hosts = max_hosts
+        self._sessions: "OrderedDict[str, requests.Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def session_for(self, url: str) -> requests.Session:
+        host = (urlsplit(url).hostname or '').lower()
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is not None:
+                self._sessions.move_to_end(host)
+                return session
+            if len(self._sessions) >= self.max_hosts:
+                # Forget the least recently used host's session without closing it: another thread
+                # may still be mid-request on it, and its pool is released once nothing refers to it
+                self._sessions.popitem(last=False)
+            session = self._new_session()
+            self._sessions[host] = session
+            return session
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Drop-in replacement for requests.get() that reuses pooled connections."""
+        return self.session_for(url).get(url, **kwargs)
+
+    def close_all(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def _reset_after_fork(self) -> None:
+        # Sockets inherited from the parent must not be shared with it
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+
+# Shared process-wide pool used by the scraper and the proxy list refresher
+http_pool = SessionPool()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=http_pool._reset_after_fork)
@@ -0,0 +1,77 @@
+import hashlib
+import re
+import unicodedata
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# --- Query parameters that never change the content behind a URL ---
+TRACKING_PARAM_PREFIXES = ('utm_',)
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', 'ref', 'ref_src', 'ref_url', 'spm', 'si', 'cmpid', 'ncid',
+}
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def is_url_input(raw_input: str) -> bool:
+    """Stage 0 input kind: URLs are scraped, anything else is a text claim. Shared by the pipeline and the fingerprint."""
+    return raw_input.startswith('http')
+
+
+def _is_tracking_param(name: str) -> bool:
+    lowered = name.lower()
+    return lowered in TRACKING_PARAMS or lowered.startswith(TRACKING_PARAM_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Returns a canonical form of a URL: lower-cased scheme/host, no 'www.', no default port,
+    no fragment, tracking parameters removed and the remaining query sorted.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower().rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+
+    netloc = host
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{port}"
+
+    path = parts.path or '/'
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/') or '/'
+
+    query_pairs = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(key)
+    ]
+    query = urlencode(sorted(query_pairs))
+
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def normalize_text_claim(text: str) -> str:
+    """Folds unicode compatibility forms, case and whitespace of a raw-text claim."""
+    text = unicodedata.normalize('NFKC', text)
+    return WHITESPACE_RE.sub(' ', text).strip().casefold()
+
+
+def normalize_claim_input(raw_input: str) -> str:
+    """Normalizes user input (text or URL) so equivalent submissions compare equal."""
+    if is_url_input(raw_input):
+        return canonicalize_url(raw_input)
+    return normalize_text_claim(raw_input)
+
+
+def claim_fingerprint(raw_input: str) -> str:
+    """Content-addressed key for a claim: sha256 of its normalized form, prefixed by input kind."""
+    kind = 'url' if is_url_input(raw_input) else 'text'
+    digest = hashlib.sha256(normalize_claim_input(raw_input).encode('utf-8')).hexdigest()
+    return f"{kind}:{digest}"
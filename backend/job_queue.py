@@ -0,0 +1,306 @@
+import ipaddress
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from telemetry import register_gauges
+
+logger = logging.getLogger(__name__)
+
+# --- Job Queue Configuration (read from .env) ---
+# One SQLite file shared by the API processes (enqueue / status) and job_worker.py processes (dequeue)
+JOB_QUEUE_PATH = os.environ.get('JOB_QUEUE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.job_queue', 'jobs.sqlite'))
+# A claimed job becomes visible to other workers again if its lease is not renewed within this window
+JOB_VISIBILITY_TIMEOUT_SECONDS = float(os.environ.get('JOB_VISIBILITY_TIMEOUT_SECONDS', '120'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get('JOB_RETRY_BASE_SECONDS', '5'))
+# Intake is refused (429) while this many jobs are waiting
+JOB_QUEUE_MAX_PENDING = int(os.environ.get('JOB_QUEUE_MAX_PENDING', '10000'))
+# Finished jobs (and their results) are kept this long for polling
+JOB_RESULT_TTL_SECONDS = float(os.environ.get('JOB_RESULT_TTL_SECONDS', str(24 * 3600)))
+# Comma-separated callback hosts (".example.com" also allows its subdomains). When set, callbacks
+# may only go to these; otherwise any host that resolves to public addresses only is accepted
+JOB_CALLBACK_ALLOWED_HOSTS = [host.strip().lower() for host in os.environ.get('JOB_CALLBACK_ALLOWED_HOSTS', '').split(',')
+                              if host.strip()]
+
+# Higher runs first; clients pick from these names
+JOB_PRIORITIES = {'low': 0, 'normal': 5, 'high': 10}
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+
+class QueueFull(Exception):
+    """Raised by enqueue() when JOB_QUEUE_MAX_PENDING jobs are already waiting."""
+
+
+def check_callback_url(url: str, allowed_hosts=None) -> None:
+    """
+    Raises ValueError unless url is an absolute http(s) URL the job worker may POST results to:
+    an allowlisted host, or (without an allowlist) one whose every address is public. Loopback,
+    private, link-local (cloud metadata) and other internal addresses would let clients use the
+    worker to reach services inside the deployment.
+    """
+    allowed_hosts = JOB_CALLBACK_ALLOWED_HOSTS if allowed_hosts is None else allowed_hosts
+    parts = urlsplit(str(url))
+    host = (parts.hostname or '').lower()
+    if parts.scheme not in ('http', 'https') or not host:
+        raise ValueError("'callback_url' must be an absolute http(s) URL.")
+    if allowed_hosts:
+        if not any(host == allowed or (allowed.startswith('.') and host.endswith(allowed))
+                   for allowed in allowed_hosts):
+            raise ValueError("'callback_url' host is not in JOB_CALLBACK_ALLOWED_HOSTS.")
+        return
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, ValueError):
+        raise ValueError("'callback_url' host could not be resolved.") from None
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%', 1)[0])
+        if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError("'callback_url' must not point to a loopback, private or link-local address.")
+
+
+class Job:
+    """A claimed job as handed to a worker: its payload plus the lease it holds on it."""
+
+    def __init__(self, job_id: str, payload: Dict[str, Any], priority: int, attempts: int, max_attempts: int,
+                 callback_url: Optional[str], lease_token: str):
+        self.id = job_id
+        self.payload = payload
+        self.priority = priority
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.callback_url = callback_url
+        self.lease_token = lease_token
+
+
+class JobQueue:
+    """
+    Durable priority work queue in a local SQLite file (WAL mode, so readers never block the writer).
+
+    claim() leases the highest-priority visible job to one worker for visibility_timeout seconds;
+    the worker renews the lease while it runs and then completes or fails the job. A job whose
+    lease expires (worker crashed or hung) is handed out again, counting as another attempt.
+    Failed attempts are retried with exponential backoff until max_attempts, then the job is
+    marked failed. Every state change is guarded by the lease token, so a worker whose lease was
+    taken over can no longer overwrite the new owner's result.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, retry_base_seconds: float = JOB_RETRY_BASE_SECONDS,
+                 max_pending: int = JOB_QUEUE_MAX_PENDING):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_seconds = retry_base_seconds
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    # --- Storage helpers ---
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, payload TEXT NOT NULL, priority INTEGER NOT NULL,"
+                " status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,"
+                " visible_at REAL NOT NULL, lease_token TEXT, callback_url TEXT, callback_status TEXT,"
+                " result TEXT, error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+            )
+            # Dequeue order: visible queued/running jobs, highest priority, oldest first
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(status, priority DESC, visible_at, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs(finished_at)")
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        """One write transaction; BEGIN IMMEDIATE takes the write lock up front so claims cannot interleave."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = {
+            'job_id': row['id'],
+            'status': row['status'],
+            'priority': row['priority'],
+            'attempts': row['attempts'],
+            'max_attempts': row['max_attempts'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+        }
+        if row['callback_url']:
+            job['callback_url'] = row['callback_url']
+            job['callback_status'] = row['callback_status']
+        if row['result'] is not None:
+            job['result'] = json.loads(row['result'])
+        if row['error'] is not None:
+            job['error'] = row['error']
+        return job
+
+    # --- Producer side ---
+    def enqueue(self, payload: Dict[str, Any], priority: int = JOB_PRIORITIES['normal'],
+                callback_url: Optional[str] = None, max_attempts: Optional[int] = None) -> str:
+        """Stores a new job and returns its id. Raises QueueFull when the backlog is at max_pending."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as conn:
+            if self.max_pending > 0:
+                pending = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (STATUS_QUEUED,)).fetchone()[0]
+                if pending >= self.max_pending:
+                    raise QueueFull(f"{pending} jobs are already queued")
+            conn.execute(
+                "INSERT INTO jobs (id, payload, priority, status, max_attempts, visible_at, callback_url,"
+                " callback_status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(payload), priority, STATUS_QUEUED, max_attempts or self.max_attempts,
+                 now, callback_url, 'pending' if callback_url else None, now)
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row) if row is not None else None
+
+    # --- Worker side ---
+    def claim(self) -> Optional[Job]:
+        """
+        Leases the next job: highest priority first among queued jobs that are due and running
+        jobs whose lease has expired. Returns None when nothing is ready.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT id, payload, priority, attempts, max_attempts, callback_url FROM jobs"
+                    " WHERE status IN (?, ?) AND visible_at <= ?"
+                    " ORDER BY priority DESC, visible_at, created_at LIMIT 1",
+                    (STATUS_QUEUED, STATUS_RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                attempts = row['attempts'] + 1
+                if attempts <= row['max_attempts']:
+                    break
+                # Its last lease ran out: the worker died or hung on every attempt
+                conn.execute(
+                    "UPDATE jobs SET status = ?, lease_token = NULL, error = ?, finished_at = ? WHERE id = ?",
+                    (STATUS_FAILED, "Lease expired on the final attempt (worker lost).", now, row['id'])
+                )
+                logger.warning("Job %s failed: lease expired after %d attempts", row['id'], row['attempts'])
+            lease_token = uuid.uuid4().hex
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, lease_token = ?, visible_at = ?,"
+                " started_at = COALESCE(started_at, ?) WHERE id = ?",
+                (STATUS_RUNNING, attempts, lease_token, now + self.visibility_timeout, now, row['id'])
+            )
+        return Job(row['id'], json.loads(row['payload']), row['priority'], attempts, row['max_attempts'],
+                   row['callback_url'], lease_token)
+
+    def extend_lease(self, job: Job) -> bool:
+        """Pushes the job's visibility timeout out again. False if the lease was lost to another worker."""
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET visible_at = ? WHERE id = ? AND lease_token = ?",
+                (time.time() + self.visibility_timeout, job.id, job.lease_token)
+            ).rowcount
+        return updated == 1
+
+    def complete(self, job: Job, result: Dict[str, Any]) -> bool:
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, lease_token = NULL, finished_at = ?"
+                " WHERE id = ? AND lease_token = ?",
+                (STATUS_SUCCEEDED, json.dumps(result, default=str), time.time(), job.id, job.lease_token)
+            ).rowcount
+        return updated == 1
+
+    def fail(self, job: Job, error: str) -> Optional[str]:
+        """
+        Records a failed attempt: the job is requeued after an exponential backoff, or marked
+        failed once max_attempts is used up. Returns the job's new status (STATUS_QUEUED or
+        STATUS_FAILED), or None if the lease was lost and another worker now owns the job.
+        """
+        now = time.time()
+        retry = job.attempts < job.max_attempts
+        with self._transaction() as conn:
+            if retry:
+                delay = self.retry_base_seconds * (2 ** (job.attempts - 1))
+                updated = conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, lease_token = NULL, visible_at = ?"
+                    " WHERE id = ? AND lease_token = ?",
+                    (STATUS_QUEUED, error, now + delay, job.id, job.lease_token)
+                ).rowcount
+            else:
+                updated = conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, lease_token = NULL, finished_at = ?"
+                    " WHERE id = ? AND lease_token = ?",
+                    (STATUS_FAILED, error, now, job.id, job.lease_token)
+                ).rowcount
+        if updated != 1:
+            return None
+        return STATUS_QUEUED if retry else STATUS_FAILED
+
+    def record_callback(self, job_id: str, callback_status: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET callback_status = ? WHERE id = ?", (callback_status, job_id))
+
+    # --- Maintenance ---
+    def purge_finished(self, older_than: float = JOB_RESULT_TTL_SECONDS) -> int:
+        """Deletes finished jobs past the result TTL; returns how many were removed."""
+        with self._transaction() as conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (*FINISHED_STATUSES, time.time() - older_than)
+            ).rowcount
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (STATUS_QUEUED, STATUS_RUNNING, STATUS_SUCCEEDED, STATUS_FAILED)}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def _reset_after_fork(self) -> None:
+        # SQLite connections must not be shared across processes
+        self._lock = threading.Lock()
+        self._conn = None
+
+
+# Shared process-wide queue used by app.py (intake, polling) and job_worker.py
+job_queue = JobQueue()
+
+register_gauges('medverify_jobs', "Jobs in the durable queue by status (see JobQueue.metrics).", job_queue.metrics)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=job_queue._reset_after_fork)
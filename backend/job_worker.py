@@ -0,0 +1,316 @@
+"""
+Worker pool for the durable job queue (job_queue.py): each process leases jobs submitted through
+POST /medverify/jobs, runs them through process_claim(), stores the result and POSTs it to the
+job's callback URL. The supervisor restarts processes that die, backing off when they die right
+after starting and giving up after JOB_WORKER_MAX_FAST_EXITS such exits in a row; a job they held
+becomes visible again once its lease expires. SIGTERM / Ctrl-C lets running jobs finish before exiting.
+
+Usage:
+    python job_worker.py --processes 4 --threads 8
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Dict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from telemetry import configure_logging
+from job_queue import JOB_PRIORITIES, STATUS_FAILED, Job, check_callback_url, job_queue
+
+logger = logging.getLogger("medverify.job_worker")
+
+# --- Job Worker Configuration (read from .env) ---
+JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', '2'))
+# Claims are I/O bound (scrape, Gemini), so each process runs several consumer threads
+JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', '8'))
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', '1.0'))
+# Jobs have no client connection waiting on them, so they get the largest per-claim budget
+JOB_DEADLINE_SECONDS = float(os.environ.get('JOB_DEADLINE_SECONDS', os.environ.get('REQUEST_DEADLINE_MAX_SECONDS', '120')))
+JOB_PURGE_INTERVAL_SECONDS = float(os.environ.get('JOB_PURGE_INTERVAL_SECONDS', '600'))
+JOB_WEBHOOK_TIMEOUT_SECONDS = float(os.environ.get('JOB_WEBHOOK_TIMEOUT_SECONDS', '10'))
+JOB_WEBHOOK_ATTEMPTS = int(os.environ.get('JOB_WEBHOOK_ATTEMPTS', '4'))
+JOB_WEBHOOK_RETRY_BASE_SECONDS = float(os.environ.get('JOB_WEBHOOK_RETRY_BASE_SECONDS', '2'))
+# A worker process that exits sooner than this after starting counts as a fast exit (crash loop)
+JOB_WORKER_FAST_EXIT_SECONDS = float(os.environ.get('JOB_WORKER_FAST_EXIT_SECONDS', '30'))
+# Restarts after consecutive fast exits back off exponentially, up to the max delay
+JOB_WORKER_RESTART_BACKOFF_SECONDS = float(os.environ.get('JOB_WORKER_RESTART_BACKOFF_SECONDS', '1'))
+JOB_WORKER_RESTART_BACKOFF_MAX_SECONDS = float(os.environ.get('JOB_WORKER_RESTART_BACKOFF_MAX_SECONDS', '60'))
+# The supervisor gives up (and exits non-zero) once a slot fast-exits this many times in a row
+JOB_WORKER_MAX_FAST_EXITS = int(os.environ.get('JOB_WORKER_MAX_FAST_EXITS', '5'))
+# When set, callbacks carry X-MedVerify-Signature: sha256=<HMAC of the body> so receivers can verify them
+JOB_WEBHOOK_SECRET = os.environ.get('JOB_WEBHOOK_SECRET', '')
+
+SIGNATURE_HEADER = 'X-MedVerify-Signature'
+
+
+# --- Webhook delivery ---
+def deliver_callback(job_id: str) -> None:
+    """POSTs the finished job (as GET /medverify/jobs/<id> returns it) to its callback URL, with retries."""
+    import requests
+    from http_pool import http_pool
+
+    job = job_queue.get(job_id)
+    if job is None or not job.get('callback_url'):
+        return
+    url = job['callback_url']
+    try:
+        # Checked again at delivery: the host's DNS may have changed since the job was accepted
+        check_callback_url(url)
+    except ValueError as e:
+        logger.warning("Callback for job %s to %s refused: %s", job_id, url, e)
+        job_queue.record_callback(job_id, f"refused: {e}")
+        return
+    job.pop('callback_status', None)
+    body = json.dumps(job, default=str).encode('utf-8')
+    headers = {'Content-Type': 'application/json'}
+    if JOB_WEBHOOK_SECRET:
+        digest = hmac.new(JOB_WEBHOOK_SECRET.encode('utf-8'), body, hashlib.sha256).hexdigest()
+        headers[SIGNATURE_HEADER] = f"sha256={digest}"
+
+    status = 'failed'
+    for attempt in range(1, max(1, JOB_WEBHOOK_ATTEMPTS) + 1):
+        try:
+            # Redirects are not followed: they could lead to a host that was never checked
+            response = http_pool.session_for(url).post(url, data=body, headers=headers,
+                                                       timeout=JOB_WEBHOOK_TIMEOUT_SECONDS, allow_redirects=False)
+            if response.status_code < 300:
+                status = 'delivered'
+                break
+            status = f"failed: HTTP {response.status_code}"
+            # A redirect, or the receiver rejected the payload itself; sending it again will not help
+            if 300 <= response.status_code < 500 and response.status_code not in (408, 429):
+                break
+        except requests.RequestException as e:
+            status = f"failed: {type(e).__name__}"
+        if attempt < JOB_WEBHOOK_ATTEMPTS:
+            time.sleep(JOB_WEBHOOK_RETRY_BASE_SECONDS * (2 ** (attempt - 1)))
+
+    if status != 'delivered':
+        logger.warning("Callback for job %s to %s %s", job_id, url, status)
+    job_queue.record_callback(job_id, status)
+
+
+# --- Worker process ---
+class LeaseKeeper:
+    """Renews the lease of every job this process is running, every third of the visibility timeout."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="job-lease-keeper", daemon=True)
+        self._thread.start()
+
+    def add(self, job: Job) -> None:
+        with self._lock:
+            self._jobs[job.id] = job
+
+    def remove(self, job: Job) -> None:
+        with self._lock:
+            self._jobs.pop(job.id, None)
+
+    def _run(self) -> None:
+        interval = max(1.0, job_queue.visibility_timeout / 3)
+        while not self._stop.wait(interval):
+            with self._lock:
+                jobs = list(self._jobs.values())
+            for job in jobs:
+                try:
+                    if not job_queue.extend_lease(job):
+                        logger.warning("Job %s: lease was taken over by another worker", job.id)
+                except Exception as e:
+                    logger.warning("Job %s: lease renewal failed: %s", job.id, e)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def _record_failure(job: Job, error: str) -> None:
+    status = job_queue.fail(job, error)
+    if status is None:
+        logger.warning("Job %s: lease lost before the failure was recorded; another worker owns it", job.id)
+    elif status == STATUS_FAILED:
+        deliver_callback(job.id)
+
+
+def run_job(job: Job) -> None:
+    """Runs one leased job to completion, failure or retry."""
+    from llm_gateway import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+    from verifier import process_claim
+
+    payload = job.payload
+    # High-priority jobs compete for LLM quota like interactive requests; the rest yield to them
+    llm_priority = PRIORITY_INTERACTIVE if job.priority >= JOB_PRIORITIES['high'] else PRIORITY_BATCH
+    logger.info("Job %s: attempt %d/%d", job.id, job.attempts, job.max_attempts)
+    try:
+        result = process_claim(payload['input'], force_refresh=payload.get('force_refresh') is True,
+                               priority=llm_priority,
+                               deadline_seconds=payload.get('deadline_seconds') or JOB_DEADLINE_SECONDS)
+    except Exception as e:
+        logger.exception("Job %s failed: %s", job.id, e)
+        _record_failure(job, str(e))
+        return
+
+    # A transient Gemini failure is worth another attempt; the last attempt's result is kept as is
+    if result.get('llm_judgment') == 'ERROR' and job.attempts < job.max_attempts:
+        _record_failure(job, result.get('reasoning') or "Verification failed.")
+        return
+    if job_queue.complete(job, result):
+        deliver_callback(job.id)
+    else:
+        logger.warning("Job %s: lease lost before completion; result discarded", job.id)
+
+
+def _consume(stop: threading.Event, lease_keeper: LeaseKeeper, poll_seconds: float) -> None:
+    from lifecycle import serving_state
+
+    while not stop.is_set():
+        try:
+            job = job_queue.claim()
+        except Exception as e:
+            logger.warning("Job queue claim failed: %s", e)
+            job = None
+        if job is None:
+            stop.wait(poll_seconds)
+            continue
+        lease_keeper.add(job)
+        serving_state.request_started()
+        try:
+            run_job(job)
+        except Exception as e:
+            # Leave the lease to expire; the job will be retried by another worker
+            logger.exception("Job %s: unexpected worker error: %s", job.id, e)
+        finally:
+            serving_state.request_finished()
+            lease_keeper.remove(job)
+
+
+def worker_main(threads: int, poll_seconds: float) -> None:
+    """Entry point of one worker process: Mongo + models, then `threads` consumers until SIGTERM."""
+    configure_logging()
+    from config import app, mongo
+    from model_registry import start_model_warmup
+    from lifecycle import shutdown
+
+    app.config["MONGO_URI"] = os.environ.get("MONGO_URI")
+    if not app.config["MONGO_URI"]:
+        raise SystemExit("FATAL: MONGO_URI environment variable is not set in the .env file.")
+    mongo.init_app(app)
+    start_model_warmup()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    # The supervisor handles Ctrl-C and forwards it as SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    lease_keeper = LeaseKeeper()
+    consumers = [threading.Thread(target=_consume, args=(stop, lease_keeper, poll_seconds),
+                                  name=f"job-consumer-{i}", daemon=True) for i in range(max(1, threads))]
+    for consumer in consumers:
+        consumer.start()
+    logger.info("Job worker %d started with %d consumer thread(s)", os.getpid(), len(consumers))
+
+    # Wait in short slices so the SIGTERM handler gets to run on the main thread
+    while not stop.wait(1.0):
+        pass
+    logger.info("Job worker %d stopping: letting running jobs finish", os.getpid())
+    for consumer in consumers:
+        consumer.join()
+    lease_keeper.stop()
+    # No claim is in flight any more; this flushes buffered writes and closes pooled sessions
+    shutdown()
+
+
+# --- Supervisor ---
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=JOB_WORKER_PROCESSES)
+    parser.add_argument('--threads', type=int, default=JOB_WORKER_THREADS, help="consumer threads per process")
+    parser.add_argument('--poll-seconds', type=float, default=JOB_POLL_SECONDS)
+    args = parser.parse_args()
+    configure_logging()
+
+    # Workers import spaCy, Gemini and PyMongo themselves; nothing is shared across a fork
+    context = multiprocessing.get_context('spawn')
+    stopping = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: stopping.set())
+
+    def start_worker(slot: int):
+        process = context.Process(target=worker_main, args=(args.threads, args.poll_seconds),
+                                  name=f"job-worker-{slot}")
+        process.start()
+        started_at[slot] = time.monotonic()
+        return process
+
+    slots = max(1, args.processes)
+    started_at = [0.0] * slots
+    fast_exits = [0] * slots
+    restart_at = [0.0] * slots
+    workers = [start_worker(slot) for slot in range(slots)]
+    next_purge = time.monotonic()
+    exit_code = 0
+    while not stopping.wait(1.0):
+        now = time.monotonic()
+        for slot, process in enumerate(workers):
+            if process is None:
+                if now >= restart_at[slot]:
+                    workers[slot] = start_worker(slot)
+                continue
+            if process.is_alive():
+                continue
+            if now - started_at[slot] < JOB_WORKER_FAST_EXIT_SECONDS:
+                fast_exits[slot] += 1
+            else:
+                fast_exits[slot] = 0
+            if fast_exits[slot] >= JOB_WORKER_MAX_FAST_EXITS:
+                logger.error("Job worker %s exited with code %s; %d fast exits in a row, giving up",
+                             process.pid, process.exitcode, fast_exits[slot])
+                exit_code = 1
+                stopping.set()
+                break
+            delay = 0.0
+            if fast_exits[slot]:
+                delay = min(JOB_WORKER_RESTART_BACKOFF_MAX_SECONDS,
+                            JOB_WORKER_RESTART_BACKOFF_SECONDS * (2 ** (fast_exits[slot] - 1)))
+            logger.warning("Job worker %s exited with code %s; restarting in %.0fs", process.pid, process.exitcode, delay)
+            workers[slot] = None
+            restart_at[slot] = now + delay
+        if stopping.is_set():
+            break
+        if time.monotonic() >= next_purge:
+            try:
+                purged = job_queue.purge_finished()
+                if purged:
+                    logger.info("Purged %d finished job(s)", purged)
+            except Exception as e:
+                logger.warning("Job purge failed: %s", e)
+            next_purge = time.monotonic() + JOB_PURGE_INTERVAL_SECONDS
+
+    workers = [process for process in workers if process is not None]
+    logger.info("Stopping %d job worker(s)", len(workers))
+    from lifecycle import SHUTDOWN_TIMEOUT_SECONDS
+    for process in workers:
+        if process.is_alive():
+            process.terminate()
+    for process in workers:
+        process.join(timeout=SHUTDOWN_TIMEOUT_SECONDS + JOB_DEADLINE_SECONDS)
+        if process.is_alive():
+            logger.warning("Job worker %s did not stop in time; killing it (its job will be retried)", process.pid)
+            process.kill()
+    if exit_code:
+        raise SystemExit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
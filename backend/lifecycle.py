@@ -0,0 +1,108 @@
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Serving Lifecycle Configuration (read from .env) ---
+# After SIGTERM, keep serving (with /readyz failing) this long so load balancers stop routing here first
+SHUTDOWN_DRAIN_SECONDS = float(os.environ.get('SHUTDOWN_DRAIN_SECONDS', '0'))
+# Upper bound for in-flight claims to finish, then for pending MongoDB writes to flush
+SHUTDOWN_TIMEOUT_SECONDS = float(os.environ.get('SHUTDOWN_TIMEOUT_SECONDS', '25'))
+
+
+class ServingState:
+    """
+    Tracks in-flight claim requests and whether this process is draining.
+    Once draining, /readyz answers 503 while requests already accepted run to completion.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._draining = False
+        self._drain_started: Optional[float] = None
+
+    def request_started(self) -> None:
+        with self._cond:
+            self._in_flight += 1
+
+    def request_finished(self) -> None:
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            if self._in_flight == 0:
+                self._cond.notify_all()
+
+    def begin_drain(self) -> None:
+        with self._cond:
+            if not self._draining:
+                self._draining = True
+                self._drain_started = time.monotonic()
+                logger.info("Draining: readiness now fails; %d claim request(s) in flight", self._in_flight)
+
+    def is_draining(self) -> bool:
+        return self._draining
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until no claim request is in flight (or timeout elapses)."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._in_flight == 0, timeout=timeout)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'draining': self._draining,
+                'in_flight': self._in_flight,
+                'drain_seconds': round(time.monotonic() - self._drain_started, 1) if self._drain_started else None,
+            }
+
+    def _reset_after_fork(self) -> None:
+        # A pre-fork master never serves claims; each worker starts with its own counters
+        self.__init__()
+
+
+# Shared process-wide state used by app.py and the gunicorn hooks
+serving_state = ServingState()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=serving_state._reset_after_fork)
+
+
+def shutdown(timeout: float = SHUTDOWN_TIMEOUT_SECONDS) -> bool:
+    """
+    Graceful stop for one worker: waits for in-flight claims, then flushes the buffered claim
+    writer and closes pooled HTTP sessions. Returns False if anything was cut short.
+    """
+    from claim_writer import claim_writer
+    from http_pool import http_pool
+
+    serving_state.begin_drain()
+    deadline = time.monotonic() + timeout
+    idle = serving_state.wait_idle(timeout)
+    if not idle:
+        logger.warning("Shutdown timed out with %d claim request(s) still in flight",
+                       serving_state.snapshot()['in_flight'])
+    flushed = claim_writer.close(timeout=max(1.0, deadline - time.monotonic()))
+    http_pool.close_all()
+    logger.info("Shutdown complete (in-flight drained: %s, writes flushed: %s)", idle, flushed)
+    return idle and flushed
+
+
+def install_drain_handler(stop: Any, drain_seconds: float = SHUTDOWN_DRAIN_SECONDS) -> None:
+    """
+    Wraps SIGTERM so it first marks the process as draining, then (after drain_seconds) calls
+    stop(signum, frame), the server's own graceful-stop handler.
+    """
+    def handle_sigterm(signum, frame):
+        serving_state.begin_drain()
+        if drain_seconds <= 0:
+            stop(signum, frame)
+            return
+        timer = threading.Timer(drain_seconds, stop, args=(signum, None))
+        timer.daemon = True
+        timer.start()
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
@@ -0,0 +1,382 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from google import genai
+from google.genai import types
+
+from deadline import DeadlineExceeded
+from model_registry import registry
+from telemetry import record_retry, span
+
+logger = logging.getLogger(__name__)
+
+# --- Gateway Configuration (read from .env) ---
+# RPM/TPM are the project's Gemini quota for the whole host: every gunicorn worker and
+# job_worker.py process draws from the same buckets, kept in LLM_RATE_LIMIT_PATH
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get('LLM_REQUESTS_PER_MINUTE', '300'))
+LLM_TOKENS_PER_MINUTE = float(os.environ.get('LLM_TOKENS_PER_MINUTE', '1000000'))
+# false = each process enforces the full RPM/TPM on its own (only right for a single process)
+LLM_RATE_LIMIT_SHARED = os.environ.get('LLM_RATE_LIMIT_SHARED', 'true').lower() in ('1', 'true', 'yes')
+LLM_RATE_LIMIT_PATH = os.environ.get('LLM_RATE_LIMIT_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.llm_rate_limit', 'buckets.sqlite'))
+# Per process: in-flight calls on the host can reach WEB_CONCURRENCY x this plus
+# JOB_WORKER_PROCESSES x this, so size it as the host-wide limit divided by the process count
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '16'))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '4'))
+LLM_BACKOFF_BASE_SECONDS = float(os.environ.get('LLM_BACKOFF_BASE_SECONDS', '0.5'))
+LLM_BACKOFF_MAX_SECONDS = float(os.environ.get('LLM_BACKOFF_MAX_SECONDS', '16'))
+# Default bound for one generate_content() call, including queueing and retries (0 = none)
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '30'))
+
+# Rough size of a structured JSON answer, added to the prompt estimate before a call
+LLM_EXPECTED_OUTPUT_TOKENS = 256
+
+# --- Request priorities (lower value is served first) ---
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# The pooled client lives in the model registry: built lazily (or during warm-up) and, since it
+# holds open connections, rebuilt in forked workers rather than inherited from the master.
+GEMINI_CLIENT_NAME = "gemini_client"
+registry.register(GEMINI_CLIENT_NAME, genai.Client, required=False, fork_safe=False)
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to `capacity` units and refills `capacity` per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = max(1.0, per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (0.0 if they are available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class LocalRateLimiter:
+    """Request and token buckets held in this process."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self._request_bucket = TokenBucket(requests_per_minute)
+        self._token_bucket = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        """Takes one request and `tokens` tokens and returns 0.0, or returns the seconds to wait first."""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(self._request_bucket.wait_time(1, now), self._token_bucket.wait_time(tokens, now))
+            if delay <= 0:
+                self._request_bucket.consume(1)
+                self._token_bucket.consume(tokens)
+            return delay
+
+    def adjust_tokens(self, amount: int) -> None:
+        """Charges (positive) or refunds (negative) tokens once the real usage is known."""
+        with self._lock:
+            if amount > 0:
+                self._token_bucket.consume(amount)
+            else:
+                self._token_bucket.refund(-amount)
+
+    def _reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+
+class SharedRateLimiter(LocalRateLimiter):
+    """
+    The same buckets stored in a SQLite file, so every process on the host shares one RPM/TPM
+    budget. Each reservation is one BEGIN IMMEDIATE transaction on the calling thread's own
+    connection, so a caller waiting on the file lock holds up no other thread. If the file cannot
+    be used the process falls back to its own (inherited, in-memory) buckets rather than failing.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, path: str = LLM_RATE_LIMIT_PATH):
+        super().__init__(requests_per_minute, tokens_per_minute)
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def _update(self, change) -> Any:
+        """Runs change(request_bucket, token_bucket, now) on the stored bucket state and writes it back."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Wall-clock time: monotonic clocks are not comparable across processes
+            now = time.time()
+            buckets = {'requests': TokenBucket(self._request_bucket.capacity),
+                       'tokens': TokenBucket(self._token_bucket.capacity)}
+            stored = {name: (tokens, updated) for name, tokens, updated in
+                      conn.execute("SELECT name, tokens, updated FROM buckets")}
+            for name, bucket in buckets.items():
+                bucket.tokens, bucket.updated = stored.get(name, (bucket.capacity, now))
+                bucket.updated = min(bucket.updated, now)
+            result = change(buckets['requests'], buckets['tokens'], now)
+            conn.executemany("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                             [(name, bucket.tokens, bucket.updated) for name, bucket in buckets.items()])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def reserve(self, tokens: int) -> float:
+        def change(request_bucket, token_bucket, now):
+            delay = max(request_bucket.wait_time(1, now), token_bucket.wait_time(tokens, now))
+            if delay <= 0:
+                request_bucket.consume(1)
+                token_bucket.consume(tokens)
+            return delay
+
+        try:
+            return self._update(change)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("Shared LLM rate limit unavailable (%s); using this process's budget", e)
+            return super().reserve(tokens)
+
+    def adjust_tokens(self, amount: int) -> None:
+        def change(request_bucket, token_bucket, now):
+            token_bucket._refill(now)
+            if amount > 0:
+                token_bucket.consume(amount)
+            else:
+                token_bucket.refund(-amount)
+
+        try:
+            self._update(change)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("Could not reconcile the shared LLM token budget: %s", e)
+
+    def _reset_after_fork(self) -> None:
+        super()._reset_after_fork()
+        # SQLite connections must not be used across fork
+        self._local = threading.local()
+
+
+def estimate_tokens(contents: Any) -> int:
+    """Cheap prompt-size estimate (~4 characters per token) used for TPM budgeting."""
+    if isinstance(contents, (list, tuple)):
+        text_length = sum(len(str(part)) for part in contents)
+    else:
+        text_length = len(str(contents))
+    return text_length // 4 + LLM_EXPECTED_OUTPUT_TOKENS
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """True for quota (429) and server-side (5xx) API errors and transient transport failures."""
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # httpx transport errors (used under the hood by google-genai) without importing httpx here
+    return type(error).__name__ in ('ConnectError', 'ReadTimeout', 'WriteTimeout', 'PoolTimeout',
+                                    'RemoteProtocolError', 'ReadError')
+
+
+def _with_http_timeout(config: Any, seconds: float) -> Any:
+    """Copy of a GenerateContentConfig whose HTTP request gives up after `seconds`."""
+    if config is None:
+        config = types.GenerateContentConfig()
+    try:
+        return config.model_copy(update={'http_options': types.HttpOptions(timeout=max(1, int(seconds * 1000)))})
+    except Exception:
+        # Older SDKs without per-request http_options: the gateway-side deadline still applies
+        return config
+
+
+class LLMGateway:
+    """
+    Single entry point for Gemini calls.
+
+    Owns one pooled genai.Client (built lazily, shared by every thread), keeps calls under a
+    requests-per-minute and tokens-per-minute budget with token buckets (shared by every process
+    on the host unless LLM_RATE_LIMIT_SHARED=false), serves interactive
+    traffic ahead of batch/backfill traffic, and retries 429/5xx responses with jittered backoff.
+    """
+
+    def __init__(self, requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_retries: int = LLM_MAX_RETRIES,
+                 backoff_base: float = LLM_BACKOFF_BASE_SECONDS,
+                 backoff_max: float = LLM_BACKOFF_MAX_SECONDS,
+                 shared_rate_limit: bool = LLM_RATE_LIMIT_SHARED):
+        if shared_rate_limit:
+            self._limiter = SharedRateLimiter(requests_per_minute, tokens_per_minute)
+        else:
+            self._limiter = LocalRateLimiter(requests_per_minute, tokens_per_minute)
+        self._concurrency = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._condition = threading.Condition()
+        self._waiters: list = []
+        self._sequence = itertools.count()
+
+    # --- Pooled client ---
+    @property
+    def client(self) -> genai.Client:
+        client = registry.get(GEMINI_CLIENT_NAME)
+        if client is None:
+            error = registry.status()[GEMINI_CLIENT_NAME]['error']
+            raise RuntimeError(f"Gemini client is unavailable: {error}")
+        return client
+
+    def is_available(self) -> bool:
+        """True if the shared client could be constructed (e.g. GEMINI_API_KEY is set)."""
+        return registry.get(GEMINI_CLIENT_NAME) is not None
+
+    # --- Scheduler ---
+    def _acquire(self, priority: int, tokens: int, deadline: Optional[float] = None) -> None:
+        """
+        Blocks until this caller is at the head of the priority queue and both budgets allow it.
+        Raises DeadlineExceeded if that has not happened by `deadline` (a time.monotonic() value).
+        """
+        ticket = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiters, ticket)
+        try:
+            while True:
+                with self._condition:
+                    while self._waiters[0] != ticket:
+                        self._condition.wait(timeout=self._time_left(deadline))
+                # Outside the condition: the shared limiter may wait on another process's file lock
+                delay = self._limiter.reserve(tokens)
+                if delay <= 0:
+                    return
+                with self._condition:
+                    remaining = self._time_left(deadline)
+                    # Woken early when the queue changes; the loop re-checks who is at the head
+                    self._condition.wait(timeout=delay if remaining is None else min(delay, remaining))
+        finally:
+            with self._condition:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    @staticmethod
+    def _time_left(deadline: Optional[float]) -> Optional[float]:
+        """Seconds until deadline (None without one); raises DeadlineExceeded once it has passed."""
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Timed out waiting for LLM rate-limit capacity")
+        return remaining
+
+    def _reconcile_tokens(self, estimated: int, response: Any) -> None:
+        """Corrects the TPM bucket with the real usage reported by the API, when present."""
+        usage = getattr(response, 'usage_metadata', None)
+        actual = getattr(usage, 'total_token_count', None) if usage is not None else None
+        if not isinstance(actual, int):
+            return
+        self._limiter.adjust_tokens(actual - estimated)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # "Full jitter": uniform in [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    # --- Public API ---
+    def generate_content(self, *, model: str, contents: Any, config: Any = None,
+                         priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = LLM_TIMEOUT_SECONDS or None) -> Any:
+        """
+        Rate-limited, retried equivalent of client.models.generate_content().
+        timeout (seconds, None for no bound) covers the whole call: queueing, every attempt and
+        backoff. DeadlineExceeded is raised when it runs out.
+        """
+        estimated = estimate_tokens(contents)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        attempt = 0
+        while True:
+            with span("llm_rate_limit_wait"):
+                self._acquire(priority, estimated, deadline)
+            try:
+                call_config = config
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._concurrency.acquire(timeout=remaining):
+                        raise DeadlineExceeded("Timed out waiting for an LLM concurrency slot")
+                    call_config = _with_http_timeout(config, deadline - time.monotonic())
+                else:
+                    self._concurrency.acquire()
+                try:
+                    response = self.client.models.generate_content(model=model, contents=contents, config=call_config)
+                finally:
+                    self._concurrency.release()
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise DeadlineExceeded(f"LLM call timed out: {e}") from e
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    raise
+                delay = self._backoff_delay(attempt)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise DeadlineExceeded(f"No time left to retry the LLM call: {e}") from e
+                attempt += 1
+                record_retry("llm")
+                logger.warning("Gemini call failed (%s); retry %d/%d in %.2fs", e, attempt, self.max_retries, delay)
+                time.sleep(delay)
+                continue
+            self._reconcile_tokens(estimated, response)
+            return response
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """Returns the process-wide gateway shared by the style and verdict stages."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+
+def _reset_gateway_after_fork() -> None:
+    limiter = getattr(_gateway, '_limiter', None)
+    if isinstance(limiter, LocalRateLimiter):
+        limiter._reset_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_gateway_after_fork)
@@ -0,0 +1,47 @@
+"""
+Compacts verified_claims_history into the dedup storage form (one document per claim fingerprint
+with hit_count, first_seen/last_seen and a capped verdict_history), then creates the unique
+fingerprint index that dedup mode relies on.
+
+Usage:
+    python migrate_claims.py --dry-run
+    python migrate_claims.py --history-max 10
+"""
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config import app, mongo
+from telemetry import configure_logging
+from db_utils import CLAIM_VERDICT_HISTORY_MAX, compact_claims_history, ensure_fingerprint_unique_index, ensure_indexes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true', help="report what would change without writing")
+    parser.add_argument('--history-max', type=int, default=CLAIM_VERDICT_HISTORY_MAX,
+                        help="verdicts kept in each claim's verdict_history (0 disables it)")
+    args = parser.parse_args()
+    configure_logging()
+
+    app.config["MONGO_URI"] = os.environ.get("MONGO_URI")
+    if not app.config["MONGO_URI"]:
+        raise SystemExit("FATAL: MONGO_URI environment variable is not set in the .env file.")
+    mongo.init_app(app)
+
+    stats = compact_claims_history(history_max=args.history_max, dry_run=args.dry_run)
+    print(f"Fingerprints backfilled: {stats['fingerprinted']}")
+    print(f"Claim groups compacted:  {stats['groups']} ({stats['merged_rows']} rows)")
+    print(f"Rows {'to delete' if args.dry_run else 'deleted'}: {stats['deleted_rows']}")
+
+    if not args.dry_run:
+        ensure_indexes()
+        if ensure_fingerprint_unique_index():
+            print("Unique claim_fingerprint index is in place; set CLAIM_STORAGE_MODE=dedup.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import gc
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Warm-up Configuration (read from .env) ---
+# lazy:       load each model on first use
+# background: start loading in a daemon thread at startup; serve health checks meanwhile
+# preload:    load synchronously at import (use with gunicorn --preload so workers share pages)
+MODEL_WARMUP_MODE = os.environ.get('MODEL_WARMUP_MODE', 'background').lower()
+
+STATE_NOT_LOADED = 'not_loaded'
+STATE_LOADING = 'loading'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+
+
+class _ModelEntry:
+    def __init__(self, name: str, loader: Callable[[], Any], required: bool, fork_safe: bool):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.fork_safe = fork_safe
+        self.model: Any = None
+        self.state = STATE_NOT_LOADED
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Explicit registry of heavyweight components (spaCy pipeline, Gemini client).
+
+    Nothing is loaded at import time. Models load lazily on first get(), in a background
+    warm-up thread, or all at once via preload() in a pre-fork master process. The registry
+    resets its locks in forked children so a warm-up running at fork time cannot deadlock them.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _ModelEntry] = {}
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, loader: Callable[[], Any], required: bool = True, fork_safe: bool = True) -> None:
+        """
+        Registers a loader. Required models must be ready before the app reports readiness.
+        Objects that must not cross a fork (e.g. clients holding sockets) use fork_safe=False
+        and are rebuilt in each child instead of inherited.
+        """
+        if name not in self._entries:
+            self._entries[name] = _ModelEntry(name, loader, required, fork_safe)
+
+    def override(self, name: str, model: Any) -> None:
+        """Installs an already built object as the ready model (offline benchmarks swap in stand-ins)."""
+        entry = self._entries[name]
+        with entry.lock:
+            entry.model = model
+            entry.state = STATE_READY
+            entry.error = None
+            entry.load_seconds = 0.0
+
+    def get(self, name: str) -> Any:
+        """Returns the loaded model, loading it on first use. Returns None if loading failed."""
+        entry = self._entries[name]
+        if entry.state == STATE_READY:
+            return entry.model
+        with entry.lock:
+            if entry.state in (STATE_NOT_LOADED, STATE_LOADING):
+                entry.state = STATE_LOADING
+                start = time.perf_counter()
+                try:
+                    entry.model = entry.loader()
+                    entry.state = STATE_READY
+                    entry.error = None
+                except Exception as e:
+                    logger.exception("Model '%s' failed to load", name)
+                    entry.model = None
+                    entry.state = STATE_FAILED
+                    entry.error = str(e)
+                entry.load_seconds = time.perf_counter() - start
+        return entry.model
+
+    def warm_up(self, names: Optional[Iterable[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+        """Loads the given (default: all) models, in a daemon thread when background=True."""
+        names = list(names) if names is not None else list(self._entries)
+
+        def _load_all():
+            for name in names:
+                self.get(name)
+
+        if not background:
+            _load_all()
+            return None
+        if self._warmup_thread is None or not self._warmup_thread.is_alive():
+            self._warmup_thread = threading.Thread(target=_load_all, name="model-warmup", daemon=True)
+            self._warmup_thread.start()
+        return self._warmup_thread
+
+    def preload(self) -> None:
+        """
+        Loads every fork-safe model synchronously, then freezes the GC generations so objects
+        created so far are not touched by collections in forked workers (keeps copy-on-write
+        pages shared). Fork-unsafe entries are left for each worker to build.
+        """
+        self.warm_up([entry.name for entry in self._entries.values() if entry.fork_safe], background=False)
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+
+    def is_ready(self) -> bool:
+        return all(entry.state == STATE_READY for entry in self._entries.values() if entry.required)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            entry.name: {
+                'state': entry.state,
+                'required': entry.required,
+                'load_seconds': round(entry.load_seconds, 3) if entry.load_seconds is not None else None,
+                'error': entry.error,
+            }
+            for entry in self._entries.values()
+        }
+
+    def _reset_after_fork(self) -> None:
+        # Locks held by a warm-up thread in the parent would stay locked forever in the child
+        for entry in self._entries.values():
+            entry.lock = threading.Lock()
+            if entry.state == STATE_LOADING or not entry.fork_safe:
+                entry.state = STATE_NOT_LOADED
+                entry.model = None
+        self._warmup_thread = None
+
+
+# Shared process-wide registry
+registry = ModelRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry._reset_after_fork)
+
+
+def start_model_warmup(mode: str = MODEL_WARMUP_MODE) -> None:
+    """Applies MODEL_WARMUP_MODE at application startup."""
+    if mode == 'preload':
+        registry.preload()
+    elif mode == 'background':
+        registry.warm_up(background=True)
+    elif mode != 'lazy':
+        logger.warning("Unknown MODEL_WARMUP_MODE '%s'; models will load lazily.", mode)
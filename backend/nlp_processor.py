@@ -1,73 +1,175 @@
-import spacy
-from typing import List, Optional
+from typing import List, Optional, TYPE_CHECKING
+import logging
+import threading
 import time
-from google import genai 
+from collections import OrderedDict
 from google.genai import types
+from llm_gateway import LLMGateway, PRIORITY_INTERACTIVE, LLM_TIMEOUT_SECONDS
+from deadline import DeadlineExceeded, mark_timed_out, stage_timeout
 import json 
 import os 
+from model_registry import registry
+from telemetry import timed_stage
+
+if TYPE_CHECKING:
+    import spacy
+
+logger = logging.getLogger(__name__)
 
 # --- CRITICAL FIX: The circular import is REMOVED ---
 # DELETE THIS LINE: from verifier import client 
 
 # Global variable for the spaCy model
-NLP_MODEL: Optional[spacy.language.Language] = None
+NLP_MODEL: Optional["spacy.language.Language"] = None
 LOADED_TIME: Optional[float] = None
 
+# Stage 1 only reads entities and coarse POS tags (tok2vec -> tagger/attribute_ruler, ner),
+# so the dependency parser and lemmatizer are never loaded.
+NLP_EXCLUDED_COMPONENTS = ["parser", "lemmatizer"]
+
+# Scraped articles can be tens of kilobytes: cap what spaCy sees and feed it in chunks
+NER_MAX_CHARS = int(os.environ.get('NER_MAX_CHARS', '100000'))
+NER_CHUNK_CHARS = int(os.environ.get('NER_CHUNK_CHARS', '10000'))
+NER_BATCH_SIZE = int(os.environ.get('NER_BATCH_SIZE', '64'))
+# Terms computed ahead of time for claims about to run (batch endpoint), kept until they are used
+NER_PREFETCH_MAX_ENTRIES = int(os.environ.get('NER_PREFETCH_MAX_ENTRIES', '4096'))
+
+KEY_ENTITY_LABELS = ('PERSON', 'ORG', 'PRODUCT', 'GPE', 'NORP')
+KEY_POS_TAGS = ('NOUN', 'PROPN', 'ADJ')
+IRRELEVANT_WORDS = {
+    "user", "text", "article", "post", "claim", "cure", 
+    "remedy", "fast", "proven", "Type", "a", "the"
+}
+MAX_SEARCH_TERMS = 5
+
+NLP_MODEL_NAME = "spacy_en_core_web_sm"
+
+def _load_spacy_pipeline():
+    """Registry loader: spaCy itself is imported here so importing this module stays cheap."""
+    import spacy
+    model = spacy.load("en_core_web_sm", exclude=NLP_EXCLUDED_COMPONENTS)
+    logger.info("NLP Model loaded successfully.")
+    return model
+
+registry.register(NLP_MODEL_NAME, _load_spacy_pipeline)
+
 def load_nlp_model():
-    """Loads the spaCy English model once for efficiency."""
+    """Loads the spaCy English model once (through the model registry) for efficiency."""
     global NLP_MODEL, LOADED_TIME
     if NLP_MODEL is None:
-        try:
-            NLP_MODEL = spacy.load("en_core_web_sm")
+        NLP_MODEL = registry.get(NLP_MODEL_NAME)
+        if NLP_MODEL is not None:
             LOADED_TIME = time.time()
-            print("NLP Model loaded successfully.")
-        except Exception as e:
-            print(f"ERROR: Could not load spaCy model. Details: {e}")
-            NLP_MODEL = None
-            
-def extract_key_medical_terms(text: str) -> List[str]:
-    """
-    Uses spaCy to extract Named Entities and key nouns/adjectives 
-    most relevant for a medical search query (Stage 1).
-    """
-    load_nlp_model()
-    
-    if NLP_MODEL is None:
-        return ["NLP_ERROR_FALLBACK"]
+        else:
+            logger.error("Could not load spaCy model. Details: %s", registry.status()[NLP_MODEL_NAME]['error'])
 
-    doc = NLP_MODEL(text)
-    
+def _chunk_text(text: str, max_chars: int = NER_MAX_CHARS, chunk_chars: int = NER_CHUNK_CHARS) -> List[str]:
+    """Truncates text to max_chars and splits it into pieces of at most chunk_chars, breaking on whitespace."""
+    text = text[:max_chars]
+    chunks = []
+    while len(text) > chunk_chars:
+        cut = text.rfind(' ', 0, chunk_chars)
+        if cut <= 0:
+            cut = chunk_chars
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip()
+    if text or not chunks:
+        chunks.append(text)
+    return chunks
+
+def _key_terms_from_docs(docs) -> List[str]:
+    """Collects entities, then high-value nouns/adjectives, across a text's chunk docs."""
     # Iterate over entities for labels
     key_entities = [
-        ent.text for ent in doc.ents 
-        if ent.label_ in ('PERSON', 'ORG', 'PRODUCT', 'GPE', 'NORP')
+        ent.text for doc in docs for ent in doc.ents 
+        if ent.label_ in KEY_ENTITY_LABELS
     ]
     
     # Simple tokenization to extract high-value nouns and adjectives
     key_tokens = [
-        token.text for token in doc 
-        if token.pos_ in ('NOUN', 'PROPN', 'ADJ') and len(token.text) > 2
+        token.text for doc in docs for token in doc 
+        if token.pos_ in KEY_POS_TAGS and len(token.text) > 2
     ]
     
-    # Combine, clean, and limit the search terms
-    combined_terms = set(key_entities + key_tokens)
-    
-    irrelevant_words = {
-        "user", "text", "article", "post", "claim", "cure", 
-        "remedy", "fast", "proven", "Type", "a", "the"
-    }
-    
+    # Combine (de-duplicated, first occurrence wins), clean, and limit the search terms
     final_terms = [
-        term for term in combined_terms 
-        if term.lower() not in irrelevant_words
+        term for term in dict.fromkeys(key_entities + key_tokens) 
+        if term.lower() not in IRRELEVANT_WORDS
     ]
     
     # Limit the output to 5 high-quality search terms
-    return list(final_terms)[:5]
+    return final_terms[:MAX_SEARCH_TERMS]
+
+def extract_key_medical_terms_batch(texts: List[str], n_process: int = 1,
+                                    batch_size: int = NER_BATCH_SIZE) -> List[List[str]]:
+    """
+    Batch version of Stage 1: runs many texts through nlp.pipe (optionally across n_process
+    worker processes) and returns one list of search terms per input text, in order.
+    """
+    load_nlp_model()
+    
+    if NLP_MODEL is None:
+        return [["NLP_ERROR_FALLBACK"] for _ in texts]
+
+    # Flatten every text into chunks, remembering which input each chunk belongs to
+    owners: List[int] = []
+    chunks: List[str] = []
+    for index, text in enumerate(texts):
+        for chunk in _chunk_text(text or ""):
+            owners.append(index)
+            chunks.append(chunk)
+
+    docs_per_text: List[list] = [[] for _ in texts]
+    for owner, doc in zip(owners, NLP_MODEL.pipe(chunks, n_process=n_process, batch_size=batch_size)):
+        docs_per_text[owner].append(doc)
+
+    return [_key_terms_from_docs(docs) for docs in docs_per_text]
+
+_prefetched_terms: "OrderedDict[str, List[str]]" = OrderedDict()
+_prefetch_lock = threading.Lock()
+
+def prefetch_key_medical_terms(texts: List[str]) -> None:
+    """
+    Runs Stage 1 for texts that are about to be verified in one nlp.pipe pass; the next
+    extract_key_medical_terms() call for each text takes its terms from here instead of running NER.
+    """
+    with _prefetch_lock:
+        missing = [text for text in dict.fromkeys(texts) if text and text not in _prefetched_terms]
+    if not missing:
+        return
+    results = extract_key_medical_terms_batch(missing)
+    with _prefetch_lock:
+        for text, terms in zip(missing, results):
+            if terms != ["NLP_ERROR_FALLBACK"]:
+                _prefetched_terms[text] = terms
+        while len(_prefetched_terms) > NER_PREFETCH_MAX_ENTRIES:
+            _prefetched_terms.popitem(last=False)
+
+@timed_stage("ner")
+def extract_key_medical_terms(text: str) -> List[str]:
+    """
+    Uses spaCy to extract Named Entities and key nouns/adjectives 
+    most relevant for a medical search query (Stage 1).
+    """
+    with _prefetch_lock:
+        prefetched = _prefetched_terms.pop(text, None)
+    if prefetched is not None:
+        return list(prefetched)
+    return extract_key_medical_terms_batch([text])[0]
+
+# --- Stage 4 helper: shared by analyze_text_style() and verifier's single-shot mode ---
+def sensationalism_to_penalty(sensationalism) -> float:
+    """Maps a 0-10 sensationalism score to a trust penalty: max score of 10 maps to max penalty of 0.4."""
+    try:
+        sensationalism = min(10.0, max(0.0, float(sensationalism)))
+    except (TypeError, ValueError):
+        return 0.0
+    return (sensationalism / 10) * 0.4
 
 # --- NEW FUNCTION: Stage 4 Linguistic Trust Inference ---
-# CRITICAL FIX: Added 'client' as a required parameter
-def analyze_text_style(text: str, client: genai.Client) -> float: 
+# The shared LLM gateway is passed in (no import from verifier, avoiding the circular import)
+@timed_stage("style_llm")
+def analyze_text_style(text: str, gateway: LLMGateway, priority: int = PRIORITY_INTERACTIVE) -> float: 
     """
     Uses Gemini to classify the input text for sensationalism and returns a trust penalty (0.0 to 0.4).
     """
@@ -92,33 +194,38 @@ def analyze_text_style(text: str, client: genai.Client) -> float:
     )
     
     try:
-        # Use the client object passed into the function
-        response = client.models.generate_content(
+        # Rate-limited, retried call through the shared gateway
+        response = gateway.generate_content(
             model='gemini-2.5-flash', # Use a fast model
             contents=[prompt + f"Text: {text}"],
             config=types.GenerateContentConfig(
                 response_mime_type="application/json",
                 response_schema=response_schema
-            )
+            ),
+            priority=priority,
+            timeout=stage_timeout("style_llm", LLM_TIMEOUT_SECONDS or None)
         )
         
         style_data = json.loads(response.text)
         
         # Robust check to prevent NoneType crash if parsing fails
         if not isinstance(style_data, dict):
-            print(f"Error: API returned non-dict data: {response.text}")
+            logger.error("Style analysis API returned non-dict data: %s", response.text)
             return 0.0
             
         sensationalism = style_data.get('sensationalism_score', 0)
         
         # Calculate Penalty: Max score of 10 maps to Max Penalty of 0.4
-        penalty = (sensationalism / 10) * 0.4
-        return penalty
+        return sensationalism_to_penalty(sensationalism)
         
+    except DeadlineExceeded as e:
+        logger.warning("Style analysis ran out of time: %s", e)
+        mark_timed_out("style_llm")
+        return 0.0
     except Exception as e:
-        print(f"Style analysis failed: {e}")
+        logger.warning("Style analysis failed: %s", e)
         # Return 0.0 penalty if the API call fails 
         return 0.0
 
-# Call load_nlp_model() immediately when the module is imported
-load_nlp_model()
+# NOTE: The model is no longer loaded at import time. app.py starts the warm-up
+# (see model_registry.MODEL_WARMUP_MODE); otherwise it loads on first use.
@@ -0,0 +1,76 @@
+import asyncio
+import inspect
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """A single pipeline step: a callable plus the names of the stages whose results it consumes."""
+
+    def __init__(self, name: str, func: Callable[..., Any], deps: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+class PipelineGraph:
+    """
+    Dependency graph of pipeline stages executed on asyncio.
+
+    Each stage is called with its dependencies' results as keyword arguments (named after the
+    dependency). Coroutine functions are awaited directly; blocking functions (spaCy, requests,
+    the Gemini SDK) run in the default thread pool, so independent stages overlap.
+    Stages may only depend on stages added before them, which keeps the graph acyclic.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, func: Callable[..., Any], deps: Iterable[str] = ()) -> "PipelineGraph":
+        if name in self._stages:
+            raise ValueError(f"Duplicate pipeline stage: {name}")
+        deps = tuple(deps)
+        missing = [dep for dep in deps if dep not in self._stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stage(s): {', '.join(missing)}")
+        self._stages[name] = Stage(name, func, deps)
+        return self
+
+    @property
+    def stage_names(self) -> List[str]:
+        return list(self._stages)
+
+    async def run(self, on_stage: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """
+        Runs every stage as soon as its dependencies finish and returns {stage_name: result}.
+        on_stage(name, result), if given, is called on the event loop as each stage completes;
+        an exception from it is logged and does not affect the pipeline.
+        """
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage) -> Any:
+            kwargs = {dep: await tasks[dep] for dep in stage.deps}
+            if inspect.iscoroutinefunction(stage.func):
+                result = await stage.func(**kwargs)
+            else:
+                result = await asyncio.to_thread(stage.func, **kwargs)
+            if on_stage is not None:
+                try:
+                    on_stage(stage.name, result)
+                except Exception:
+                    logger.exception("on_stage callback failed for stage %s", stage.name)
+            return result
+
+        for stage in self._stages.values():
+            tasks[stage.name] = asyncio.create_task(run_stage(stage), name=f"stage:{stage.name}")
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+        return {name: task.result() for name, task in tasks.items()}
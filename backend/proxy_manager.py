@@ -1,57 +1,218 @@
 # proxy_manager.py (FINAL ROBUST VERSION)
-import requests
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
 from bs4 import BeautifulSoup
 
-def get_random_http_proxy() -> str:
-    """Fetches a free HTTP proxy list and returns the first IP:PORT found."""
-    
-    # --- UPDATED SOURCE URL (Commonly reliable list) ---
-    PROXY_LIST_URL = 'https://ProxySite.com/' 
-    
-    HEADERS = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    }
-    
-    try:
-        response = requests.get(PROXY_LIST_URL, headers=HEADERS, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # --- CRITICAL FIX: Robust Table Selection (Targeting the site's known ID) ---
-        table = soup.find('table', id='proxylisttable') # Target the specific ID for this site
-
-        if not table:
-            # Fallback 1: Find by partial class match
-            table = soup.find('table', class_=lambda c: c and 'list' in c.lower())
-        
-        if not table:
-            # Fallback 2: Select the very first <table> tag
-            table = soup.find('table') 
-
-        if not table:
-            print("WARNING: Could not locate any <table> tag. Falling back.")
-            return ""
-            
-        # Get the first data row (skipping the header)
-        row = table.find('tbody').find('tr') 
-        
-        if not row:
-            print("WARNING: No working proxies found in the table. Falling back.")
-            return ""
-            
+from http_pool import http_pool
+from telemetry import register_gauges
+
+logger = logging.getLogger(__name__)
+
+# --- UPDATED SOURCE URL (Commonly reliable list) ---
+PROXY_LIST_URL = 'https://ProxySite.com/'
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+}
+
+# --- Pool Configuration (read from .env) ---
+PROXY_REFRESH_SECONDS = float(os.environ.get('PROXY_REFRESH_SECONDS', '300'))
+PROXY_MAX_POOL_SIZE = int(os.environ.get('PROXY_MAX_POOL_SIZE', '50'))
+PROXY_MAX_CONSECUTIVE_FAILURES = int(os.environ.get('PROXY_MAX_CONSECUTIVE_FAILURES', '2'))
+PROXY_BAN_SECONDS = float(os.environ.get('PROXY_BAN_SECONDS', '900'))
+
+# Smoothing for the per-proxy latency average
+LATENCY_EWMA_ALPHA = 0.3
+
+
+def _parse_proxy_table(html: bytes) -> List[str]:
+    """Returns every 'http://IP:PORT' found in the proxy list table."""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # --- CRITICAL FIX: Robust Table Selection (Targeting the site's known ID) ---
+    table = soup.find('table', id='proxylisttable') # Target the specific ID for this site
+
+    if not table:
+        # Fallback 1: Find by partial class match
+        table = soup.find('table', class_=lambda c: c and 'list' in c.lower())
+
+    if not table:
+        # Fallback 2: Select the very first <table> tag
+        table = soup.find('table')
+
+    if not table:
+        logger.warning("Could not locate any <table> tag. Falling back.")
+        return []
+
+    body = table.find('tbody') or table
+    proxies = []
+    for row in body.find_all('tr'):
         # Get the IP (first column) and Port (second column)
         tds = row.find_all('td')
         if len(tds) < 2:
-            print("WARNING: Could not find IP and Port fields.")
-            return ""
+            continue
+        ip = tds[0].get_text(strip=True)
+        port = tds[1].get_text(strip=True)
+        if ip and port.isdigit():
+            proxies.append(f"http://{ip}:{port}")
+    return proxies
 
-        ip = tds[0].text
-        port = tds[1].text
-        
-        proxy_address = f"http://{ip}:{port}"
-        print(f"Successfully retrieved new proxy: {proxy_address}")
-        return proxy_address
 
+def fetch_proxy_list() -> List[str]:
+    """Fetches the free HTTP proxy list site once and returns all proxies found on it."""
+    try:
+        response = http_pool.get(PROXY_LIST_URL, headers=HEADERS, timeout=10)
+        response.raise_for_status()
+        proxies = _parse_proxy_table(response.content)
+        if not proxies:
+            logger.warning("No working proxies found in the table. Falling back.")
+        return proxies
     except Exception as e:
-        print(f"Failed to fetch proxy list or parse table. Error: {e}")
-        return ""
\ No newline at end of file
+        logger.warning("Failed to fetch proxy list or parse table. Error: %s", e)
+        return []
+
+
+class ProxyStats:
+    def __init__(self, address: str):
+        self.address = address
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency_ewma: Optional[float] = None
+
+    @property
+    def score(self) -> float:
+        """Higher is better: Laplace-smoothed success rate divided by average latency."""
+        success_rate = (self.successes + 1) / (self.successes + self.failures + 2)
+        latency = self.latency_ewma if self.latency_ewma is not None else 2.0
+        return success_rate / max(latency, 0.05)
+
+
+class ProxyPool:
+    """
+    Long-lived pool of HTTP proxies.
+
+    The list site is fetched in a background thread every PROXY_REFRESH_SECONDS instead of on
+    every scrape attempt. Callers report outcomes; proxies are ranked by success rate and
+    latency, and a proxy that fails PROXY_MAX_CONSECUTIVE_FAILURES times in a row is evicted
+    and banned for PROXY_BAN_SECONDS so the next refresh does not bring it straight back.
+    """
+
+    def __init__(self, refresh_seconds: float = PROXY_REFRESH_SECONDS, max_size: int = PROXY_MAX_POOL_SIZE):
+        self.refresh_seconds = refresh_seconds
+        self.max_size = max_size
+        self._proxies: Dict[str, ProxyStats] = {}
+        self._banned: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._refreshed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Background refresh ---
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._refresh_loop, name="proxy-pool-refresh", daemon=True)
+                self._thread.start()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_seconds)
+
+    def refresh(self) -> None:
+        fetched = fetch_proxy_list()
+        now = time.monotonic()
+        with self._lock:
+            self._banned = {address: until for address, until in self._banned.items() if until > now}
+            for address in fetched:
+                if address not in self._proxies and address not in self._banned:
+                    self._proxies[address] = ProxyStats(address)
+            if len(self._proxies) > self.max_size:
+                ranked = sorted(self._proxies.values(), key=lambda p: p.score, reverse=True)
+                self._proxies = {p.address: p for p in ranked[:self.max_size]}
+        self._refreshed.set()
+        logger.info("Proxy pool refreshed: %d proxies available.", len(self._proxies))
+
+    # --- Selection & feedback ---
+    def acquire(self, wait_seconds: float = 0.0, exclude=()) -> Optional[str]:
+        """
+        Returns a proxy address, favouring high-scoring proxies, or None if the pool is empty
+        (callers then connect directly). wait_seconds lets the very first caller wait for the
+        initial list fetch.
+        """
+        self._ensure_started()
+        if wait_seconds and not self._refreshed.is_set():
+            self._refreshed.wait(wait_seconds)
+        with self._lock:
+            candidates = [p for p in self._proxies.values() if p.address not in exclude]
+            if not candidates:
+                return None
+            # Weighted choice among the best few keeps load spread while preferring fast proxies
+            ranked = sorted(candidates, key=lambda p: p.score, reverse=True)[:5]
+            return random.choices([p.address for p in ranked], weights=[p.score for p in ranked])[0]
+
+    def report_success(self, address: Optional[str], latency_seconds: float) -> None:
+        if not address:
+            return
+        with self._lock:
+            stats = self._proxies.get(address)
+            if stats is None:
+                return
+            stats.successes += 1
+            stats.consecutive_failures = 0
+            if stats.latency_ewma is None:
+                stats.latency_ewma = latency_seconds
+            else:
+                stats.latency_ewma += LATENCY_EWMA_ALPHA * (latency_seconds - stats.latency_ewma)
+
+    def report_failure(self, address: Optional[str]) -> None:
+        if not address:
+            return
+        with self._lock:
+            stats = self._proxies.get(address)
+            if stats is None:
+                return
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures >= PROXY_MAX_CONSECUTIVE_FAILURES:
+                del self._proxies[address]
+                self._banned[address] = time.monotonic() + PROXY_BAN_SECONDS
+                logger.info("Evicted dead proxy: %s", address)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {'proxies': len(self._proxies), 'banned': len(self._banned)}
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            return [
+                {'address': p.address, 'successes': p.successes, 'failures': p.failures,
+                 'latency_ewma': p.latency_ewma, 'score': p.score}
+                for p in self._proxies.values()
+            ]
+
+    def _reset_after_fork(self) -> None:
+        # The refresh thread does not survive a fork; keep the list but restart the thread lazily
+        self._lock = threading.Lock()
+        self._thread = None
+
+
+# Shared process-wide pool used by verifier.fetch_url_content()
+proxy_pool = ProxyPool()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=proxy_pool._reset_after_fork)
+
+register_gauges('medverify_proxy_pool', "Proxies currently pooled / banned.", proxy_pool.metrics)
+
+
+def get_random_http_proxy() -> str:
+    """Returns a proxy from the shared pool as 'http://IP:PORT', or "" to connect directly."""
+    return proxy_pool.acquire() or ""
@@ -0,0 +1,352 @@
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Optional
+
+import requests
+
+from proxy_manager import proxy_pool
+from http_pool import http_pool
+from content_extractor import get_extractor
+from content_cache import content_cache
+from input_normalizer import canonicalize_url
+from telemetry import record_cache, record_retry, span
+
+logger = logging.getLogger(__name__)
+
+# --- Scrape Configuration (read from .env) ---
+# hedged:     race a direct connection against proxies, add backup attempts after a p95-based delay
+# sequential: the original one-attempt-at-a-time proxy rotation
+SCRAPE_MODE = os.environ.get('SCRAPE_MODE', 'hedged').lower()
+SCRAPE_DEADLINE_SECONDS = float(os.environ.get('SCRAPE_DEADLINE_SECONDS', '20'))
+SCRAPE_HEDGE_PROXIES = int(os.environ.get('SCRAPE_HEDGE_PROXIES', '1'))
+SCRAPE_HEDGE_MIN_DELAY_SECONDS = float(os.environ.get('SCRAPE_HEDGE_MIN_DELAY_SECONDS', '0.5'))
+SCRAPE_HEDGE_DEFAULT_DELAY_SECONDS = float(os.environ.get('SCRAPE_HEDGE_DEFAULT_DELAY_SECONDS', '2.0'))
+SCRAPE_WORKER_THREADS = int(os.environ.get('SCRAPE_WORKER_THREADS', '32'))
+# Hedged attempts give up on TCP connect + TLS after this long, so a losing attempt stuck there
+# frees its thread and proxy slot quickly (reads still use ATTEMPT_TIMEOUT_SECONDS)
+SCRAPE_HEDGE_CONNECT_TIMEOUT_SECONDS = float(os.environ.get('SCRAPE_HEDGE_CONNECT_TIMEOUT_SECONDS', '3.05'))
+
+MAX_ATTEMPTS = 5
+ATTEMPT_TIMEOUT_SECONDS = 15
+SCRAPE_CHUNK_BYTES = 16384
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit=537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Referer': 'https://www.google.com/',
+}
+
+# Fast single-pass extractor by default; CONTENT_EXTRACTOR=soup restores the BeautifulSoup tree walk
+content_extractor = get_extractor()
+
+_scrape_executor = ThreadPoolExecutor(max_workers=SCRAPE_WORKER_THREADS, thread_name_prefix="scrape")
+
+
+class AttemptCancelled(Exception):
+    """Raised inside a losing hedged attempt once another attempt has won."""
+
+
+class AttemptCanceller:
+    """
+    Cancels the losing attempts of one hedged scrape: sets the flag they check between chunk reads
+    and shuts down the socket of every response they are reading, which also ends a read that is
+    blocked waiting for data. An attempt still connecting or waiting for headers has no response
+    yet; it notices the flag once its response arrives (or its timeout fires).
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._responses = set()
+        self._lock = threading.Lock()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def track(self, response) -> None:
+        """Registers a response being read; raises AttemptCancelled if the scrape was already won."""
+        with self._lock:
+            if not self._event.is_set():
+                self._responses.add(response)
+                return
+        response.close()
+        raise AttemptCancelled()
+
+    def untrack(self, response) -> None:
+        with self._lock:
+            self._responses.discard(response)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._event.set()
+            responses = list(self._responses)
+            self._responses.clear()
+        for response in responses:
+            _shutdown_socket(response)
+
+
+def _shutdown_socket(response) -> None:
+    # response.close() from another thread does not wake a blocked recv(); shutdown() does
+    sock = getattr(getattr(response.raw, 'connection', None), 'sock', None)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class EmptyContent(Exception):
+    """Raised when a page was fetched but no text could be extracted from it (another attempt may do better)."""
+
+
+class FetchOutcome:
+    """Result of a successful attempt: extracted text, or not_modified=True for a 304 answer."""
+
+    def __init__(self, text: Optional[str], not_modified: bool = False,
+                 etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.text = text
+        self.not_modified = not_modified
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class LatencyTracker:
+    """Rolling window of successful attempt durations; its p95 sets the hedging delay."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def hedge_delay(self) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < 20:
+            return SCRAPE_HEDGE_DEFAULT_DELAY_SECONDS
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        return max(SCRAPE_HEDGE_MIN_DELAY_SECONDS, p95)
+
+
+attempt_latency = LatencyTracker()
+
+
+def _declared_charset(response) -> Optional[str]:
+    """Charset from the Content-Type header only (requests guesses ISO-8859-1 for any text/*)."""
+    match = re.search(r'charset=["\']?([\w-]+)', response.headers.get('Content-Type', ''), re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def _cancellable(chunks, canceller: Optional[AttemptCanceller]):
+    try:
+        for chunk in chunks:
+            if canceller is not None and canceller.is_set():
+                raise AttemptCancelled()
+            yield chunk
+    except requests.exceptions.RequestException as e:
+        # The canceller shut the socket down under a blocked read
+        if canceller is not None and canceller.is_set():
+            raise AttemptCancelled() from e
+        raise
+
+
+def _attempt_fetch(url: str, proxy_address: Optional[str], timeout,
+                   canceller: Optional[AttemptCanceller] = None,
+                   conditional_headers: Optional[Dict[str, str]] = None) -> FetchOutcome:
+    """
+    One scrape attempt (direct if proxy_address is None). timeout is a requests timeout: seconds,
+    or a (connect, read) pair. Raises on any failure.
+    """
+    PROXIES = { "http": proxy_address, "https": proxy_address } if proxy_address else {}
+    headers = dict(HEADERS, **conditional_headers) if conditional_headers else HEADERS
+    started = time.monotonic()
+    try:
+        response = http_pool.get(url, headers=headers, proxies=PROXIES, timeout=timeout, stream=True)
+    except (requests.exceptions.ProxyError, requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        proxy_pool.report_failure(proxy_address)
+        raise
+    # The proxy delivered a response, even if the target site answered with an error
+    proxy_pool.report_success(proxy_address, time.monotonic() - started)
+    if canceller is not None:
+        canceller.track(response)
+
+    try:
+        text, etag, last_modified = _read_response(response, conditional_headers, canceller, started)
+    finally:
+        if canceller is not None:
+            canceller.untrack(response)
+    if text is None:
+        return FetchOutcome(None, not_modified=True)
+    if canceller is not None and canceller.is_set():
+        raise AttemptCancelled()
+    if not text or not text.strip():
+        raise EmptyContent(f"No text could be extracted from {url}")
+    attempt_latency.record(time.monotonic() - started)
+    return FetchOutcome(text, etag=etag, last_modified=last_modified)
+
+
+def _read_response(response, conditional_headers, canceller: Optional[AttemptCanceller], started: float):
+    """(text, etag, last_modified) of a fetched response; text is None for a 304 answer."""
+    with response:
+        if response.status_code == 304 and conditional_headers:
+            attempt_latency.record(time.monotonic() - started)
+            return None, None, None
+        response.raise_for_status()
+
+        # SUCCESS: Streamed HTML Parsing and Content Isolation (stops reading once it has enough text)
+        text = content_extractor.extract(
+            _cancellable(response.iter_content(chunk_size=SCRAPE_CHUNK_BYTES), canceller),
+            encoding=_declared_charset(response)
+        )
+        return text, response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+
+def _fetch_sequential(url: str, deadline: float, conditional_headers=None):
+    """
+    The original retry loop: one proxy at a time, each attempt bounded by the remaining deadline.
+    Returns a FetchOutcome, or the "Web Scrape failed" message.
+    """
+    tried_proxies = set()
+    last_error = None
+
+    for attempt in range(MAX_ATTEMPTS):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        with span("proxy_acquire"):
+            proxy_address = proxy_pool.acquire(wait_seconds=min(10, remaining) if attempt == 0 else 0, exclude=tried_proxies)
+        if proxy_address:
+            tried_proxies.add(proxy_address)
+
+        if attempt > 0:
+            record_retry("scrape")
+        try:
+            logger.info("Attempt %d: Connecting via %s...", attempt + 1, proxy_address or 'DIRECT')
+            return _attempt_fetch(url, proxy_address, min(ATTEMPT_TIMEOUT_SECONDS, max(0.1, deadline - time.monotonic())),
+                                  conditional_headers=conditional_headers)
+        except Exception as e:
+            last_error = e
+            logger.warning("Attempt %d Failed. Error: %s", attempt + 1, e)
+
+    logger.error("All proxy attempts exhausted.")
+    return f"Web Scrape failed: All attempts exhausted. Final Error: {last_error or 'deadline exceeded'}"
+
+
+def _fetch_hedged(url: str, deadline: float, conditional_headers=None):
+    """
+    Races a direct connection against SCRAPE_HEDGE_PROXIES proxies, starts a backup attempt
+    whenever nothing has succeeded within the p95 hedge delay (or an attempt fails), and returns
+    the first success. Once it returns, losing attempts that are reading a body have their socket
+    shut down. One still connecting gives up within SCRAPE_HEDGE_CONNECT_TIMEOUT_SECONDS; one
+    waiting for response headers stops when they arrive or its read timeout fires.
+    Returns a FetchOutcome, or the "Web Scrape failed" message.
+    """
+    canceller = AttemptCanceller()
+    tried_proxies = set()
+    running = {}
+    launched = 0
+    last_error = None
+
+    def launch(proxy_address: Optional[str]) -> None:
+        nonlocal launched
+        read_timeout = min(ATTEMPT_TIMEOUT_SECONDS, max(0.1, deadline - time.monotonic()))
+        timeout = (min(SCRAPE_HEDGE_CONNECT_TIMEOUT_SECONDS, read_timeout), read_timeout)
+        if proxy_address:
+            tried_proxies.add(proxy_address)
+        if launched > 0:
+            record_retry("scrape")
+        logger.info("Hedged attempt %d: Connecting via %s...", launched + 1, proxy_address or 'DIRECT')
+        future = _scrape_executor.submit(_attempt_fetch, url, proxy_address, timeout, canceller, conditional_headers)
+        running[future] = proxy_address
+        launched += 1
+
+    def launch_next_proxy() -> bool:
+        with span("proxy_acquire"):
+            proxy_address = proxy_pool.acquire(exclude=tried_proxies)
+        if proxy_address is None:
+            return False
+        launch(proxy_address)
+        return True
+
+    launch(None)
+    for _ in range(SCRAPE_HEDGE_PROXIES):
+        if launched >= MAX_ATTEMPTS or not launch_next_proxy():
+            break
+
+    try:
+        while running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(list(running), timeout=min(remaining, attempt_latency.hedge_delay()),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                proxy_address = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    return future.result()
+                last_error = error
+                logger.warning("Hedged attempt via %s Failed. Error: %s", proxy_address or 'DIRECT', error)
+
+            # Nothing won yet: a failure frees a slot immediately, a slow round adds a backup attempt
+            if launched < MAX_ATTEMPTS:
+                launch_next_proxy()
+            if not running:
+                break
+    finally:
+        canceller.cancel()
+
+    logger.error("All hedged attempts failed or the scrape deadline passed.")
+    return f"Web Scrape failed: All attempts exhausted. Final Error: {last_error or 'deadline exceeded'}"
+
+
+# --- Stage 0: Input Pre-processing (fetch_url_content with Retry) ---
+def fetch_url_content(url, deadline_seconds: Optional[float] = None):
+    """
+    Fetches and cleans the main text from a URL using proxy rotation and retry attempts.
+    Proxies come from the shared, background-refreshed ProxyPool and requests reuse pooled
+    keep-alive connections. In the default hedged mode, attempts race each other and the whole
+    fetch is bounded by SCRAPE_DEADLINE_SECONDS (or deadline_seconds).
+
+    Extracted text is kept in the on-disk content cache: fresh (or immutable archive) entries are
+    returned without any network call, older ones are revalidated with a conditional GET.
+    """
+    deadline = time.monotonic() + (deadline_seconds if deadline_seconds is not None else SCRAPE_DEADLINE_SECONDS)
+    canonical_url = canonicalize_url(url)
+
+    cached = content_cache.get(canonical_url) if content_cache is not None else None
+    if content_cache is not None:
+        record_cache("content", cached is not None and cached.is_fresh())
+    if cached is not None and cached.is_fresh():
+        logger.info("Content cache hit: %s", canonical_url)
+        return cached.text
+    conditional_headers = cached.conditional_headers() if cached is not None else None
+
+    if SCRAPE_MODE == 'sequential':
+        outcome = _fetch_sequential(url, deadline, conditional_headers)
+    else:
+        outcome = _fetch_hedged(url, deadline, conditional_headers)
+
+    if isinstance(outcome, str):
+        if cached is not None:
+            # Stale-if-error: the stored text beats falling back to URL-string analysis
+            logger.warning("Scrape failed; serving stale cached content.")
+            return cached.text
+        return outcome
+
+    if outcome.not_modified:
+        logger.info("Content cache revalidated (304): %s", canonical_url)
+        content_cache.refresh(cached)
+        return cached.text
+
+    if content_cache is not None and outcome.text:
+        content_cache.put(canonical_url, outcome.text, etag=outcome.etag, last_modified=outcome.last_modified)
+    return outcome.text
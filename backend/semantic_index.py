@@ -0,0 +1,279 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: the semantic index is disabled without NumPy
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within one process
+    fcntl = None
+
+from fast_classifier import HashingEmbedder, polarity_cues
+
+logger = logging.getLogger(__name__)
+
+# --- Semantic Index Configuration (read from .env) ---
+SEMANTIC_CACHE_ENABLED = os.environ.get('SEMANTIC_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+SEMANTIC_INDEX_DIR = os.environ.get('SEMANTIC_INDEX_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.semantic_index'))
+SEMANTIC_HASH_DIM = int(os.environ.get('SEMANTIC_HASH_DIM', '512'))
+# Hashed n-grams put antonym pairs around 0.8 ("increases"/"decreases" lung cancer risk: 0.815), so only
+# near-verbatim rewordings clear the default; matches must also carry the same polarity cues (below)
+SEMANTIC_MATCH_THRESHOLD = float(os.environ.get('SEMANTIC_MATCH_THRESHOLD', '0.95'))
+# Stored verdicts older than this are never reused for a paraphrase
+SEMANTIC_MAX_AGE_SECONDS = float(os.environ.get('SEMANTIC_MAX_AGE_SECONDS', str(7 * 24 * 3600)))
+# How often a search checks whether other worker processes appended rows
+SEMANTIC_REMAP_SECONDS = float(os.environ.get('SEMANTIC_REMAP_SECONDS', '30'))
+
+
+def polarity_key(text: str) -> str:
+    """Stored form of fast_classifier.polarity_cues(): the sorted cue stems joined by spaces."""
+    return ' '.join(sorted(polarity_cues(text)))
+
+
+class SemanticIndex:
+    """
+    Brute-force cosine index over previously verified text claims.
+
+    Vectors live in an append-only float32 file that is memory-mapped at startup, so loading costs
+    no parsing and pages are shared between worker processes; each row's fingerprint and timestamp
+    sit in a parallel JSON-lines file. Rows added since the last mapping are searched from a small
+    in-memory tail. Appends to both files happen under one file lock so rows stay aligned.
+
+    A match is only returned when both claims have the same negation and direction words
+    (fast_classifier.polarity_cues()): "X is not Y" never reuses "X is Y", and "smoking decreases
+    lung cancer risk" never reuses "smoking increases lung cancer risk", however close the vectors.
+    """
+
+    def __init__(self, directory: str = SEMANTIC_INDEX_DIR, embedder=None):
+        self.directory = directory
+        self._embedder = embedder
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._base = None
+        self._tail: List = []
+        self._fingerprints: List[str] = []
+        self._polarity: List[str] = []
+        self._known = set()
+        self._last_synced: Optional[datetime] = None
+        self._checked_at = 0.0
+        # Appends (embedding plus a locked file write) stay off request threads and the event loop
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="semantic-index")
+
+    # --- Storage helpers ---
+    @property
+    def embedder(self) -> HashingEmbedder:
+        if self._embedder is None:
+            self._embedder = HashingEmbedder(SEMANTIC_HASH_DIM)
+        return self._embedder
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _ensure_loaded(self) -> None:
+        # Called with self._lock held
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        state = {}
+        if os.path.exists(self._file('state.json')):
+            with open(self._file('state.json')) as f:
+                state = json.load(f)
+        if state.get('embedder') not in (None, self._embedder_key()):
+            logger.warning("Semantic index was built with %s; rebuilding for %s", state.get('embedder'), self._embedder_key())
+            for name in ('vectors.f32', 'meta.jsonl', 'state.json'):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            state = {}
+        if state.get('last_synced'):
+            self._last_synced = datetime.fromisoformat(state['last_synced'])
+        self._remap()
+        if not state:
+            self._save_state()
+        self._loaded = True
+
+    def _embedder_key(self) -> str:
+        # Rows carry a polarity key; an index written without one is rebuilt
+        return f"hashing-polarity:{self.embedder.dim}"
+
+    def _remap(self) -> None:
+        """(Re)maps the vector file and reloads row metadata, including rows appended by other processes."""
+        dim = self.embedder.dim
+        fingerprints, polarity = [], []
+        if os.path.exists(self._file('meta.jsonl')):
+            with open(self._file('meta.jsonl')) as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                        fingerprints.append(row['fingerprint'])
+                        polarity.append(row['polarity'])
+                    except (ValueError, KeyError):
+                        break  # torn final line from a crash
+        vector_rows = os.path.getsize(self._file('vectors.f32')) // (dim * 4) if os.path.exists(self._file('vectors.f32')) else 0
+        rows = min(len(fingerprints), vector_rows)
+        self._base = np.memmap(self._file('vectors.f32'), dtype=np.float32, mode='r', shape=(rows, dim)) if rows else None
+        self._fingerprints = fingerprints[:rows]
+        self._polarity = polarity[:rows]
+        self._known = set(self._fingerprints)
+        self._tail = []
+        self._checked_at = time.monotonic()
+
+    def _maybe_remap(self) -> None:
+        # Called with self._lock held
+        if time.monotonic() - self._checked_at < SEMANTIC_REMAP_SECONDS:
+            return
+        self._checked_at = time.monotonic()
+        path = self._file('vectors.f32')
+        if os.path.exists(path) and os.path.getsize(path) // (self.embedder.dim * 4) > len(self._fingerprints):
+            self._remap()
+
+    def _save_state(self) -> None:
+        state = {'embedder': self._embedder_key(), 'rows': len(self._fingerprints),
+                 'last_synced': self._last_synced.isoformat() if self._last_synced else None}
+        tmp_path = self._file(f'state.json.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._file('state.json'))
+
+    def _row(self, fingerprint: str, claim_text: str, timestamp: datetime) -> tuple:
+        return fingerprint, timestamp.isoformat(), polarity_key(claim_text), self.embedder.embed(claim_text)
+
+    def _append(self, rows: List[tuple]) -> None:
+        # Called with self._lock held; rows come from _row()
+        with open(self._file('vectors.f32'), 'ab') as vectors, open(self._file('meta.jsonl'), 'a') as meta:
+            if fcntl is not None:
+                fcntl.flock(vectors.fileno(), fcntl.LOCK_EX)
+            try:
+                for fingerprint, timestamp, polarity, vector in rows:
+                    vectors.write(np.asarray(vector, dtype=np.float32).tobytes())
+                    meta.write(json.dumps({'fingerprint': fingerprint, 'timestamp': timestamp, 'polarity': polarity}) + "\n")
+                    self._fingerprints.append(fingerprint)
+                    self._polarity.append(polarity)
+                    self._known.add(fingerprint)
+                    self._tail.append(vector)
+                vectors.flush()
+                meta.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(vectors.fileno(), fcntl.LOCK_UN)
+        if len(self._tail) >= 1024:
+            self._remap()
+
+    # --- Public API ---
+    def add(self, fingerprint: str, claim_text: str, timestamp: Optional[datetime] = None) -> bool:
+        """Indexes a freshly verified text claim. Returns False if it was already present."""
+        row = self._row(fingerprint, claim_text, timestamp or datetime.utcnow())
+        with self._lock:
+            self._ensure_loaded()
+            if fingerprint in self._known:
+                return False
+            self._append([row])
+        return True
+
+    def add_later(self, fingerprint: str, claim_text: str) -> None:
+        """add() on the index's writer thread; failures are logged."""
+        def _add():
+            try:
+                self.add(fingerprint, claim_text)
+            except Exception as e:
+                logger.warning("Could not add claim to the semantic index. Error: %s", e)
+
+        self._writer.submit(_add)
+
+    def search(self, claim_text: str, threshold: float = SEMANTIC_MATCH_THRESHOLD) -> Optional[Tuple[str, float]]:
+        """Returns (fingerprint, cosine similarity) of the closest indexed claim at or above threshold."""
+        query = self.embedder.embed(claim_text)
+        query_polarity = polarity_key(claim_text)
+        with self._lock:
+            self._ensure_loaded()
+            self._maybe_remap()
+            base, tail = self._base, list(self._tail)
+            fingerprints, polarity = list(self._fingerprints), list(self._polarity)
+
+        parts = []
+        if base is not None:
+            parts.append(base @ query)
+        if tail:
+            parts.append(np.vstack(tail) @ query)
+        if not parts:
+            return None
+        scores = np.concatenate(parts)
+        candidates = np.flatnonzero(scores >= threshold)
+        for row in candidates[np.argsort(-scores[candidates])]:
+            if polarity[row] == query_polarity:
+                return fingerprints[row], float(scores[row])
+        return None
+
+    def sync_from_history(self, batch_size: int = 500) -> int:
+        """Embeds text claims saved to verified_claims_history since the last sync. Returns rows added."""
+        from db_utils import iter_claim_texts
+
+        with self._lock:
+            self._ensure_loaded()
+            since = self._last_synced
+        added = 0
+        pending = []
+        newest = since
+        for document in iter_claim_texts(since):
+            newest = document['timestamp']
+            if document['claim_fingerprint'] in self._known:
+                continue
+            pending.append(self._row(document['claim_fingerprint'], document['claim_text'], newest))
+            if len(pending) >= batch_size:
+                added += self._append_synced(pending)
+                pending = []
+        if pending:
+            added += self._append_synced(pending)
+        with self._lock:
+            self._last_synced = newest
+            self._save_state()
+        return added
+
+    def _append_synced(self, rows) -> int:
+        with self._lock:
+            rows = [row for row in rows if row[0] not in self._known]
+            self._append(rows)
+        return len(rows)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._fingerprints)
+
+    def _reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="semantic-index")
+
+
+# Shared process-wide index used by verifier.process_claim() (None when disabled or NumPy is missing)
+semantic_index = SemanticIndex() if SEMANTIC_CACHE_ENABLED and np is not None else None
+
+if semantic_index is not None and hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=semantic_index._reset_after_fork)
+
+
+def start_semantic_sync() -> Optional[threading.Thread]:
+    """Catches the index up with verified_claims_history in a background thread (startup)."""
+    if semantic_index is None:
+        return None
+
+    def _sync():
+        started = time.monotonic()
+        try:
+            added = semantic_index.sync_from_history()
+            logger.info("Semantic index: synced %d claim(s) in %.1fs (%d total)", added,
+                        time.monotonic() - started, len(semantic_index))
+        except Exception:
+            logger.exception("Semantic index: sync from history failed")
+
+    thread = threading.Thread(target=_sync, name="semantic-index-sync", daemon=True)
+    thread.start()
+    return thread
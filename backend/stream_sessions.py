@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from telemetry import register_gauges
+
+logger = logging.getLogger(__name__)
+
+# --- Streaming Configuration (read from .env) ---
+# Pipelines behind /medverify/check/stream run here, detached from the client connection
+STREAM_WORKERS = int(os.environ.get('STREAM_WORKERS', '32'))
+# A finished session's events stay available for resuming (Last-Event-ID) this long
+STREAM_SESSION_TTL_SECONDS = float(os.environ.get('STREAM_SESSION_TTL_SECONDS', '300'))
+STREAM_MAX_SESSIONS = int(os.environ.get('STREAM_MAX_SESSIONS', '1000'))
+# Comment lines keep idle connections (and proxies in between) from timing out while a stage runs
+STREAM_KEEPALIVE_SECONDS = float(os.environ.get('STREAM_KEEPALIVE_SECONDS', '15'))
+# Reconnection delay suggested to EventSource clients
+STREAM_RETRY_MS = int(os.environ.get('STREAM_RETRY_MS', '2000'))
+
+FINAL_EVENTS = ('result', 'error')
+
+
+def format_sse(event_id: int, event: str, data: Dict[str, Any]) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class StreamSession:
+    """
+    Buffered event log of one streamed verification. The pipeline publishes into it from its own
+    thread; any number of readers (the original response, or a reconnecting client) replay the
+    events after their Last-Event-ID and then follow new ones until the final event.
+    """
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._events: List[Tuple[int, str, Dict[str, Any]]] = []
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def publish(self, event: str, data: Dict[str, Any]) -> None:
+        with self._cond:
+            if self.finished:
+                return
+            self._events.append((len(self._events) + 1, event, data))
+            if event in FINAL_EVENTS:
+                self.finished_at = time.time()
+            self._cond.notify_all()
+
+    def iter_events(self, after_id: int = 0,
+                    keepalive_seconds: float = STREAM_KEEPALIVE_SECONDS) -> Iterator[Optional[Tuple[int, str, Dict[str, Any]]]]:
+        """
+        Yields (id, event, data) for every event after after_id, blocking for new ones until the
+        final event has been yielded. Yields None when keepalive_seconds pass without an event.
+        """
+        next_index = max(0, after_id)
+        while True:
+            with self._cond:
+                if next_index >= len(self._events) and not self.finished:
+                    self._cond.wait(timeout=keepalive_seconds)
+                pending = self._events[next_index:]
+                done = self.finished
+            if not pending:
+                if done:
+                    return
+                yield None
+                continue
+            for item in pending:
+                yield item
+            next_index += len(pending)
+
+
+class StreamSessionStore:
+    """
+    In-process registry of stream sessions. Running sessions are never evicted; finished ones are
+    dropped after ttl_seconds, or oldest first once max_sessions is reached. Sessions live in the
+    worker process that started them, so resuming needs the same worker (sticky routing); other
+    workers answer 404 and the client should start a new stream, which the verdict cache then answers.
+    """
+
+    def __init__(self, ttl_seconds: float = STREAM_SESSION_TTL_SECONDS, max_sessions: int = STREAM_MAX_SESSIONS,
+                 workers: int = STREAM_WORKERS):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max(1, max_sessions)
+        self.workers = workers
+        self._init_state()
+
+    def _init_state(self) -> None:
+        self._sessions: "OrderedDict[str, StreamSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="claim-stream")
+
+    def _prune(self) -> None:
+        now = time.time()
+        for session_id, session in list(self._sessions.items()):
+            if session.finished and (now - session.finished_at > self.ttl_seconds
+                                     or len(self._sessions) > self.max_sessions):
+                del self._sessions[session_id]
+
+    def get(self, session_id: str) -> Optional[StreamSession]:
+        with self._lock:
+            self._prune()
+            return self._sessions.get(session_id)
+
+    def start(self, raw_input: str, force_refresh: bool = False,
+              deadline_seconds: Optional[float] = None) -> StreamSession:
+        """Opens a session and runs process_claim_async() for it in the background."""
+        session = StreamSession(uuid.uuid4().hex)
+        with self._lock:
+            self._prune()
+            self._sessions[session.id] = session
+        self._executor.submit(self._run, session, raw_input, force_refresh, deadline_seconds)
+        return session
+
+    @staticmethod
+    def _run(session: StreamSession, raw_input: str, force_refresh: bool, deadline_seconds: Optional[float]) -> None:
+        from lifecycle import serving_state
+        from verifier import process_claim_async
+
+        # Counted separately from the HTTP request: the pipeline keeps running if the client drops
+        serving_state.request_started()
+        try:
+            result = asyncio.run(process_claim_async(raw_input, force_refresh=force_refresh,
+                                                     deadline_seconds=deadline_seconds,
+                                                     on_stage=session.publish))
+            session.publish('result', result)
+        except Exception as e:
+            logger.exception("Streamed verification failed: %s", e)
+            session.publish('error', {"error": "Internal server error during workflow execution.",
+                                      "details": str(e)})
+        finally:
+            serving_state.request_finished()
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            running = sum(1 for session in self._sessions.values() if not session.finished)
+            return {'sessions': len(self._sessions), 'running': running}
+
+    def _reset_after_fork(self) -> None:
+        # Executor threads and sessions belong to the parent process
+        self._init_state()
+
+
+# Shared process-wide store used by the streaming routes in app.py
+stream_sessions = StreamSessionStore()
+register_gauges('medverify_stream', "Streamed verification sessions held for resuming.", stream_sessions.metrics)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=stream_sessions._reset_after_fork)
@@ -0,0 +1,302 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+try:
+    import prometheus_client
+except ImportError:  # optional: a built-in text exposition is served without it
+    prometheus_client = None
+
+# --- Telemetry Configuration (read from .env) ---
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# Per-logger overrides, e.g. "scraper=DEBUG,proxy_manager=WARNING"
+LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+# text: human-readable lines; json: one JSON object per line for log shippers
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+
+# Pipeline stages range from sub-millisecond cache lookups to multi-second scrapes and Gemini calls
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+_RESERVED_LOG_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+# --- Structured logging ---
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per record; values passed with extra={...} become top-level fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_LOG_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_logging_configured = False
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, overrides: str = LOG_LEVELS) -> None:
+    """Installs the root handler once (LOG_LEVEL / LOG_FORMAT / LOG_LEVELS); later calls are no-ops."""
+    global _logging_configured
+    if _logging_configured:
+        return
+    handler = logging.StreamHandler()
+    if fmt == 'json':
+        handler.setFormatter(JsonLogFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    for override in filter(None, (part.strip() for part in overrides.split(','))):
+        name, _, logger_level = override.partition('=')
+        logging.getLogger(name.strip()).setLevel(logger_level.strip().upper())
+    _logging_configured = True
+
+
+# --- Metrics (prometheus_client when installed, otherwise a minimal built-in registry) ---
+class _FallbackChild:
+    def __init__(self, buckets: Optional[Tuple[float, ...]]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) if buckets else None
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+            self.total += value
+            self.count += 1
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.total += amount
+
+
+class _FallbackMetric:
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Iterable[str],
+                 buckets: Optional[Tuple[float, ...]] = None):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children: Dict[Tuple[str, ...], _FallbackChild] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kwargs) -> _FallbackChild:
+        key = tuple(str(v) for v in values) or tuple(str(kwargs[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = _FallbackChild(self.buckets)
+            return child
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            labels = ",".join(f'{name}="{value}"' for name, value in zip(self.labelnames, key))
+            if self.kind == 'counter':
+                lines.append(f"{self.name}_total{{{labels}}} {child.total}")
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {child.total}")
+            lines.append(f"{self.name}_count{{{labels}}} {child.count}")
+        return "\n".join(lines)
+
+
+_fallback_metrics = []
+_gauge_callbacks: Dict[str, Tuple[str, Callable[[], Dict[str, float]]]] = {}
+
+
+def _histogram(name: str, documentation: str, labelnames: Iterable[str]):
+    if prometheus_client is not None:
+        return prometheus_client.Histogram(name, documentation, labelnames, buckets=DURATION_BUCKETS)
+    metric = _FallbackMetric('histogram', name, documentation, labelnames, DURATION_BUCKETS)
+    _fallback_metrics.append(metric)
+    return metric
+
+
+def _counter(name: str, documentation: str, labelnames: Iterable[str]):
+    if prometheus_client is not None:
+        return prometheus_client.Counter(name, documentation, labelnames)
+    metric = _FallbackMetric('counter', name, documentation, labelnames)
+    _fallback_metrics.append(metric)
+    return metric
+
+
+STAGE_SECONDS = _histogram('medverify_stage_duration_seconds', "Time spent in each pipeline stage.", ['stage'])
+REQUEST_SECONDS = _histogram('medverify_claim_duration_seconds', "End-to-end process_claim latency.",
+                             ['mode', 'input_kind', 'outcome'])
+RETRIES = _counter('medverify_retries', "Retried attempts by component (llm, scrape).", ['component'])
+CACHE_LOOKUPS = _counter('medverify_cache_lookups', "Cache lookups by tier and result.", ['tier', 'result'])
+FAST_PATH_AGREEMENT = _counter('medverify_fast_classifier_agreement',
+                               "Local classifier predictions compared with the LLM verdict of the same claim.",
+                               ['result'])
+
+
+def register_gauges(prefix: str, documentation: str, collect: Callable[[], Dict[str, float]]) -> None:
+    """Exposes each numeric value returned by collect() as a gauge '<prefix>_<key>', read at scrape time."""
+    _gauge_callbacks[prefix] = (documentation, collect)
+
+
+def _render_gauges() -> str:
+    lines = []
+    for prefix, (documentation, collect) in list(_gauge_callbacks.items()):
+        try:
+            values = collect()
+        except Exception:
+            logging.getLogger(__name__).exception("Gauge callback %s failed", prefix)
+            continue
+        for key, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines += [f"# HELP {prefix}_{key} {documentation}", f"# TYPE {prefix}_{key} gauge",
+                          f"{prefix}_{key} {value}"]
+    return "\n".join(lines)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Returns (body, content type) for the /metrics endpoint."""
+    gauges = _render_gauges()
+    if prometheus_client is not None:
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            # Aggregate histograms/counters across gunicorn workers
+            from prometheus_client import multiprocess
+            registry = prometheus_client.CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            body = prometheus_client.generate_latest(registry)
+        else:
+            body = prometheus_client.generate_latest()
+        return body + (gauges + "\n").encode('utf-8') if gauges else body, prometheus_client.CONTENT_TYPE_LATEST
+    text = "\n".join([metric.render() for metric in _fallback_metrics] + ([gauges] if gauges else []))
+    return (text + "\n").encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# --- Per-request timing spans ---
+class RequestTimings:
+    """Stage durations, retry counts and cache flags collected while one claim is processed."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.retries: Dict[str, int] = {}
+        self.flags: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_retry(self, component: str) -> None:
+        with self._lock:
+            self.retries[component] = self.retries.get(component, 0) + 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                'total_ms': round(self.elapsed() * 1000, 1),
+                'stages_ms': {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()},
+                'retries': dict(self.retries),
+                **self.flags,
+            }
+
+
+_current_timings: contextvars.ContextVar = contextvars.ContextVar('medverify_request_timings', default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+@contextmanager
+def track_request():
+    """
+    Collects spans for one claim. The timings travel in a contextvar, so stages run through
+    asyncio.to_thread (async pipeline) still report into the same request.
+    """
+    timings = RequestTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def span(stage: str):
+    """Times a block: observed in the stage histogram and added to the current request's timings."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add_stage(stage, elapsed)
+
+
+def timed_stage(stage: str):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_retry(component: str) -> None:
+    RETRIES.labels(component=component).inc()
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add_retry(component)
+
+
+def record_cache(tier: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(tier=tier, result='hit' if hit else 'miss').inc()
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.flags[f"{tier}_cache_hit"] = hit
+
+
+def record_fast_path_agreement(agree: bool) -> None:
+    FAST_PATH_AGREEMENT.labels(result='agree' if agree else 'disagree').inc()
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Records a duration measured outside any request (e.g. the background Mongo writer)."""
+    STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+
+def observe_request(mode: str, input_kind: str, outcome: str, seconds: float) -> None:
+    REQUEST_SECONDS.labels(mode=mode, input_kind=input_kind, outcome=outcome).observe(seconds)
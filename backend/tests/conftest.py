@@ -0,0 +1,11 @@
+# conftest.py
+#
+# Unit tests for the backend modules, run from backend/ with `python -m pytest tests`. They need no
+# network, API keys or MongoDB: database code runs against benchmarks/offline_fakes.py stand-ins.
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
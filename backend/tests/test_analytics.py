@@ -0,0 +1,115 @@
+import time
+from datetime import datetime
+
+import pymongo
+import pytest
+from pymongo import UpdateOne
+
+mongomock = pytest.importorskip('mongomock')
+
+import analytics
+import db_utils
+from analytics import ALL_TIME, FACETS_COLLECTION, ROLLUPS_COLLECTION, _Accumulator, bucket_id
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = mongomock.MongoClient()['medverify_test']
+    try:
+        database['probe'].bulk_write([UpdateOne({'_id': 1}, {'$inc': {'n': 1}}, upsert=True)])
+    except TypeError as e:
+        # pymongo >= 4.11 passes arguments to bulk operations that mongomock 4.3 does not accept
+        pytest.skip(f"mongomock cannot run pymongo {pymongo.version} bulk writes: {e}")
+    database.drop_collection('probe')
+    monkeypatch.setattr(db_utils, '_get_db', lambda: database)
+    monkeypatch.setattr(analytics, 'ANALYTICS_ENABLED', True)
+    return database
+
+
+def _claim(verdict='TRUE', score=85, original_input="Vitamin C cures colds", terms=('vitamin c',),
+           timestamp=None):
+    return {'timestamp': timestamp or datetime.utcnow(), 'llm_judgment': verdict, 'credibility_score': score,
+            'original_input': original_input, 'extracted_terms': list(terms)}
+
+
+def _save(db, document):
+    """What a claim save does: insert the document, then add it to the rollups."""
+    db[db_utils.CLAIMS_COLLECTION].insert_one(dict(document))
+    analytics.record_claim_stats([document])
+
+
+def test_bucket_ids():
+    moment = datetime(2026, 10, 17, 13, 45, 10)
+    assert bucket_id('hour', moment) == ('hour:2026-10-17T13', datetime(2026, 10, 17, 13))
+    assert bucket_id('day', moment) == ('day:2026-10-17', datetime(2026, 10, 17))
+
+
+def test_accumulator_sums_per_bucket():
+    accumulator = _Accumulator()
+    moment = datetime(2026, 10, 17, 13, 5)
+    accumulator.add_document(_claim('TRUE', 85, timestamp=moment))
+    accumulator.add_document(_claim('FALSE', 12, original_input="https://nhs.uk/conditions", terms=(), timestamp=moment))
+    accumulator.add_document(_claim('ERROR', timestamp=moment))
+
+    totals = accumulator.rollups[ALL_TIME]['inc']
+    assert totals['total'] == 2
+    assert totals['verdicts.TRUE'] == 1 and totals['verdicts.FALSE'] == 1
+    assert totals['score_bins.80'] == 1 and totals['score_bins.10'] == 1
+    assert totals['score_sum'] == 97.0
+    assert totals['input_kinds.text'] == 1 and totals['input_kinds.url'] == 1
+    assert accumulator.rollups['hour:2026-10-17T13']['inc']['total'] == 2
+    assert ('term', 'day:2026-10-17', 'vitamin c') in accumulator.facets
+    assert ('domain', ALL_TIME, 'nhs.uk') in accumulator.facets
+
+
+def test_record_claim_stats_and_summary(db):
+    for verdict in ('TRUE', 'TRUE', 'FALSE'):
+        _save(db, _claim(verdict))
+    summary = analytics.get_stats_summary('day', limit=5)
+    assert summary['totals']['total'] == 3
+    assert summary['totals']['verdicts'] == {'TRUE': 2, 'FALSE': 1}
+    assert summary['series'][-1]['total'] == 3
+    assert analytics.get_top_values('term') == [{'value': 'vitamin c', 'count': 3}]
+
+
+def test_rebuild_matches_incremental_counts(db):
+    for verdict in ('TRUE', 'FALSE', 'MISLEADING'):
+        _save(db, _claim(verdict))
+    before = db[ROLLUPS_COLLECTION].find_one({'_id': ALL_TIME})
+    db[ROLLUPS_COLLECTION].update_one({'_id': ALL_TIME}, {'$inc': {'total': 100}})
+
+    stats = analytics.rebuild()
+    after = db[ROLLUPS_COLLECTION].find_one({'_id': ALL_TIME})
+    assert stats['events'] == 3
+    assert after['total'] == before['total'] == 3
+    assert after['verdicts'] == before['verdicts']
+    assert analytics.get_top_values('term') == [{'value': 'vitamin c', 'count': 3}]
+
+
+def test_rebuild_counts_saves_around_the_swap_once(db, monkeypatch):
+    _save(db, _claim('TRUE'))
+    ensure_indexes = analytics.ensure_analytics_indexes
+    rename = mongomock.collection.Collection.rename
+
+    def ensure_indexes_during_rebuild(database=None, rollups=ROLLUPS_COLLECTION, facets=FACETS_COLLECTION):
+        if rollups != ROLLUPS_COLLECTION:
+            # Saved after the scan, before the swap: lands in the collections about to be dropped
+            _save(db, _claim('FALSE'))
+            # Keep it out of the swap's millisecond (stored timestamps have millisecond precision)
+            time.sleep(0.002)
+        ensure_indexes(database, rollups=rollups, facets=facets)
+
+    def rename_then_save(collection, new_name, **kwargs):
+        rename(collection, new_name, **kwargs)
+        if new_name == FACETS_COLLECTION:
+            # Saved after the swap: already counted by the live collections
+            _save(db, _claim('MISLEADING'))
+
+    monkeypatch.setattr(analytics, 'ensure_analytics_indexes', ensure_indexes_during_rebuild)
+    monkeypatch.setattr(mongomock.collection.Collection, 'rename', rename_then_save)
+    analytics.rebuild()
+
+    assert db[db_utils.CLAIMS_COLLECTION].count_documents({}) == 3
+    totals = db[ROLLUPS_COLLECTION].find_one({'_id': ALL_TIME})
+    assert totals['total'] == 3
+    assert totals['verdicts'] == {'TRUE': 1, 'FALSE': 1, 'MISLEADING': 1}
@@ -0,0 +1,107 @@
+import threading
+
+import batch_runner
+import nlp_processor
+from batch_runner import BatchRunner
+from verdict_cache import VerdictCache
+
+
+def _runner(prefetch_calls, prefetch_size=2):
+    seen = []
+    lock = threading.Lock()
+
+    def process(raw_input, force_refresh=False):
+        with lock:
+            seen.append(raw_input)
+        return {"llm_judgment": "Supported", "input": raw_input}
+
+    runner = BatchRunner(process, worker_threads=4, prefetch_fn=prefetch_calls.append, prefetch_size=prefetch_size)
+    return runner, seen
+
+
+def test_duplicates_run_once_and_every_position_gets_a_record():
+    runner, seen = _runner([])
+    inputs = ["Vitamin C cures colds", "vitamin c  cures colds", "https://example.com/a", "Garlic lowers blood pressure"]
+    records = sorted(runner.iter_results(inputs), key=lambda record: record["index"])
+    runner.shutdown()
+    assert [record["index"] for record in records] == [0, 1, 2, 3]
+    assert records[0]["result"] == records[1]["result"]
+    assert len(seen) == 3
+
+
+def test_text_claims_are_prefetched_a_window_at_a_time():
+    calls = []
+    runner, _ = _runner(calls, prefetch_size=2)
+    inputs = ["claim one", "https://example.com/a", "claim two", "claim three", "claim four"]
+    list(runner.iter_results(inputs, max_in_flight=1))
+    runner.shutdown()
+    assert calls == [["claim one"], ["claim two", "claim three"], ["claim four"]]
+
+
+def test_prefetch_runs_off_the_caller_thread_and_skips_cached_claims(monkeypatch):
+    cache = VerdictCache(max_entries=10, ttl_seconds=60, persistent=False)
+    cache.put(VerdictCache.key_for("cached claim"), {"llm_judgment": "Supported"})
+    monkeypatch.setattr(batch_runner, 'verdict_cache', cache)
+    calls = []
+
+    def prefetch(texts):
+        calls.append((threading.current_thread().name, list(texts)))
+
+    runner = BatchRunner(lambda raw_input, force_refresh=False: {}, worker_threads=2, prefetch_fn=prefetch)
+    list(runner.iter_results(["cached claim", "new claim"]))
+    list(runner.iter_results(["cached claim"], force_refresh=True))
+    runner.shutdown()
+    assert [texts for _, texts in calls] == [["new claim"], ["cached claim"]]
+    assert all(name.startswith("batch-claim") for name, _ in calls)
+
+
+def test_forced_refresh_does_not_join_a_normal_run():
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def process(raw_input, force_refresh=False):
+        runs.append(force_refresh)
+        if not force_refresh:
+            started.set()
+            release.wait(5)
+        return {"force_refresh": force_refresh}
+
+    runner = BatchRunner(process, worker_threads=4)
+    normal = runner.iter_results(["Vitamin C cures colds"])
+    normal_thread = threading.Thread(target=lambda: list(normal))
+    normal_thread.start()
+    assert started.wait(5)
+    forced = list(runner.iter_results(["vitamin c cures colds"], force_refresh=True))
+    release.set()
+    normal_thread.join()
+    runner.shutdown()
+    assert forced[0]["result"] == {"force_refresh": True}
+    assert sorted(runs) == [False, True]
+
+
+def test_failed_claims_are_reported_per_input():
+    def process(raw_input, force_refresh=False):
+        raise RuntimeError("boom")
+
+    runner = BatchRunner(process, worker_threads=2)
+    records = list(runner.iter_results(["a claim"]))
+    runner.shutdown()
+    assert records == [{"index": 0, "input": "a claim", "error": "boom"}]
+
+
+def test_prefetched_terms_are_used_once(monkeypatch):
+    batches = []
+
+    def fake_batch(texts, n_process=1, batch_size=64):
+        batches.append(list(texts))
+        return [[f"terms:{text}"] for text in texts]
+
+    monkeypatch.setattr(nlp_processor, 'extract_key_medical_terms_batch', fake_batch)
+    monkeypatch.setattr(nlp_processor, '_prefetched_terms', type(nlp_processor._prefetched_terms)())
+    nlp_processor.prefetch_key_medical_terms(["a", "b", "a"])
+    assert batches == [["a", "b"]]
+    assert nlp_processor.extract_key_medical_terms("a") == ["terms:a"]
+    assert batches == [["a", "b"]]
+    # Consumed: a second verification of the same text runs NER again
+    assert nlp_processor.extract_key_medical_terms("a") == ["terms:a"]
+    assert batches == [["a", "b"], ["a"]]
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import time
+
+from content_cache import ContentCache
+
+
+def _cache(tmp_path, **kwargs):
+    return ContentCache(directory=str(tmp_path / 'cache'), **kwargs)
+
+
+def test_round_trip_and_validators(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("https://example.com/a", "Article text", etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    entry = cache.get("https://example.com/a")
+    assert entry.text == "Article text"
+    assert entry.is_fresh()
+    assert entry.conditional_headers() == {'If-None-Match': '"v1"', 'If-Modified-Since': "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert cache.get("https://example.com/missing") is None
+
+
+def test_index_uses_wal(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("https://example.com/a", "text")
+    assert cache._connection().execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+
+def test_stale_entries_and_archive_snapshots(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("https://example.com/a", "text")
+    cache.put("https://web.archive.org/web/20200101000000/https://example.com/", "snapshot")
+    entry = cache.get("https://example.com/a")
+    entry.stored_at = time.time() - 10_000
+    assert not entry.is_fresh()
+    cache.refresh(entry)
+    assert cache.get("https://example.com/a").is_fresh()
+    snapshot = cache.get("https://web.archive.org/web/20200101000000/https://example.com/")
+    snapshot.stored_at = 0
+    assert snapshot.is_fresh()
+
+
+def test_lru_eviction_keeps_the_cache_under_max_bytes(tmp_path):
+    cache = _cache(tmp_path, max_bytes=250)
+    for i in range(3):
+        cache.put(f"https://example.com/{i}", os.urandom(60).hex())
+        time.sleep(0.01)
+    assert cache.total_bytes() <= 250
+    assert cache.get("https://example.com/0") is None
+    assert cache.get("https://example.com/2") is not None
+
+
+def test_corrupt_body_is_dropped(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("https://example.com/a", "text")
+    key = cache.key_for("https://example.com/a")
+    with open(cache._path(key, cache.codec), 'wb') as f:
+        f.write(b"not compressed")
+    assert cache.get("https://example.com/a") is None
+    assert cache._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 0
+
+
+def test_locked_database_is_a_miss_not_a_deletion(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("https://example.com/a", "text")
+
+    class LockedConnection:
+        def execute(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+
+    real = cache._conn
+    cache._conn = LockedConnection()
+    assert cache.get("https://example.com/a") is None
+    cache._conn = real
+    assert cache.get("https://example.com/a").text == "text"
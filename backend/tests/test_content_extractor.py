@@ -0,0 +1,84 @@
+import glob
+import os
+
+import pytest
+
+from conftest import BACKEND_DIR
+from content_extractor import EXTRACTORS, LxmlStreamingExtractor, SoupExtractor, StreamingExtractor, resolve_encoding
+
+FIXTURES = sorted(glob.glob(os.path.join(BACKEND_DIR, 'benchmarks', 'fixtures', 'html', '*.html')))
+A, B, C, D = ("Alpha " * 12).strip(), ("Bravo " * 12).strip(), ("Charlie " * 12).strip(), ("Delta " * 12).strip()
+
+
+def _extractors():
+    names = [StreamingExtractor.name]
+    for module, name in (('lxml', LxmlStreamingExtractor.name), ('bs4', SoupExtractor.name)):
+        try:
+            __import__(module)
+            names.append(name)
+        except ImportError:
+            pass
+    return [EXTRACTORS[name]() for name in names]
+
+
+def _chunks(html: bytes, size: int = 97):
+    return (html[i:i + size] for i in range(0, len(html), size))
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+def test_streaming_extractors_agree_on_fixtures(path):
+    html = open(path, 'rb').read()
+    text = StreamingExtractor().extract(html)
+    assert text
+    assert StreamingExtractor().extract(_chunks(html)) == text
+    if LxmlStreamingExtractor.name in [e.name for e in _extractors()]:
+        assert LxmlStreamingExtractor().extract(_chunks(html)) == text
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+def test_paragraphs_match_beautifulsoup(path):
+    bs4 = pytest.importorskip('bs4')
+    html = open(path, 'rb').read()
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    paragraphs = [tag.get_text(separator=' ', strip=True) for tag in soup.find_all(['p', 'li'])]
+    paragraphs = [" ".join(text.split()) for text in paragraphs if len(text) > 50]
+    assert paragraphs
+    for extractor in _extractors():
+        text = extractor.extract(html)
+        # Every paragraph BeautifulSoup finds is there, in page order
+        positions = [text.find(paragraph) for paragraph in paragraphs]
+        assert -1 not in positions, extractor.name
+        if extractor.name != SoupExtractor.name:
+            assert positions == sorted(positions), extractor.name
+
+
+@pytest.mark.parametrize("extractor", _extractors(), ids=lambda e: e.name)
+@pytest.mark.parametrize("html", [
+    # Unclosed <li>s end with their list, before the paragraph after it
+    f"<ul><li>{A}<li>{B}</ul><p>{C}",
+    f"<ol><li>{A}</li><li>{B}</li></ol><p>{C}</p>",
+])
+def test_list_items_keep_page_order(extractor, html):
+    text = extractor.extract(html)
+    if extractor.name == SoupExtractor.name:
+        # The tree walk repeats nested items but keeps every block
+        assert all(block in text for block in (A, B, C))
+    else:
+        assert text == f"{A} {B} {C}"
+
+
+def test_nested_list_items_are_not_cut_by_inner_items():
+    text = StreamingExtractor().extract(f"<ul><li>{A}<ul><li>{B}<li>{C}</ul>{D}</ul>")
+    assert text == f"{B} {C} {A} {D}"
+
+
+@pytest.mark.parametrize("extractor", _extractors(), ids=lambda e: e.name)
+def test_unknown_charset_falls_back_to_the_page_encoding(extractor):
+    html = f"<html><head><meta charset='utf-8'></head><body><p>Café {A}</p></body></html>".encode('utf-8')
+    assert extractor.extract(html, encoding='x-bogus').startswith("Café Alpha")
+
+
+def test_resolve_encoding():
+    assert resolve_encoding('ISO-8859-1', b'') == 'iso8859-1'
+    assert resolve_encoding('x-bogus', b"<meta charset='windows-1252'>") == 'cp1252'
+    assert resolve_encoding(None, b'<p>') == 'utf-8'
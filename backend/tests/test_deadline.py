@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from deadline import (REQUEST_DEADLINE_MAX_SECONDS, STAGE_BUDGET_FRACTIONS, current_deadline,
+                      mark_timed_out, parse_deadline_header, request_deadline, should_run, stage_timeout)
+
+
+def test_no_deadline_outside_a_request():
+    assert current_deadline() is None
+    assert should_run('verdict_llm')
+    assert stage_timeout('scrape', 10.0) == 10.0
+
+
+def test_stage_timeout_is_capped_by_its_share_of_the_budget():
+    with request_deadline(10.0):
+        assert stage_timeout('scrape', 30.0) == pytest.approx(10.0 * STAGE_BUDGET_FRACTIONS['scrape'], abs=0.05)
+        assert stage_timeout('scrape', 1.0) == 1.0
+        assert stage_timeout('unlisted', None) == pytest.approx(10.0, abs=0.05)
+    assert current_deadline() is None
+
+
+def test_stages_are_skipped_when_too_little_is_left():
+    with request_deadline(1.0) as deadline:
+        assert should_run('ner')
+        assert not should_run('verdict_llm')
+        mark_timed_out('scrape')
+        assert not should_run('verdict_llm')
+    assert deadline.skipped == ['verdict_llm', 'scrape']
+
+
+def test_expiry(monkeypatch):
+    with request_deadline(2.0) as deadline:
+        now = time.monotonic()
+        monkeypatch.setattr(time, 'monotonic', lambda: now + 3)
+        assert deadline.expired()
+        assert deadline.remaining() == 0.0
+
+
+def test_deadline_reaches_threads_started_with_to_thread():
+    async def run():
+        with request_deadline(5.0) as deadline:
+            seen = await asyncio.to_thread(current_deadline)
+            return seen is deadline
+
+    assert asyncio.run(run())
+
+
+@pytest.mark.parametrize("value, expected", [(None, None), ("", None), ("1500", 1.5),
+                                             ("999999999", REQUEST_DEADLINE_MAX_SECONDS)])
+def test_parse_deadline_header(value, expected):
+    assert parse_deadline_header(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0", "-5", "abc", "nan", "inf"])
+def test_parse_deadline_header_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        parse_deadline_header(value)
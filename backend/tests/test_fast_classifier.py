@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import fast_classifier
+from fast_classifier import FastClassifier, HashingEmbedder
+
+
+def test_embeddings_are_stable_and_normalized():
+    embedder = HashingEmbedder(256)
+    vector = embedder.embed("Vitamin C cures the common cold")
+    assert vector.shape == (256,)
+    assert np.linalg.norm(vector) == pytest.approx(1.0, abs=1e-5)
+    # crc32 features: identical across processes and restarts, and blind to case and spacing
+    assert np.array_equal(vector, HashingEmbedder(256).embed("  vitamin c CURES the common cold "))
+    assert not np.any(embedder.embed("the of and"))
+
+
+def test_fit_separates_toy_verdicts(tmp_path):
+    texts = [f"garlic cures {disease}" for disease in ("cancer", "flu", "diabetes", "asthma")] + \
+            [f"exercise lowers {risk} risk" for risk in ("stroke", "heart attack", "obesity", "diabetes")]
+    labels = ["Contradicted"] * 4 + ["Supported"] * 4
+    model = FastClassifier.fit(texts, labels, [10] * 4 + [90] * 4, dim=512, epochs=200)
+    assert model.predict("garlic cures measles")[0] == "Contradicted"
+    assert model.predict("exercise lowers dementia risk")[0] == "Supported"
+    assert model.label_scores == {"Contradicted": 10, "Supported": 90}
+
+    path = str(tmp_path / 'model.npz')
+    model.threshold = 0.8
+    model.save(path)
+    loaded = FastClassifier.load(path)
+    assert loaded.threshold == 0.8
+    assert loaded.predict("garlic cures measles") == pytest.approx(model.predict("garlic cures measles"))
+
+
+def test_polarity_flipped_claim_does_not_get_a_confident_verdict(monkeypatch):
+    texts = [f"smoking increases {disease} risk" for disease in ("lung cancer", "stroke", "heart disease", "copd")] + \
+            [f"garlic cures {disease}" for disease in ("cancer", "flu", "diabetes", "asthma")]
+    labels = ["Supported"] * 4 + ["Contradicted"] * 4
+    model = FastClassifier.fit(texts, labels, [90] * 4 + [10] * 4, dim=512, epochs=200)
+    model.threshold = 0.6
+    # The hashed features cannot tell the two apart: the model alone is confident about both
+    for claim in ("smoking increases lung cancer risk", "smoking decreases lung cancer risk"):
+        verdict, probability = model.predict(claim)
+        assert verdict == "Supported" and probability >= model.threshold
+
+    monkeypatch.setattr(fast_classifier, 'FAST_CLASSIFIER_ENABLED', True)
+    monkeypatch.setattr(fast_classifier.registry, 'get', lambda name: model)
+    assert fast_classifier.classify("smoking decreases lung cancer risk")[2] is False
+    assert fast_classifier.classify("garlic doesn’t cure cancer")[2] is False
+    verdict, _, confident = fast_classifier.classify("garlic cures measles")
+    assert verdict == "Contradicted" and confident
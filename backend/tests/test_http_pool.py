@@ -0,0 +1,22 @@
+from http_pool import SessionPool
+
+
+def test_one_session_per_host():
+    pool = SessionPool(max_hosts=4)
+    assert pool.session_for("https://Example.com/a") is pool.session_for("https://example.com/b")
+    assert pool.session_for("https://example.com/") is not pool.session_for("https://example.org/")
+
+
+def test_least_recently_used_host_is_evicted_without_closing_it(monkeypatch):
+    pool = SessionPool(max_hosts=2)
+    hot = pool.session_for("https://hot.example/")
+    pool.session_for("https://cold.example/")
+    closed = []
+    monkeypatch.setattr(type(hot), 'close', lambda session: closed.append(session))
+
+    # The hot host is used again, so the cold one is the eviction candidate
+    assert pool.session_for("https://hot.example/x") is hot
+    pool.session_for("https://new.example/")
+    assert pool.session_for("https://hot.example/") is hot
+    assert closed == []
+    assert set(pool._sessions) == {"hot.example", "new.example"}
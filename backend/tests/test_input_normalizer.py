@@ -0,0 +1,20 @@
+from input_normalizer import canonicalize_url, claim_fingerprint, is_url_input, normalize_text_claim
+
+
+def test_input_kind_matches_the_pipeline_check():
+    assert is_url_input("https://example.com/a")
+    assert not is_url_input("vitamin c cures colds")
+    # Leading whitespace makes a text claim for the pipeline, so the fingerprint must agree
+    assert not is_url_input(" http://example.com")
+    assert claim_fingerprint(" http://example.com").startswith("text:")
+    assert claim_fingerprint("http://example.com").startswith("url:")
+
+
+def test_canonicalize_url():
+    assert canonicalize_url("HTTPS://WWW.Example.com:443/a/?utm_medium=x&z=1&a=2#frag") == \
+        "https://example.com/a?a=2&z=1"
+    assert canonicalize_url("http://example.com:8080") == "http://example.com:8080/"
+
+
+def test_normalize_text_claim():
+    assert normalize_text_claim("  Ｖitamin\tC\n cures  ") == "vitamin c cures"
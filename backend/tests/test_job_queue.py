@@ -0,0 +1,112 @@
+import socket
+import time
+
+import pytest
+
+from job_queue import (JOB_PRIORITIES, STATUS_FAILED, STATUS_QUEUED, STATUS_SUCCEEDED, JobQueue, QueueFull,
+                       check_callback_url)
+
+
+def _queue(tmp_path, **kwargs):
+    kwargs.setdefault('retry_base_seconds', 0)
+    return JobQueue(path=str(tmp_path / 'jobs.sqlite'), **kwargs)
+
+
+def test_claims_highest_priority_then_oldest(tmp_path):
+    queue = _queue(tmp_path)
+    low = queue.enqueue({'input': 'low'}, priority=JOB_PRIORITIES['low'])
+    first = queue.enqueue({'input': 'normal 1'})
+    second = queue.enqueue({'input': 'normal 2'})
+    high = queue.enqueue({'input': 'high'}, priority=JOB_PRIORITIES['high'])
+    assert [queue.claim().id for _ in range(4)] == [high, first, second, low]
+    assert queue.claim() is None
+
+
+def test_expired_lease_is_claimed_again_and_old_owner_is_fenced(tmp_path):
+    queue = _queue(tmp_path, visibility_timeout=0.05)
+    job_id = queue.enqueue({'input': 'claim'})
+    stale = queue.claim()
+    assert queue.claim() is None
+    time.sleep(0.1)
+    fresh = queue.claim()
+    assert fresh.id == job_id and fresh.attempts == 2
+    assert not queue.extend_lease(stale)
+    assert not queue.complete(stale, {'verdict': 'stale'})
+    assert queue.fail(stale, "stale worker") is None
+    assert queue.complete(fresh, {'verdict': 'ok'})
+    job = queue.get(job_id)
+    assert job['status'] == STATUS_SUCCEEDED and job['result'] == {'verdict': 'ok'}
+
+
+def test_lease_expiring_on_final_attempt_fails_job(tmp_path):
+    queue = _queue(tmp_path, visibility_timeout=0.05, max_attempts=1)
+    job_id = queue.enqueue({'input': 'claim'})
+    queue.claim()
+    time.sleep(0.1)
+    assert queue.claim() is None
+    assert queue.get(job_id)['status'] == STATUS_FAILED
+
+
+def test_fail_retries_with_backoff_then_fails(tmp_path):
+    queue = _queue(tmp_path, max_attempts=2, retry_base_seconds=60)
+    job_id = queue.enqueue({'input': 'claim'})
+    job = queue.claim()
+    assert queue.fail(job, "Gemini timed out") == STATUS_QUEUED
+    # Backing off: not visible yet
+    assert queue.claim() is None
+
+    queue.retry_base_seconds = 0
+    queue._connection().execute("UPDATE jobs SET visible_at = 0 WHERE id = ?", (job_id,))
+    job = queue.claim()
+    assert job.attempts == 2
+    assert queue.fail(job, "Gemini timed out again") == STATUS_FAILED
+    stored = queue.get(job_id)
+    assert stored['status'] == STATUS_FAILED and stored['error'] == "Gemini timed out again"
+    assert queue.claim() is None
+
+
+def test_queue_full_and_purge(tmp_path):
+    queue = _queue(tmp_path, max_pending=2)
+    queue.enqueue({'input': 'a'})
+    queue.enqueue({'input': 'b'})
+    with pytest.raises(QueueFull):
+        queue.enqueue({'input': 'c'})
+
+    job = queue.claim()
+    assert queue.complete(job, {'verdict': 'ok'})
+    assert queue.purge_finished(older_than=3600) == 0
+    assert queue.purge_finished(older_than=-1) == 1
+    assert queue.get(job.id) is None
+    assert queue.metrics()[STATUS_QUEUED] == 1
+
+
+@pytest.mark.parametrize('url', [
+    "http://localhost:8080/hook",
+    "http://127.0.0.1/hook",
+    "http://10.0.0.5/hook",
+    "http://192.168.1.20/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/hook",
+    "http://[::ffff:10.0.0.5]/hook",
+    "ftp://93.184.216.34/hook",
+    "/relative/hook",
+])
+def test_callback_urls_to_internal_addresses_are_rejected(url):
+    with pytest.raises(ValueError):
+        check_callback_url(url, allowed_hosts=[])
+
+
+def test_callback_host_resolving_to_a_private_address_is_rejected(monkeypatch):
+    def resolve(host, port, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.1.2.3', port))]
+
+    monkeypatch.setattr(socket, 'getaddrinfo', resolve)
+    with pytest.raises(ValueError):
+        check_callback_url("https://hooks.example.com/medverify", allowed_hosts=[])
+
+
+def test_public_and_allowlisted_callback_urls_are_accepted():
+    check_callback_url("https://93.184.216.34/hook", allowed_hosts=[])
+    check_callback_url("https://hooks.internal.example/hook", allowed_hosts=['.internal.example'])
+    with pytest.raises(ValueError):
+        check_callback_url("https://93.184.216.34/hook", allowed_hosts=['hooks.example.com'])
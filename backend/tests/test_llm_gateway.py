@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from deadline import DeadlineExceeded
+from llm_gateway import (LLMGateway, LocalRateLimiter, PRIORITY_INTERACTIVE, SharedRateLimiter, TokenBucket,
+                         estimate_tokens, is_retryable_error)
+
+
+def test_token_bucket_refills_at_its_per_minute_rate():
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60, now=bucket.updated) == 0.0
+    bucket.consume(60)
+    assert bucket.wait_time(1, now=bucket.updated) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now=bucket.updated + 1.0) == 0.0
+
+
+def test_local_limiters_do_not_share_a_budget():
+    first, second = LocalRateLimiter(2, 10_000), LocalRateLimiter(2, 10_000)
+    assert first.reserve(10) == 0.0 and first.reserve(10) == 0.0
+    assert first.reserve(10) > 0
+    assert second.reserve(10) == 0.0
+
+
+def test_processes_share_one_budget(tmp_path):
+    path = str(tmp_path / 'buckets.sqlite')
+    # Two limiters on one file stand for two worker processes
+    first, second = SharedRateLimiter(2, 10_000, path), SharedRateLimiter(2, 10_000, path)
+    assert first.reserve(10) == 0.0
+    assert second.reserve(10) == 0.0
+    assert first.reserve(10) == pytest.approx(30.0, rel=0.05)
+    assert second.reserve(10) == pytest.approx(30.0, rel=0.05)
+
+
+def test_token_usage_is_reconciled_across_processes(tmp_path):
+    path = str(tmp_path / 'buckets.sqlite')
+    first, second = SharedRateLimiter(100, 1_000, path), SharedRateLimiter(100, 1_000, path)
+    assert first.reserve(600) == 0.0
+    # The call used less than estimated: the refund is visible to the other process
+    first.adjust_tokens(-300)
+    assert second.reserve(700) == 0.0
+    assert second.reserve(100) > 0
+
+
+def test_threads_reserve_on_their_own_connections(tmp_path):
+    limiter = SharedRateLimiter(1_000, 1_000_000, str(tmp_path / 'buckets.sqlite'))
+    delays = []
+    threads = [threading.Thread(target=lambda: delays.extend(limiter.reserve(10) for _ in range(20)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert delays == [0.0] * 160
+    request_tokens = limiter._connection().execute("SELECT tokens FROM buckets WHERE name = 'requests'").fetchone()[0]
+    assert request_tokens == pytest.approx(1_000 - 160, abs=1)
+
+
+def test_unusable_file_falls_back_to_the_process_budget(tmp_path):
+    blocker = tmp_path / 'not-a-dir'
+    blocker.write_text('')
+    limiter = SharedRateLimiter(1, 10_000, str(blocker / 'buckets.sqlite'))
+    assert limiter.reserve(10) == 0.0
+    assert limiter.reserve(10) > 0
+
+
+def test_slow_reservation_does_not_block_other_callers():
+    class StuckLimiter:
+        """Stands for a shared limiter waiting on another process's file lock."""
+
+        def __init__(self):
+            self.entered, self.release, self.adjusted = threading.Event(), threading.Event(), []
+
+        def reserve(self, tokens):
+            self.entered.set()
+            self.release.wait(5)
+            return 0.0
+
+        def adjust_tokens(self, amount):
+            self.adjusted.append(amount)
+
+    gateway = LLMGateway(shared_rate_limit=False)
+    gateway._limiter = limiter = StuckLimiter()
+    head = threading.Thread(target=gateway._acquire, args=(PRIORITY_INTERACTIVE, 10))
+    head.start()
+    assert limiter.entered.wait(5)
+
+    started = time.monotonic()
+    usage = type('Usage', (), {'total_token_count': 25})()
+    gateway._reconcile_tokens(10, type('Response', (), {'usage_metadata': usage})())
+    with pytest.raises(DeadlineExceeded):
+        gateway._acquire(PRIORITY_INTERACTIVE, 10, deadline=time.monotonic() + 0.2)
+    assert time.monotonic() - started < 2
+    assert limiter.adjusted == [15]
+
+    limiter.release.set()
+    head.join(5)
+    assert not head.is_alive() and gateway._waiters == []
+
+
+def test_estimate_and_retryable_errors():
+    assert estimate_tokens("x" * 400) == 100 + estimate_tokens("")
+    assert is_retryable_error(type('E', (Exception,), {'code': 429})())
+    assert not is_retryable_error(type('E', (Exception,), {'code': 400})())
+    assert is_retryable_error(ConnectionError())
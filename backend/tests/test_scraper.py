@@ -0,0 +1,92 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import scraper
+from offline_fakes import FakeResponse
+
+
+class _Web:
+    def __init__(self, body: bytes, headers=None):
+        self.body = body
+        self.headers = headers
+
+    def get(self, url, **kwargs):
+        return FakeResponse(url, self.body, headers=self.headers)
+
+
+@pytest.fixture
+def quiet_proxy_pool(monkeypatch):
+    monkeypatch.setattr(scraper.proxy_pool, 'report_success', lambda *args: None)
+    monkeypatch.setattr(scraper.proxy_pool, 'report_failure', lambda *args: None)
+
+
+@pytest.fixture
+def web(monkeypatch, quiet_proxy_pool):
+    def install(body: bytes, headers=None):
+        monkeypatch.setattr(scraper, 'http_pool', _Web(body, headers))
+    return install
+
+
+@pytest.fixture
+def stalling_server():
+    """A local server that sends headers and the start of a body, then stops sending."""
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(5)
+    stop = threading.Event()
+
+    def serve():
+        connection, _ = server.accept()
+        connection.recv(65536)
+        connection.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: 100000\r\n\r\n<p>Start")
+        stop.wait(30)
+        connection.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield f"http://127.0.0.1:{server.getsockname()[1]}/article"
+    stop.set()
+    server.close()
+
+
+def test_page_without_text_is_a_failed_attempt(web):
+    web(b"<html><body><script>app()</script></body></html>")
+    with pytest.raises(scraper.EmptyContent):
+        scraper._attempt_fetch("https://example.com/app", None, timeout=1)
+
+
+def test_unknown_declared_charset_still_yields_text(web):
+    web("<p>Café culture and coffee consumption were studied across twelve cities.</p>".encode('utf-8'),
+        headers={'Content-Type': 'text/html; charset=x-bogus'})
+    outcome = scraper._attempt_fetch("https://example.com/a", None, timeout=1)
+    assert outcome.text.startswith("Café culture")
+
+
+def test_cancel_interrupts_a_losing_attempt_blocked_on_a_read(stalling_server, quiet_proxy_pool):
+    canceller = scraper.AttemptCanceller()
+    errors = []
+
+    def attempt():
+        try:
+            scraper._attempt_fetch(stalling_server, None, timeout=(3, 20), canceller=canceller)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=attempt)
+    thread.start()
+    time.sleep(0.5)
+    started = time.monotonic()
+    canceller.cancel()
+    thread.join(5)
+    assert not thread.is_alive() and time.monotonic() - started < 2
+    assert isinstance(errors[0], scraper.AttemptCancelled)
+
+
+def test_response_arriving_after_the_win_is_dropped():
+    canceller = scraper.AttemptCanceller()
+    canceller.cancel()
+    response = FakeResponse("https://example.com/a", b"<p>late</p>")
+    with pytest.raises(scraper.AttemptCancelled):
+        canceller.track(response)
@@ -0,0 +1,45 @@
+import semantic_index
+from semantic_index import SemanticIndex
+
+
+def _index(tmp_path, *claims):
+    index = SemanticIndex(directory=str(tmp_path / 'index'))
+    for number, claim in enumerate(claims):
+        index.add(f"text:{number}", claim)
+    return index
+
+
+def test_disabled_by_default():
+    assert semantic_index.SEMANTIC_CACHE_ENABLED is False
+    assert semantic_index.semantic_index is None
+
+
+def test_rewording_matches_and_survives_a_reload(tmp_path):
+    index = _index(tmp_path, "smoking increases lung cancer risk", "garlic cures the flu")
+    fingerprint, similarity = index.search("Smoking increases the risk of lung cancer", threshold=0.9)
+    assert fingerprint == "text:0" and similarity >= 0.9
+    assert not index.add("text:0", "smoking increases lung cancer risk")
+
+    reloaded = SemanticIndex(directory=str(tmp_path / 'index'))
+    assert len(reloaded) == 2
+    assert reloaded.search("Smoking increases the risk of lung cancer", threshold=0.9)[0] == "text:0"
+
+
+def test_polarity_flipped_claims_never_match(tmp_path):
+    index = _index(tmp_path, "smoking increases lung cancer risk", "vitamin c cures the common cold",
+                   "lemon water cures cancer")
+    # Even far below the default threshold, where the vectors alone would match
+    assert index.search("smoking decreases lung cancer risk", threshold=0.5) is None
+    assert index.search("vitamin c does not cure the common cold", threshold=0.5) is None
+    assert index.search("lemon water causes cancer", threshold=0.5) is None
+    assert index.search("smoking decreases lung cancer risk") is None
+
+
+def test_index_built_without_polarity_keys_is_rebuilt(tmp_path):
+    directory = tmp_path / 'index'
+    directory.mkdir()
+    (directory / 'state.json').write_text('{"embedder": "hashing:512", "rows": 0, "last_synced": null}')
+    index = SemanticIndex(directory=str(directory))
+    assert len(index) == 0
+    assert index.add("text:0", "garlic cures the flu")
+    assert index.search("garlic cures the flu")[0] == "text:0"
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from verdict_cache import VerdictCache, parse_force_refresh
+
+
+def test_equivalent_inputs_share_a_key():
+    assert VerdictCache.key_for("  Vitamin C   CURES colds ") == VerdictCache.key_for("vitamin c cures colds")
+    assert VerdictCache.key_for("https://www.example.com/a/?utm_source=x&b=2") == \
+        VerdictCache.key_for("https://example.com/a?b=2")
+    assert VerdictCache.key_for("https://example.com/a") != VerdictCache.key_for("https://example.com/b")
+
+
+def test_get_returns_a_copy():
+    cache = VerdictCache(max_entries=10, ttl_seconds=60, persistent=False)
+    cache.put("k", {"llm_judgment": "Supported", "extracted_terms": ["x"]})
+    first = cache.get("k")
+    first["extracted_terms"].append("y")
+    assert cache.get("k") == {"llm_judgment": "Supported", "extracted_terms": ["x"]}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = VerdictCache(max_entries=2, ttl_seconds=60, persistent=False)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    assert cache.get("a") is not None
+    cache.put("c", {"n": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1}
+    assert len(cache) == 2
+
+
+def test_entries_expire(monkeypatch):
+    cache = VerdictCache(max_entries=10, ttl_seconds=5, persistent=False)
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now)
+    cache.put("k", {"n": 1})
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 6)
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = VerdictCache(max_entries=0, ttl_seconds=60, persistent=False)
+    cache.put("k", {"n": 1})
+    assert cache.get("k") is None
+
+
+def test_force_refresh_accepts_only_json_booleans():
+    assert parse_force_refresh(None) is False
+    assert parse_force_refresh(True) is True
+    assert parse_force_refresh(False) is False
+    for value in ("false", "true", 0, 1, "", []):
+        with pytest.raises(ValueError):
+            parse_force_refresh(value)
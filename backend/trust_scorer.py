@@ -0,0 +1,266 @@
+import ipaddress
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# --- Trust Scorer Configuration (read from .env) ---
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+TRUST_DOMAINS_FILE = os.environ.get('TRUST_DOMAINS_FILE', os.path.join(BACKEND_DIR, 'data', 'domain_trust.tsv'))
+# Optional Mozilla public_suffix_list.dat; a built-in list of common multi-label suffixes is used without it
+TRUST_PUBLIC_SUFFIX_FILE = os.environ.get('TRUST_PUBLIC_SUFFIX_FILE', '')
+# How often lookups check the rules file's mtime (0 disables hot reload)
+TRUST_RELOAD_SECONDS = float(os.environ.get('TRUST_RELOAD_SECONDS', '30'))
+TRUST_CACHE_MAX_ENTRIES = int(os.environ.get('TRUST_CACHE_MAX_ENTRIES', '50000'))
+
+DEFAULT_TRUST_SCORE = 0.5
+KEYWORD_PREFIX = 'keyword:'
+
+# Multi-label public suffixes seen in medical/news links; single-label TLDs are implicit
+BUILTIN_PUBLIC_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'nhs.uk', 'ltd.uk', 'me.uk', 'net.uk',
+    'com.au', 'net.au', 'org.au', 'edu.au', 'gov.au',
+    'co.in', 'net.in', 'org.in', 'gov.in', 'ac.in', 'nic.in', 'res.in',
+    'co.nz', 'org.nz', 'govt.nz', 'ac.nz', 'co.za', 'org.za', 'gov.za', 'ac.za',
+    'com.br', 'gov.br', 'org.br', 'com.mx', 'gob.mx', 'com.sg', 'gov.sg', 'edu.sg',
+    'co.jp', 'ac.jp', 'go.jp', 'or.jp', 'com.cn', 'gov.cn', 'edu.cn', 'com.hk', 'gov.hk',
+    'gc.ca', 'europa.eu', 'blogspot.com', 'wordpress.com', 'github.io', 'herokuapp.com',
+}
+
+
+class PublicSuffixList:
+    """
+    Minimal implementation of the Public Suffix List algorithm (normal, wildcard and exception
+    rules) used to find a host's registrable domain, e.g. 'news.bbc.co.uk' -> 'bbc.co.uk'.
+    """
+
+    def __init__(self, rules: Optional[List[str]] = None):
+        self._rules = set()
+        self._wildcards = set()
+        self._exceptions = set()
+        for rule in rules if rules is not None else BUILTIN_PUBLIC_SUFFIXES:
+            self._add(rule)
+
+    @classmethod
+    def from_file(cls, path: str) -> "PublicSuffixList":
+        with open(path, encoding='utf-8') as f:
+            rules = [line.split()[0] for line in f if line.strip() and not line.startswith('//')]
+        return cls(rules)
+
+    def _add(self, rule: str) -> None:
+        rule = rule.strip().lower()
+        if rule.startswith('!'):
+            self._exceptions.add(rule[1:])
+        elif rule.startswith('*.'):
+            self._wildcards.add(rule[2:])
+        elif rule:
+            self._rules.add(rule)
+
+    def public_suffix(self, host: str) -> str:
+        labels = host.split('.')
+        # Default rule '*': the last label is a public suffix
+        suffix = labels[-1]
+        for start in range(len(labels) - 1, -1, -1):
+            candidate = '.'.join(labels[start:])
+            if candidate in self._exceptions:
+                return '.'.join(labels[start + 1:])
+            if candidate in self._rules:
+                suffix = candidate
+            elif start > 0 and candidate in self._wildcards:
+                suffix = '.'.join(labels[start - 1:])
+        return suffix
+
+    def registrable_domain(self, host: str) -> Optional[str]:
+        """Public suffix plus one label, or None if host is itself a public suffix."""
+        suffix = self.public_suffix(host)
+        if host == suffix:
+            return None
+        prefix = host[:-(len(suffix) + 1)]
+        return f"{prefix.rsplit('.', 1)[-1]}.{suffix}"
+
+
+def host_from_url(url: str) -> Optional[str]:
+    """
+    Lower-cased, IDNA-encoded host of a URL (or bare host), without port, userinfo or trailing dot.
+    'https://cdc.gov@evil.com/x' yields 'evil.com'. None when no usable host is present.
+    """
+    url = url.strip()
+    if '//' not in url:
+        url = f"//{url}"
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    host = host.rstrip('.').lower()
+    try:
+        host = host.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    return host or None
+
+
+def _is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+class _TrieNode:
+    __slots__ = ('children', 'score')
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.score: Optional[float] = None
+
+
+class DomainTrie:
+    """Rules keyed by reversed labels ('cdc.gov' -> gov -> cdc); a lookup walks at most one node per label."""
+
+    def __init__(self):
+        self._root = _TrieNode()
+        self.size = 0
+
+    def add(self, domain: str, score: float) -> None:
+        node = self._root
+        for label in reversed(domain.split('.')):
+            node = node.children.setdefault(label, _TrieNode())
+        if node.score is None:
+            self.size += 1
+        node.score = score
+
+    def longest_match(self, host: str) -> Optional[float]:
+        """Score of the most specific rule equal to host or to one of its parent domains."""
+        node, best = self._root, None
+        for label in reversed(host.split('.')):
+            node = node.children.get(label)
+            if node is None:
+                break
+            if node.score is not None:
+                best = node.score
+        return best
+
+
+class _RuleSet:
+    def __init__(self, trie: DomainTrie, keywords: List[Tuple[str, float]], mtime: Optional[float]):
+        self.trie = trie
+        self.keywords = keywords
+        self.mtime = mtime
+
+
+def load_rules(path: str) -> _RuleSet:
+    """Parses a domain trust file; malformed lines are logged and skipped."""
+    trie, keywords = DomainTrie(), []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            try:
+                rule, raw_score = line.split()
+                score = float(raw_score)
+                if not 0.0 <= score <= 1.0:
+                    raise ValueError("score outside 0-1")
+            except ValueError as e:
+                logger.warning("%s:%d: skipping malformed trust rule %r (%s)", path, line_number, line, e)
+                continue
+            rule = rule.lower()
+            if rule.startswith(KEYWORD_PREFIX):
+                keywords.append((rule[len(KEYWORD_PREFIX):], score))
+            else:
+                trie.add(host_from_url(rule) or rule.strip('.'), score)
+    return _RuleSet(trie, keywords, os.path.getmtime(path))
+
+
+class TrustScorer:
+    """
+    Data-driven source trust scores (0.0 to 1.0) for URLs.
+
+    Domain rules live in a reversed-label suffix trie, so a lookup costs O(labels in the host)
+    however large the list grows, and only whole labels match: 'cdc.gov.evil.com' and
+    'notpubmed.xyz' match nothing. Keyword rules are tried only when no domain rule matches, against
+    the registrable domain (public-suffix aware). Scores are cached per host; the rules file is
+    re-read when its mtime changes (checked every TRUST_RELOAD_SECONDS), swapping rules atomically.
+    """
+
+    def __init__(self, path: str = TRUST_DOMAINS_FILE, reload_seconds: float = TRUST_RELOAD_SECONDS,
+                 cache_max_entries: int = TRUST_CACHE_MAX_ENTRIES, public_suffixes: Optional[PublicSuffixList] = None):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self.cache_max_entries = cache_max_entries
+        self.public_suffixes = public_suffixes or (
+            PublicSuffixList.from_file(TRUST_PUBLIC_SUFFIX_FILE) if TRUST_PUBLIC_SUFFIX_FILE else PublicSuffixList()
+        )
+        self._lock = threading.Lock()
+        self._rules: Optional[_RuleSet] = None
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._checked_at = 0.0
+
+    # --- Rule loading ---
+    def reload(self) -> bool:
+        """Re-reads the rules file now. Keeps the previous rules if the file cannot be read."""
+        try:
+            rules = load_rules(self.path)
+        except OSError as e:
+            logger.error("Could not load trust rules from %s: %s", self.path, e)
+            if self._rules is None:
+                self._rules = _RuleSet(DomainTrie(), [], None)
+            return False
+        with self._lock:
+            self._rules = rules
+            self._cache.clear()
+        logger.info("Trust rules loaded: %d domains, %d keywords from %s", rules.trie.size, len(rules.keywords), self.path)
+        return True
+
+    def _current_rules(self) -> _RuleSet:
+        if self._rules is None:
+            self.reload()
+        elif self.reload_seconds > 0 and time.monotonic() - self._checked_at >= self.reload_seconds:
+            self._checked_at = time.monotonic()
+            try:
+                changed = os.path.getmtime(self.path) != self._rules.mtime
+            except OSError:
+                changed = False
+            if changed:
+                self.reload()
+        return self._rules
+
+    # --- Scoring ---
+    def score_host(self, host: Optional[str]) -> float:
+        if not host or _is_ip_address(host):
+            return DEFAULT_TRUST_SCORE
+        rules = self._current_rules()
+        with self._lock:
+            cached = self._cache.get(host)
+            if cached is not None:
+                self._cache.move_to_end(host)
+                return cached
+
+        score = rules.trie.longest_match(host)
+        if score is None and rules.keywords:
+            registrable = self.public_suffixes.registrable_domain(host) or host
+            score = next((keyword_score for keyword, keyword_score in rules.keywords if keyword in registrable), None)
+        if score is None:
+            score = DEFAULT_TRUST_SCORE
+
+        with self._lock:
+            if rules is self._rules:
+                self._cache[host] = score
+                while len(self._cache) > self.cache_max_entries:
+                    self._cache.popitem(last=False)
+        return score
+
+    def score_url(self, url: str) -> float:
+        return self.score_host(host_from_url(url))
+
+
+# Shared process-wide scorer used by verifier.get_source_trust_score()
+trust_scorer = TrustScorer()
@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+import copy
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+from input_normalizer import claim_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# --- Cache Configuration (read from .env) ---
+VERDICT_CACHE_MAX_ENTRIES = int(os.environ.get('VERDICT_CACHE_MAX_ENTRIES', '10000'))
+VERDICT_CACHE_TTL_SECONDS = float(os.environ.get('VERDICT_CACHE_TTL_SECONDS', '21600'))
+VERDICT_CACHE_PERSISTENT = os.environ.get('VERDICT_CACHE_PERSISTENT', 'false').lower() in ('1', 'true', 'yes')
+
+
+def parse_force_refresh(value: Any) -> bool:
+    """The "force_refresh" body field: a JSON boolean, absent or null meaning False. Raises ValueError otherwise."""
+    if value is None:
+        return False
+    if not isinstance(value, bool):
+        raise ValueError("'force_refresh' must be a JSON boolean (true or false).")
+    return value
+
+
+class VerdictCache:
+    """
+    Two-tier cache of final process_claim() results keyed by claim fingerprint.
+
+    Tier 1 is an in-process LRU with per-entry TTL. Tier 2 (optional) reads recent results
+    back from the verified_claims_history collection written by db_utils.save_verified_claim().
+    """
+
+    def __init__(self, max_entries: int = VERDICT_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = VERDICT_CACHE_TTL_SECONDS,
+                 persistent: bool = VERDICT_CACHE_PERSISTENT):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(raw_input: str) -> str:
+        return claim_fingerprint(raw_input)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns a copy of the cached result for key, or None on a miss/expiry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    return copy.deepcopy(result)
+                del self._entries[key]
+
+        if not self.persistent:
+            return None
+
+        # Imported lazily so the cache can be used without a configured MongoDB.
+        from db_utils import find_recent_claim
+        stored = find_recent_claim(key, self.ttl_seconds)
+        if stored is None:
+            return None
+
+        cached_at = stored.pop('_cached_at', None)
+        age = (datetime.utcnow() - cached_at).total_seconds() if isinstance(cached_at, datetime) else 0.0
+        self._store(key, stored, max(0.0, self.ttl_seconds - age))
+        return copy.deepcopy(stored)
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        self._store(key, result, self.ttl_seconds)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key: str, result: Dict[str, Any], ttl_seconds: float) -> None:
+        if self.max_entries <= 0 or ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+# Shared process-wide instance used by verifier.process_claim()
+verdict_cache = VerdictCache()
@@ -1,194 +1,287 @@
-import requests
-from bs4 import BeautifulSoup
-from google import genai
 from google.genai import types
 import json
-import re
+import logging
 import os 
-from typing import List
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
 
 # --- Imports are CORRECT for Web Scraping ---
-from proxy_manager import get_random_http_proxy 
-from nlp_processor import extract_key_medical_terms, analyze_text_style 
+# Stage 0 (proxy pool, pooled sessions, hedged attempts, streaming extraction) lives in scraper.py
+from scraper import fetch_url_content, SCRAPE_DEADLINE_SECONDS
+from nlp_processor import extract_key_medical_terms, analyze_text_style, sensationalism_to_penalty, MAX_SEARCH_TERMS
+
+# --- Article inputs: salient-sentence claim extraction (multi-claim verification) ---
+from claim_extractor import CLAIM_EXTRACTION_ENABLED, aggregate_article_score, extract_claims
 
 # --- NEW: Import DB utility for persistence ---
-from db_utils import save_verified_claim 
+from db_utils import save_verified_claim, find_recent_claim 
+
+# --- Verdict cache (exact-match on normalized input) ---
+from verdict_cache import verdict_cache
+from input_normalizer import is_url_input
+
+# --- Semantic near-duplicate index (paraphrased text claims) ---
+from semantic_index import semantic_index, SEMANTIC_MAX_AGE_SECONDS
+
+# --- Async execution: stage graph and non-blocking persistence ---
+from pipeline_engine import PipelineGraph
+from claim_writer import claim_writer, CLAIM_WRITE_MODE
+
+# --- Data-driven domain trust rules (data/domain_trust.tsv) ---
+from trust_scorer import trust_scorer
+
+# --- Local fast-path classifier (confident text claims skip Gemini) ---
+import fast_classifier
+
+# --- Shared LLM gateway (pooled client, rate limiting, retries) ---
+from llm_gateway import LLMGateway, get_gateway, PRIORITY_INTERACTIVE, LLM_TIMEOUT_SECONDS
+
+# --- Request deadline: per-stage budget slices and graceful degradation ---
+from deadline import (DeadlineExceeded, current_deadline, mark_timed_out, request_deadline,
+                      should_run, stage_timeout)
+
+# --- Stage timing spans and Prometheus metrics ---
+from telemetry import observe_request, record_cache, record_fast_path_agreement, span, timed_stage, track_request
+
+logger = logging.getLogger(__name__)
 
 # --- Initialize Global Components ---
-try:
-    # Initialize the LLM client once (required for the global scope)
-    client = genai.Client()
-except Exception as e:
-    print(f"FATAL ERROR: Failed to initialize AI/LLM components: {e}")
+# The pooled genai.Client is built lazily by the gateway on first use and shared by all requests.
+gateway = get_gateway()
 
+# Opt-in "single-shot" mode: one combined LLM call for style + verdict on raw-text claims
+LLM_SINGLE_SHOT = os.environ.get('LLM_SINGLE_SHOT', 'false').lower() in ('1', 'true', 'yes')
 
-# --- Helper Function: Source Trust (Stage 4 - Rule-Based) ---
-def get_source_trust_score(url_domain: str) -> float:
-    """Assigns a quantifiable trust score (0.1 to 0.9) to the source domain."""
-    domain = url_domain.lower()
-    if re.search(r'(nih\.gov|who\.int|cdc\.gov|mayoclinic\.org|pubmed|nejm|\.gov|\.edu)', domain):
-        return 0.9
-    elif re.search(r'(facebook|twitter|instagram|tiktok|blogspot|remedies-today|home-remedies)', domain):
-        return 0.2
-    return 0.5
+# Parallel per-claim verdict calls for articles (the gateway still enforces rate limits)
+CLAIM_VERIFY_WORKERS = int(os.environ.get('CLAIM_VERIFY_WORKERS', '16'))
+_claim_executor = ThreadPoolExecutor(max_workers=CLAIM_VERIFY_WORKERS, thread_name_prefix="claim-verify")
 
+# When the deadline cuts off the verdict call, a stored verdict up to this old is served instead
+DEADLINE_FALLBACK_MAX_AGE_SECONDS = float(os.environ.get('DEADLINE_FALLBACK_MAX_AGE_SECONDS', str(30 * 24 * 3600)))
 
-# --- Stage 0: Input Pre-processing (fetch_url_content with Retry) ---
-def fetch_url_content(url):
+
+# --- Helper Function: Source Trust (Stage 4 - Rule-Based) ---
+@timed_stage("source_trust")
+def get_source_trust_score(url: str) -> float:
     """
-    Fetches and cleans the main text from a URL using proxy rotation and retry attempts.
+    Assigns a quantifiable trust score (0.0 to 1.0) to the source of a URL (or bare domain).
+    Rules come from data/domain_trust.tsv via the shared TrustScorer (suffix-trie lookup, hot reload).
     """
-    
-    HEADERS = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit=537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Referer': 'https://www.google.com/', 
+    return trust_scorer.score_url(url)
+
+
+# --- Stage 2 & 3: HYBRID RAG & LLM JUDGMENT CORE (Updated Signature) ---
+
+VERDICT_SYSTEM_INSTRUCTION = (
+    "You are an expert medical misinformation classifier. Your task is to analyze the user's claim against "
+    "the current scientific consensus using Google Search to look up the provided query. You MUST use a precise query. "
+    "DO NOT use your internal knowledge. You MUST respond with a JSON object that adheres strictly to the provided schema. "
+    "Classify the claim based ONLY on the search results."
+)
+
+
+def _build_search_query(claim: str, search_terms: List[str]) -> str:
+    if search_terms:
+        return f"Verify claim: {claim}. Focus search terms: {' AND '.join(search_terms)}"
+    return f"Verify claim: {claim}."
+
+
+def _verdict_schema_properties() -> dict:
+    return {
+        "verdict": types.Schema(type=types.Type.STRING, description="The classification: 'Contradicted', 'Supported', or 'Unsupported/Neutral'."),
+        "trusted_source": types.Schema(type=types.Type.STRING, description="The name of the most credible source found (e.g., 'NIH', 'WHO')."),
+        "reasoning": types.Schema(type=types.Type.STRING, description="A concise, one-sentence summary of the evidence found."),
+        "score_base": types.Schema(type=types.Type.INTEGER, description="A base score from 10 (False) to 90 (True) before Source Trust is applied.")
     }
-    
-    MAX_ATTEMPTS = 5
-    
-    for attempt in range(MAX_ATTEMPTS):
-        proxy_address = get_random_http_proxy()
-        PROXIES = { "http": proxy_address, "https": proxy_address } if proxy_address else {}
 
-        try:
-            print(f"Attempt {attempt + 1}: Connecting via {proxy_address if proxy_address else 'DIRECT'}...")
-            
-            response = requests.get(url, headers=HEADERS, proxies=PROXIES, timeout=15)
-            response.raise_for_status() 
 
-            # SUCCESS: HTML Parsing and Content Isolation
-            soup = BeautifulSoup(response.content, 'html.parser')
-            main_content = []
-            
-            for tag in soup.find_all(['p', 'article', 'main', 'li']): 
-                text = tag.get_text(separator=' ', strip=True)
-                if len(text) > 50: 
-                    main_content.append(text)
-            
-            return " ".join(main_content) if main_content else soup.get_text(separator=' ', strip=True)
-        
-        except Exception as e:
-            print(f"Attempt {attempt + 1} Failed. Error: {e}")
-            if attempt == MAX_ATTEMPTS - 1:
-                print("CRITICAL: All proxy attempts exhausted.")
-                return f"Web Scrape failed: All attempts exhausted. Final Error: {e}"
-            continue 
+DEADLINE_VERDICT = {
+    "verdict": "ERROR",
+    "trusted_source": "Deadline Exceeded",
+    "reasoning": "The request's time budget ran out before a verdict could be obtained.",
+    "score_base": 0,
+    "sensationalism_score": 0,
+}
+
 
-    return "Web Scrape failed: Unknown error after retries."
+def _api_failure_verdict(error: Exception) -> dict:
+    return {
+        "verdict": "ERROR", 
+        "trusted_source": "API Failure", 
+        "reasoning": f"Gemini API call failed: {error}", 
+        "score_base": 0
+    }
 
 
-# --- Stage 2 & 3: HYBRID RAG & LLM JUDGMENT CORE (Updated Signature) ---
-def get_grounded_verdict(claim: str, search_terms: List[str], client: genai.Client) -> dict:
+@timed_stage("verdict_llm")
+def get_grounded_verdict(claim: str, search_terms: List[str], gateway: LLMGateway,
+                         priority: int = PRIORITY_INTERACTIVE) -> dict:
     """Executes the LLM judgment, using NER terms to focus the RAG query."""
     
-    if search_terms:
-        search_query = f"Verify claim: {claim}. Focus search terms: {' AND '.join(search_terms)}"
-    else:
-        search_query = f"Verify claim: {claim}."
+    search_query = _build_search_query(claim, search_terms)
 
     response_schema = types.Schema(
         type=types.Type.OBJECT,
-        properties={
-            "verdict": types.Schema(type=types.Type.STRING, description="The classification: 'Contradicted', 'Supported', or 'Unsupported/Neutral'."),
-            "trusted_source": types.Schema(type=types.Type.STRING, description="The name of the most credible source found (e.g., 'NIH', 'WHO')."),
-            "reasoning": types.Schema(type=types.Type.STRING, description="A concise, one-sentence summary of the evidence found."),
-            "score_base": types.Schema(type=types.Type.INTEGER, description="A base score from 10 (False) to 90 (True) before Source Trust is applied.")
-        },
+        properties=_verdict_schema_properties(),
         required=["verdict", "trusted_source", "reasoning", "score_base"]
     )
     
-    system_instruction = (
-        "You are an expert medical misinformation classifier. Your task is to analyze the user's claim against "
-        "the current scientific consensus using Google Search to look up the provided query. You MUST use a precise query. "
-        "DO NOT use your internal knowledge. You MUST respond with a JSON object that adheres strictly to the provided schema. "
-        "Classify the claim based ONLY on the search results."
-    )
-    
     config = types.GenerateContentConfig(
-        system_instruction=system_instruction,
+        system_instruction=VERDICT_SYSTEM_INSTRUCTION,
         response_mime_type="application/json",
         response_schema=response_schema
     )
     
     try:
-        response = client.models.generate_content(
+        response = gateway.generate_content(
             model='gemini-2.5-flash',
             contents=[search_query], 
-            config=config
+            config=config,
+            priority=priority,
+            timeout=stage_timeout("verdict_llm", LLM_TIMEOUT_SECONDS or None)
         )
         verdict_data = json.loads(response.text)
         return verdict_data
         
     except Exception as e:
-        return {
-            "verdict": "ERROR", 
-            "trusted_source": "API Failure", 
-            "reasoning": f"Gemini API call failed: {e}", 
-            "score_base": 0
-        }
+        if isinstance(e, DeadlineExceeded):
+            mark_timed_out("verdict_llm")
+        return _api_failure_verdict(e)
 
 
-# --- Main Workflow Function (FINAL STABLE LOGIC) ---
-
-def process_claim(raw_input):
+# --- Stage 2, 3 & 4 in ONE call: "single-shot" mode for raw-text claims ---
+@timed_stage("combined_llm")
+def get_combined_verdict(claim: str, search_terms: List[str], gateway: LLMGateway,
+                         priority: int = PRIORITY_INTERACTIVE) -> dict:
     """
-    Executes the full 5-Stage Hybrid Misinformation Workflow.
+    Returns the grounded verdict fields plus 'sensationalism_score' (0-10) from a single
+    generate_content call, replacing analyze_text_style() + get_grounded_verdict().
     """
     
-    # Initialize client locally here for robustness against environment issues
-    try:
-        gemini_client = genai.Client()
-    except Exception:
-        gemini_client = None
+    search_query = _build_search_query(claim, search_terms)
 
-    source_origin = "User-submitted Text"
-    source_trust_score = 0.5 
-    clean_text = raw_input
+    properties = _verdict_schema_properties()
+    properties["sensationalism_score"] = types.Schema(
+        type=types.Type.INTEGER,
+        description="Style of the claim text itself: 0 (Neutral/Rational) to 10 (Extreme Hype/Sensationalism)."
+    )
+    response_schema = types.Schema(
+        type=types.Type.OBJECT,
+        properties=properties,
+        required=["verdict", "trusted_source", "reasoning", "score_base", "sensationalism_score"]
+    )
     
-    # 0. INPUT PRE-PROCESSING (Stage 0)
-    if raw_input.startswith('http'):
-        
-        # --- ATTEMPT LIVE SCRAPE WITH ROTATION ---
-        clean_text = fetch_url_content(raw_input) 
-        
-        if "Web Scrape failed" in clean_text:
-            print("WARNING: Scraping failed. Falling back to URL string analysis.")
-            clean_text = raw_input 
-            
-        match = re.search(r'//(.*?)/', raw_input)
-        domain = match.group(1) if match else raw_input
-        source_origin = raw_input
-        source_trust_score = get_source_trust_score(domain)
-        
-    else:
-        # --- RAW TEXT INPUT (Linguistic Analysis) ---
-        clean_text = raw_input
-        
-        if gemini_client:
-            linguistic_penalty = analyze_text_style(raw_input, gemini_client) 
-        else:
-            linguistic_penalty = 0.0
-            
-        source_trust_score = 0.5 - linguistic_penalty
-        source_trust_score = max(0.1, source_trust_score)
-        source_origin = "User-submitted Text (Linguistically Assessed)"
-        
-    # 1. NLP & CLAIMS (Stage 1)
-    search_terms = extract_key_medical_terms(clean_text) 
+    system_instruction = VERDICT_SYSTEM_INSTRUCTION + (
+        " Separately, rate the wording of the claim text for sensationalism, urgency, or clickbait language "
+        "from 0 (neutral/scientific) to 10 (extreme hype/misleading); this rating must not affect the verdict."
+    )
     
-    # 2. & 3. RAG & LLM JUDGMENT
-    if gemini_client:
-        llm_verdict = get_grounded_verdict(clean_text, search_terms, gemini_client)
-    else:
-         llm_verdict = {
-            "verdict": "ERROR", 
-            "trusted_source": "API Unavailable", 
-            "reasoning": "AI client failed to initialize due to missing API Key.", 
-            "score_base": 0
-        }
+    config = types.GenerateContentConfig(
+        system_instruction=system_instruction,
+        response_mime_type="application/json",
+        response_schema=response_schema
+    )
     
-    # 4. & 5. FEATURE ENGINEERING & SCORING 
+    try:
+        response = gateway.generate_content(
+            model='gemini-2.5-flash',
+            contents=[search_query], 
+            config=config,
+            priority=priority,
+            timeout=stage_timeout("combined_llm", LLM_TIMEOUT_SECONDS or None)
+        )
+        verdict_data = json.loads(response.text)
+        if not isinstance(verdict_data, dict):
+            raise ValueError(f"API returned non-dict data: {response.text}")
+        return verdict_data
+        
+    except Exception as e:
+        if isinstance(e, DeadlineExceeded):
+            mark_timed_out("combined_llm")
+        verdict_data = _api_failure_verdict(e)
+        verdict_data["sensationalism_score"] = 0
+        return verdict_data
+
+
+# --- Shared Pipeline Helpers (used by the sync and async workflows) ---
+
+API_UNAVAILABLE_VERDICT = {
+    "verdict": "ERROR", 
+    "trusted_source": "API Unavailable", 
+    "reasoning": "AI client failed to initialize due to missing API Key.", 
+    "score_base": 0
+}
+
+
+@timed_stage("scrape")
+def _scrape_stage(raw_input: str):
+    """
+    Stage 0 for URLs: returns (clean_text, scrape_failed). Bounded by the scrape's slice of the
+    request deadline; with too little time left the URL string itself is analyzed.
+    """
+    if not should_run("scrape"):
+        return raw_input, True
+    clean_text = fetch_url_content(raw_input, deadline_seconds=stage_timeout("scrape", SCRAPE_DEADLINE_SECONDS))
+    if "Web Scrape failed" in clean_text:
+        logger.warning("Scraping failed. Falling back to URL string analysis.")
+        return raw_input, True
+    return clean_text, False
+
+
+def _text_trust_score(linguistic_penalty: float) -> float:
+    return max(0.1, 0.5 - linguistic_penalty)
+
+
+def _style_trust_score(raw_input: str, llm_available: bool, priority: int) -> float:
+    """Stage 4 for text: style penalty from the LLM, skipped (no penalty) when the deadline is short."""
+    if llm_available and should_run("style_llm"):
+        return _text_trust_score(analyze_text_style(raw_input, gateway, priority=priority))
+    return _text_trust_score(0.0)
+
+
+def _terms_stage(text: str) -> List[str]:
+    """Stage 1, skipped (no focus terms for the search query) when the deadline has run out."""
+    return extract_key_medical_terms(text) if should_run("ner") else []
+
+
+def _verdict_stage(text: str, search_terms: List[str], llm_available: bool, priority: int, combined: bool) -> dict:
+    """Stages 2 & 3: the grounded (or combined) verdict call, unless the LLM or the time budget is missing."""
+    if not llm_available:
+        return dict(API_UNAVAILABLE_VERDICT)
+    if not should_run("combined_llm" if combined else "verdict_llm"):
+        return dict(DEADLINE_VERDICT)
+    if combined:
+        return get_combined_verdict(text, search_terms, gateway, priority=priority)
+    return get_grounded_verdict(text, search_terms, gateway, priority=priority)
+
+
+def _is_degraded() -> bool:
+    deadline = current_deadline()
+    return deadline is not None and bool(deadline.skipped)
+
+
+def _deadline_fallback(final_result: dict, cache_key: str) -> dict:
+    """
+    When the deadline cut off the verdict call, serves the newest stored verdict for the claim
+    (even one past the cache TTL) instead of an error. Returns final_result if there is none.
+    """
+    deadline = current_deadline()
+    if final_result.get('llm_judgment') != 'ERROR' or deadline is None or \
+            not {"verdict_llm", "combined_llm"} & set(deadline.skipped):
+        return final_result
+    fallback = verdict_cache.get(cache_key) or find_recent_claim(cache_key, DEADLINE_FALLBACK_MAX_AGE_SECONDS)
+    if fallback is None:
+        return final_result
+    fallback.pop('_cached_at', None)
+    fallback["cache_hit"] = True
+    logger.info("Deadline reached before the verdict call; serving the stored verdict for %s", cache_key)
+    return fallback
+
+
+def _score_verdict(llm_verdict: dict, source_trust_score: float) -> int:
+    """Stages 4 & 5: applies the source-trust penalty to the LLM base score."""
     score_base = llm_verdict.get('score_base', 0)
     
     if llm_verdict.get('verdict') == 'Contradicted':
@@ -197,32 +290,457 @@ def process_claim(raw_input):
     else:
         final_score = score_base
         
-    final_score = min(100, max(0, round(final_score))) 
+    return min(100, max(0, round(final_score))) 
 
-    # --- Final Output ---
-    final_result = {
-        "credibility_score": final_score,
+
+def _build_result(llm_verdict: dict, source_trust_score: float, source_origin: str, search_terms: List[str]) -> dict:
+    return {
+        "credibility_score": _score_verdict(llm_verdict, source_trust_score),
         "llm_judgment": llm_verdict.get('verdict', 'N/A'),
         "trusted_reference": llm_verdict.get('trusted_source', 'N/A'),
         "reasoning": llm_verdict.get('reasoning', 'No specific reasoning provided.'),
         "source_origin": source_origin,
         "claims_processed": 1,
         "extracted_terms": search_terms,
-        "debug_message": "Full 5-Stage pipeline executed with stability fallback."
+        "debug_message": "Full 5-Stage pipeline executed with stability fallback.",
+        "cache_hit": False
     }
-    
-    # --- Persistence: Save result to MongoDB ---
+
+
+# --- Article inputs: verify the most salient claims instead of one blended verdict ---
+def _verify_article(clean_text: str, source_trust_score: float, llm_available: bool, priority: int) -> Optional[List[dict]]:
+    """
+    Extracts the article's top checkable sentences (claim_extractor.py) and verifies them in
+    parallel, each with its own focus terms. Returns per-claim results in salience order, or None
+    when the article should go through the single blended verdict instead (extraction disabled or
+    out of time, LLM unavailable, nothing checkable found).
+    """
+    if not (CLAIM_EXTRACTION_ENABLED and llm_available) or not should_run("claim_extraction"):
+        return None
+    claims = extract_claims(clean_text)
+    if not claims:
+        return None
+
+    def verify(claim) -> dict:
+        verdict = get_grounded_verdict(claim.text, claim.search_terms, gateway, priority=priority)
+        return dict(
+            claim.as_dict(),
+            credibility_score=_score_verdict(verdict, source_trust_score),
+            llm_judgment=verdict.get('verdict', 'N/A'),
+            trusted_reference=verdict.get('trusted_source', 'N/A'),
+            reasoning=verdict.get('reasoning', 'No specific reasoning provided.'),
+        )
+
+    # Each task runs in a copy of this context so timing spans and the deadline follow it
+    futures = [_claim_executor.submit(contextvars.copy_context().run, verify, claim) for claim in claims]
+    return [future.result() for future in futures]
+
+
+def _build_article_result(claim_results: List[dict], source_origin: str) -> dict:
+    """Article-level result: salience-weighted aggregate plus the per-claim results as "claim_results"."""
+    summary = aggregate_article_score(claim_results) or {
+        "credibility_score": 0,
+        "llm_judgment": "ERROR",
+        "trusted_reference": "API Failure",
+        "reasoning": claim_results[0].get('reasoning', 'Every claim verification failed.'),
+    }
+    search_terms = list(dict.fromkeys(term for result in claim_results for term in result['extracted_terms']))
+    return dict(
+        summary,
+        source_origin=source_origin,
+        claims_processed=len(claim_results),
+        extracted_terms=search_terms[:MAX_SEARCH_TERMS],
+        debug_message=f"Article pipeline: {len(claim_results)} salient claim(s) verified in parallel.",
+        cache_hit=False,
+        claim_results=claim_results,
+    )
+
+
+@timed_stage("persist")
+def _persist_result(final_result: dict, cache_key: str, scrape_failed: bool, background: bool = False,
+                    raw_input: Optional[str] = None) -> None:
+    """
+    Saves a result to MongoDB and fills the verdict cache (and the semantic index for text claims).
+    Results go through the buffered bulk writer unless CLAIM_WRITE_MODE=inline (then only
+    background=True callers use it). Fast-path classifier answers are neither saved nor cached.
+    """
+    if final_result.get('verdict_source') == fast_classifier.VERDICT_SOURCE:
+        return
+    claim_text = raw_input if raw_input and not is_url_input(raw_input) else None
     try:
-        from db_utils import save_verified_claim 
-        
         # CRITICAL FIX: Only save if the AI verdict was NOT an error
         # This prevents the corrupted error dictionary from crashing the DB driver
         if final_result.get('llm_judgment') != 'ERROR':
-            save_verified_claim(final_result) 
+            deadline = current_deadline()
+            # Out of time: an inline write would only make the response later, so hand it off
+            if background or CLAIM_WRITE_MODE != 'inline' or (deadline is not None and deadline.expired()):
+                claim_writer.submit(dict(final_result), fingerprint=cache_key, claim_text=claim_text)
+            else:
+                save_verified_claim(final_result, fingerprint=cache_key, claim_text=claim_text) 
         else:
-            print("WARNING: Skipping DB save. AI processing failed.")
+            logger.warning("Skipping DB save. AI processing failed.")
             
     except Exception as e:
-        print(f"WARNING: Could not save result to DB. Error: {e}")
+        logger.warning("Could not save result to DB. Error: %s", e)
+
+    # --- Cache: only remember verdicts that came from a clean run (no stage skipped for time) ---
+    if final_result.get('llm_judgment') != 'ERROR' and not scrape_failed and not _is_degraded():
+        verdict_cache.put(cache_key, final_result)
+        if semantic_index is not None and claim_text:
+            semantic_index.add_later(cache_key, claim_text)
+
+
+@timed_stage("semantic_lookup")
+def _semantic_lookup(raw_input: str, cache_key: str) -> Optional[dict]:
+    """
+    Reuses the stored LLM verdict of an already verified text claim that paraphrases raw_input
+    (cosine similarity >= SEMANTIC_MATCH_THRESHOLD, same negation and direction words). None when
+    there is no match. Off unless SEMANTIC_CACHE_ENABLED; the reused verdict is not cached under
+    raw_input's key, so the next submission is matched against the index again.
+    """
+    if semantic_index is None or is_url_input(raw_input) or not should_run("semantic_lookup"):
+        return None
+    try:
+        match = semantic_index.search(raw_input)
+    except Exception as e:
+        logger.warning("Semantic index lookup failed. Error: %s", e)
+        return None
+    record_cache("semantic", match is not None)
+    if match is None:
+        return None
+
+    matched_key, similarity = match
+    reused = verdict_cache.get(matched_key) or find_recent_claim(matched_key, SEMANTIC_MAX_AGE_SECONDS)
+    if reused is None or reused.get("verdict_source") == fast_classifier.VERDICT_SOURCE:
+        return None
+    reused.pop('_cached_at', None)
+    reused["cache_hit"] = True
+    reused["semantic_match"] = {"matched_fingerprint": matched_key, "similarity": round(similarity, 4)}
+    logger.info("Semantic cache hit: similarity %.3f with %s", similarity, matched_key)
+
+    # Credit the original claim
+    claim_writer.record_hit(matched_key)
+    return reused
+
+
+@timed_stage("fast_classifier")
+def _fast_path(raw_input: str):
+    """
+    Asks the local classifier about a text claim before any LLM stage. Returns (result, prediction):
+    result is the classifier's answer when it is confident (None otherwise), and prediction
+    (verdict or None) is kept to compare with the LLM verdict the claim then gets.
+    """
+    if is_url_input(raw_input):
+        return None, None
+    try:
+        classified = fast_classifier.classify(raw_input)
+    except Exception as e:
+        logger.warning("Fast classifier failed. Error: %s", e)
+        return None, None
+    if classified is None:
+        return None, None
+    verdict, probability, confident = classified
+    record_cache("fast_classifier", confident)
+    if not confident:
+        return None, verdict
+    return {
+        "credibility_score": fast_classifier.typical_score(verdict),
+        "llm_judgment": verdict,
+        "trusted_reference": "Local classifier (previously verified claims)",
+        "reasoning": f"Matches the pattern of previously verified claims judged '{verdict}' "
+                     f"(classifier confidence {probability:.2f}); no new evidence search was run.",
+        "source_origin": "User-submitted Text (Linguistically Assessed)",
+        "claims_processed": 1,
+        "extracted_terms": [],
+        "debug_message": "Fast path: local classifier verdict, LLM stages skipped.",
+        "cache_hit": False,
+        "verdict_source": fast_classifier.VERDICT_SOURCE,
+        "classifier_confidence": round(probability, 4),
+    }, verdict
+
+
+def _record_fast_path_agreement(prediction: Optional[str], final_result: dict) -> None:
+    """Shadow agreement: the classifier's unconfident guess against the LLM verdict it deferred to."""
+    if prediction is not None and final_result.get('llm_judgment') in fast_classifier.TRAINABLE_VERDICTS:
+        record_fast_path_agreement(prediction == final_result['llm_judgment'])
+
+
+# --- Main Workflow Function (FINAL STABLE LOGIC) ---
+
+def _run_pipeline(raw_input: str, llm_available: bool, priority: int, single_shot: bool):
+    """Runs Stages 0-5 for one input without cache or persistence. Returns (final_result, scrape_failed)."""
+    
+    scrape_failed = False
+    
+    # 0. INPUT PRE-PROCESSING (Stage 0)
+    if is_url_input(raw_input):
+        
+        # --- ATTEMPT LIVE SCRAPE WITH ROTATION ---
+        clean_text, scrape_failed = _scrape_stage(raw_input)
+        source_origin = raw_input
+        source_trust_score = get_source_trust_score(raw_input)
+        
+        # --- ARTICLE: verify its most salient claims in parallel ---
+        claim_results = None if scrape_failed else _verify_article(clean_text, source_trust_score, llm_available, priority)
+        if claim_results is not None:
+            return _build_article_result(claim_results, source_origin), scrape_failed
+        
+    elif single_shot:
+        # --- RAW TEXT INPUT: style is scored by the combined verdict call below ---
+        clean_text = raw_input
+        source_trust_score = None
+        source_origin = "User-submitted Text (Linguistically Assessed)"
+        
+    else:
+        # --- RAW TEXT INPUT (Linguistic Analysis) ---
+        clean_text = raw_input
+        
+        source_trust_score = _style_trust_score(raw_input, llm_available, priority)
+        source_origin = "User-submitted Text (Linguistically Assessed)"
+        
+    # 1. NLP & CLAIMS (Stage 1)
+    search_terms = _terms_stage(clean_text) 
+    
+    # 2. & 3. RAG & LLM JUDGMENT
+    llm_verdict = _verdict_stage(clean_text, search_terms, llm_available, priority, combined=source_trust_score is None)
+    
+    if source_trust_score is None:
+        source_trust_score = _text_trust_score(sensationalism_to_penalty(llm_verdict.get('sensationalism_score', 0)))
+    
+    # 4. & 5. FEATURE ENGINEERING & SCORING 
+    final_result = _build_result(llm_verdict, source_trust_score, source_origin, search_terms)
+    return final_result, scrape_failed
+
 
+def verify_claim_uncached(raw_input: str, single_shot: Optional[bool] = None,
+                          priority: int = PRIORITY_INTERACTIVE) -> dict:
+    """Runs the pipeline without touching the verdict cache or MongoDB (used by comparison harnesses)."""
+    if single_shot is None:
+        single_shot = LLM_SINGLE_SHOT
+    final_result, _ = _run_pipeline(raw_input, gateway.is_available(), priority, single_shot)
     return final_result
+
+
+def _lookup_verdict_cache(cache_key: str) -> Optional[dict]:
+    with span("verdict_cache"):
+        cached_result = verdict_cache.get(cache_key)
+    record_cache("verdict", cached_result is not None)
+    return cached_result
+
+
+def _finish_request(result: dict, timings, deadline, raw_input: str, mode: str, debug_timings: bool) -> dict:
+    """
+    Records the request histogram and log line, lists the stages skipped to meet the deadline
+    as "stages_skipped", and attaches the timing breakdown when asked.
+    """
+    result["stages_skipped"] = list(deadline.skipped)
+    if result.get("semantic_match"):
+        outcome = "semantic_hit"
+    elif result.get("cache_hit"):
+        outcome = "cache_hit"
+    elif result.get("verdict_source") == fast_classifier.VERDICT_SOURCE:
+        outcome = "fast_path"
+    elif result.get("llm_judgment") == "ERROR":
+        outcome = "error"
+    elif deadline.skipped:
+        outcome = "degraded"
+    else:
+        outcome = "verified"
+    input_kind = "url" if is_url_input(raw_input) else "text"
+    breakdown = timings.as_dict()
+    observe_request(mode, input_kind, outcome, timings.elapsed())
+    logger.info("Claim processed", extra={"mode": mode, "input_kind": input_kind, "outcome": outcome,
+                                          "timings": breakdown})
+    if debug_timings:
+        result["debug_timings"] = breakdown
+    return result
+
+
+def process_claim(raw_input, force_refresh: bool = False, priority: int = PRIORITY_INTERACTIVE,
+                  single_shot: Optional[bool] = None, debug_timings: bool = False,
+                  deadline_seconds: Optional[float] = None):
+    """
+    Executes the full 5-Stage Hybrid Misinformation Workflow.
+
+    Results are served from the verdict cache when the same normalized input was verified
+    recently; pass force_refresh=True to bypass the lookup and re-run the pipeline. With
+    SEMANTIC_CACHE_ENABLED, a text claim that rewords an indexed one without changing its negation
+    or direction words reuses that verdict (see semantic_index.py).
+    Batch/backfill callers pass priority=PRIORITY_BATCH so interactive requests get LLM quota first.
+    single_shot (default: LLM_SINGLE_SHOT) merges style analysis and the verdict into one LLM call.
+    With FAST_CLASSIFIER_ENABLED, text claims the local classifier is confident about are answered
+    without any LLM call (see fast_classifier.py); those answers are not stored or cached.
+    debug_timings=True adds the per-stage timing breakdown to the result as "debug_timings".
+
+    The whole call is bounded by deadline_seconds (default REQUEST_DEADLINE_SECONDS). Each stage
+    gets a slice of what is left; stages that no longer fit are skipped (style analysis, NER, the
+    scrape in favor of URL-string analysis) and the verdict call falls back to a stored verdict.
+    Skipped stages are listed in the result's "stages_skipped".
+    """
+    with track_request() as timings, request_deadline(deadline_seconds) as deadline:
+        result = _process_claim(raw_input, force_refresh, priority, single_shot)
+        return _finish_request(result, timings, deadline, raw_input, "sync", debug_timings)
+
+
+def _process_claim(raw_input, force_refresh: bool, priority: int, single_shot: Optional[bool]):
+    cache_key = verdict_cache.key_for(raw_input)
+    if not force_refresh:
+        cached_result = _lookup_verdict_cache(cache_key)
+        if cached_result is not None:
+            cached_result["cache_hit"] = True
+            # Dedup storage: the stored claim's hit_count/last_seen track cache hits too
+            claim_writer.record_hit(cache_key)
+            return cached_result
+        semantic_result = _semantic_lookup(raw_input, cache_key)
+        if semantic_result is not None:
+            return semantic_result
+
+    if single_shot is None:
+        single_shot = LLM_SINGLE_SHOT
+
+    fast_result, prediction = _fast_path(raw_input)
+    if fast_result is not None:
+        # Advisory only: never stored or cached, so it cannot replace or shadow an LLM verdict
+        return fast_result
+
+    # The shared gateway reports whether the pooled client could be built (e.g. missing API key)
+    llm_available = gateway.is_available()
+
+    final_result, scrape_failed = _run_pipeline(raw_input, llm_available, priority, single_shot)
+    _record_fast_path_agreement(prediction, final_result)
+    
+    # --- Persistence: Save result to MongoDB ---
+    _persist_result(final_result, cache_key, scrape_failed, raw_input=raw_input)
+
+    return _deadline_fallback(final_result, cache_key)
+
+
+# --- Async Workflow: Same stages, executed as a dependency graph ---
+
+def _build_claim_graph(raw_input: str, llm_available: bool, priority: int, single_shot: bool) -> PipelineGraph:
+    """
+    Wires the pipeline stages for one input. URL inputs: scrape -> per-claim verification of the
+    article's salient sentences (or NER -> verdict), with the rule-based trust score alongside.
+    Text inputs: the style call runs concurrently with NER -> verdict, or, in single-shot mode,
+    the trust score is derived from the combined verdict call.
+    """
+    graph = PipelineGraph()
+
+    def run_verdict(content, terms, article=None):
+        if article is not None:
+            return None
+        return _verdict_stage(content[0], terms, llm_available, priority, combined=False)
+
+    def run_combined_verdict(content, terms):
+        return _verdict_stage(content[0], terms, llm_available, priority, combined=True)
+
+    if is_url_input(raw_input):
+        graph.add("content", lambda: _scrape_stage(raw_input))
+        graph.add("trust", lambda: get_source_trust_score(raw_input))
+        # Articles: per-claim verification replaces the blended NER -> verdict path when it applies
+        graph.add("article", lambda content, trust: None if content[1] else
+                  _verify_article(content[0], trust, llm_available, priority), deps=["content", "trust"])
+        graph.add("terms", lambda content, article: [] if article is not None else _terms_stage(content[0]),
+                  deps=["content", "article"])
+        graph.add("verdict", run_verdict, deps=["content", "terms", "article"])
+        return graph
+    elif single_shot:
+        graph.add("content", lambda: (raw_input, False))
+    else:
+        graph.add("content", lambda: (raw_input, False))
+        graph.add("trust", lambda: _style_trust_score(raw_input, llm_available, priority))
+
+    graph.add("terms", lambda content: _terms_stage(content[0]), deps=["content"])
+    if single_shot and not is_url_input(raw_input):
+        graph.add("verdict", run_combined_verdict, deps=["content", "terms"])
+        graph.add("trust", lambda verdict: _text_trust_score(
+            sensationalism_to_penalty(verdict.get('sensationalism_score', 0))
+        ), deps=["verdict"])
+    else:
+        graph.add("verdict", run_verdict, deps=["content", "terms"])
+    return graph
+
+
+def _stage_event_adapter(raw_input: str, on_stage: Callable[[str, dict], Any]) -> Callable[[str, Any], None]:
+    """
+    Translates finished graph stages into partial-result events for on_stage(event, data):
+    "scrape" (URLs), "trust", "claims" (articles), "terms" and "verdict". Stages bypassed by the
+    article path (empty terms, no blended verdict) emit nothing.
+    """
+    is_url = is_url_input(raw_input)
+    finished = {}
+
+    def handle(stage: str, result: Any) -> None:
+        finished[stage] = result
+        if stage == "content" and is_url:
+            on_stage("scrape", {"scrape_failed": result[1], "content_chars": 0 if result[1] else len(result[0])})
+        elif stage == "trust":
+            on_stage("trust", {"source_trust_score": round(result, 3),
+                               "source_origin": raw_input if is_url else "User-submitted Text (Linguistically Assessed)"})
+        elif stage == "article" and result is not None:
+            on_stage("claims", {"claim_results": result, "claims_processed": len(result)})
+        elif stage == "terms" and finished.get("article") is None:
+            on_stage("terms", {"extracted_terms": result})
+        elif stage == "verdict" and result is not None:
+            on_stage("verdict", {"llm_judgment": result.get('verdict', 'N/A'),
+                                 "trusted_reference": result.get('trusted_source', 'N/A'),
+                                 "reasoning": result.get('reasoning', 'No specific reasoning provided.')})
+
+    return handle
+
+
+async def process_claim_async(raw_input, force_refresh: bool = False, priority: int = PRIORITY_INTERACTIVE,
+                              single_shot: Optional[bool] = None, debug_timings: bool = False,
+                              deadline_seconds: Optional[float] = None,
+                              on_stage: Optional[Callable[[str, dict], Any]] = None):
+    """
+    Asyncio variant of process_claim(): independent stages overlap and the MongoDB write is
+    handed to the background claim writer, so latency tracks the slowest Gemini call.
+    The same request deadline and degradation rules apply.
+    on_stage(event, data), if given, receives each partial result as its stage finishes
+    (see _stage_event_adapter); cache hits skip the stages and emit nothing.
+    """
+    with track_request() as timings, request_deadline(deadline_seconds) as deadline:
+        result = await _process_claim_async(raw_input, force_refresh, priority, single_shot, on_stage)
+        return _finish_request(result, timings, deadline, raw_input, "async", debug_timings)
+
+
+async def _process_claim_async(raw_input, force_refresh: bool, priority: int, single_shot: Optional[bool],
+                               on_stage: Optional[Callable[[str, dict], Any]] = None):
+    cache_key = verdict_cache.key_for(raw_input)
+    if not force_refresh:
+        cached_result = await asyncio.to_thread(_lookup_verdict_cache, cache_key)
+        if cached_result is not None:
+            cached_result["cache_hit"] = True
+            # Dedup storage: the stored claim's hit_count/last_seen track cache hits too
+            claim_writer.record_hit(cache_key)
+            return cached_result
+        semantic_result = await asyncio.to_thread(_semantic_lookup, raw_input, cache_key)
+        if semantic_result is not None:
+            return semantic_result
+
+    if single_shot is None:
+        single_shot = LLM_SINGLE_SHOT
+
+    fast_result, prediction = _fast_path(raw_input)
+    if fast_result is not None:
+        # Advisory only: never stored or cached, so it cannot replace or shadow an LLM verdict
+        return fast_result
+
+    llm_available = gateway.is_available()
+    stage_callback = _stage_event_adapter(raw_input, on_stage) if on_stage is not None else None
+    stages = await _build_claim_graph(raw_input, llm_available, priority, single_shot).run(on_stage=stage_callback)
+
+    clean_text, scrape_failed = stages["content"]
+    if is_url_input(raw_input):
+        source_origin = raw_input
+    else:
+        source_origin = "User-submitted Text (Linguistically Assessed)"
+
+    if stages.get("article") is not None:
+        final_result = _build_article_result(stages["article"], source_origin)
+    else:
+        final_result = _build_result(stages["verdict"], stages["trust"], source_origin, stages["terms"])
+    _record_fast_path_agreement(prediction, final_result)
+    _persist_result(final_result, cache_key, scrape_failed, background=True, raw_input=raw_input)
+    return await asyncio.to_thread(_deadline_fallback, final_result, cache_key)
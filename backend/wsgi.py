@@ -0,0 +1,4 @@
+# WSGI entry point for production servers: gunicorn -c gunicorn.conf.py (wsgi_app = "wsgi:app")
+from app import app
+
+application = app